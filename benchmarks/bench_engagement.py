@@ -0,0 +1,148 @@
+import argparse
+import dataclasses
+import datetime
+import os
+import random
+import shutil
+import tempfile
+
+import pandas as pd
+
+from benchmarks.bench_parquet_repo import synthetic_posts, timed
+from modules.repository.parquet_repo import ParquetRepository
+from modules.repository.sqlite3_repo import Sqlite3Repository
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_engagement --posts 20000 --days 30
+# Simulates the scraper polling every post for two days after it was posted and
+# compares the samples an append on every poll would write with the samples the
+# change only history keeps, before and after downsampling, then times trending.
+
+POLL_INTERVAL = datetime.timedelta(minutes=15)
+HOT_PERIOD = datetime.timedelta(days=2)
+
+
+def synthetic_history(posts, end, seed=42):
+    # (post_id, observed_at, likes, comments) of every poll until end that saw new
+    # counts, and the number of polls. Posts gain most likes in their first hours.
+    rng = random.Random(seed)
+    samples, polls = [], 0
+    for post in posts:
+        posted = datetime.datetime.strptime(post.posted_date, "%Y-%m-%d %H:%M:%S")
+        likes = comments = 0
+        popularity = rng.random() ** 3
+        observed, last = posted, None
+        while observed < min(posted + HOT_PERIOD, end):
+            polls += 1
+            age = (observed - posted).total_seconds() / 3600
+            chance = popularity / (1 + age)
+            likes += sum(rng.random() < chance for _ in range(5))
+            comments += rng.random() < chance / 3
+            if (likes, comments) != last:
+                samples.append(
+                    (post.id, observed.strftime("%Y-%m-%d %H:%M:%S"), likes, comments)
+                )
+                last = (likes, comments)
+            observed += POLL_INTERVAL
+        post.likes, post.comments = likes, comments
+    return samples, polls
+
+
+def check_samples(repo, post):
+    # Goes through the upsert path the scraper uses, load_* bypass it. Counts that
+    # change twice within one second must update that second's sample.
+    for likes in (post.likes + 1, post.likes + 2):
+        repo.upsert_posts([dataclasses.replace(post, likes=likes)])
+    latest = (
+        repo.db.read_sql(
+            "SELECT * FROM post_engagement WHERE post_id = ? ORDER BY observed_at",
+            (post.id,),
+        )
+        if isinstance(repo, Sqlite3Repository)
+        else repo._read_engagement(repo._engagement_days())
+        .query("post_id == @post.id")
+        .sort_values("observed_at", kind="stable")
+    ).iloc[-1]
+    assert latest["likes"] == post.likes + 2, latest
+
+
+def load_sqlite(repo, posts, samples):
+    repo.upsert_posts(posts)
+    with repo.db.transaction() as tx:
+        tx.execute("DELETE FROM post_engagement")
+        tx.executemany("INSERT INTO post_engagement VALUES (?, ?, ?, ?)", samples)
+
+
+def load_parquet(repo, posts, samples):
+    repo.upsert_posts(posts)
+    shutil.rmtree(repo.engagement_dir)
+    df = pd.DataFrame(samples, columns=["post_id", "observed_at", "likes", "comments"])
+    for day, rows in df.groupby(df["observed_at"].str[:10]):
+        path = os.path.join(repo.engagement_dir, f"observed_day={day}")
+        os.makedirs(path)
+        repo._write_engagement(path, "part-bench", rows)
+
+
+def sample_count(repo):
+    if isinstance(repo, Sqlite3Repository):
+        return repo.db.execute("SELECT COUNT(*) FROM post_engagement").fetchone()[0]
+    return len(repo._read_engagement(repo._engagement_days()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engagement history and trending")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    posts = list(synthetic_posts(args.posts, args.days))
+    now = datetime.datetime(2025, 1, 1) + datetime.timedelta(args.days)
+    samples, polls = synthetic_history(posts, now)
+    workdir = tempfile.mkdtemp(prefix="bench_engagement_")
+    try:
+        repos = {
+            "sqlite3": Sqlite3Repository(
+                preloaded_credentials={
+                    "sqlite3_file": os.path.join(workdir, "scraper.db")
+                }
+            ),
+            "parquet": ParquetRepository(
+                preloaded_credentials={"parquet_dir": os.path.join(workdir, "parquet")},
+                compaction=False,
+            ),
+        }
+        for repo in repos.values():
+            check_samples(repo, posts[0])
+        load_sqlite(repos["sqlite3"], posts, samples)
+        load_parquet(repos["parquet"], posts, samples)
+        print(
+            f"posts: {args.posts}, days: {args.days}, polls: {polls}, "
+            f"samples on change: {len(samples)} ({len(samples) / polls:.1%})"
+        )
+        print(f"{'window':<10} {'sqlite3':>10} {'parquet':>10} {'posts':>6}")
+        for window in ["1h", "6h", "24h"]:
+            results, times = {}, {}
+            for name, repo in repos.items():
+                results[name], times[name] = timed(
+                    lambda: repo.trending(window, limit=20, now=now)
+                )
+            assert list(results["sqlite3"]["id"]) == list(
+                results["parquet"]["id"]
+            ), results
+            print(
+                f"{window:<10} {times['sqlite3'] * 1000:>8.1f}ms "
+                f"{times['parquet'] * 1000:>8.1f}ms {len(results['sqlite3']):>6}"
+            )
+        for name, repo in repos.items():
+            removed, elapsed = timed(lambda: repo.downsample_engagement(now), repeat=1)
+            print(
+                f"{name:>8} downsampling: removed {removed}, "
+                f"{sample_count(repo)} samples left, {elapsed:.2f}s"
+            )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import os
+import time
+
+from playwright.sync_api import sync_playwright
+
+from modules.tradingedge_scraper.extraction import (
+    EXTRACT_FEED_JS,
+    SELECTORS,
+    to_post_data,
+)
+from modules.tradingedge_scraper.scraper import Scraper, find_tickers_in_text
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_extraction --posts 200
+# Needs a Playwright Chromium (python -m playwright install chromium).
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "tradingedge_feed.html")
+
+# Repeats the fixture items until the feed holds count posts, with unique ids
+GROW_FEED_JS = """
+(count) => {
+    const feed = document.querySelector("ul.feed");
+    const templates = Array.from(feed.children);
+    for (let i = templates.length; i < count; i++) {
+        const item = templates[i % templates.length].cloneNode(true);
+        item.setAttribute("data-post-id", String(51240000 + i));
+        feed.appendChild(item);
+    }
+}
+"""
+
+# What the fixture must extract to, checked before timing anything
+EXPECTED = [
+    {
+        "id": "51230001",
+        "title": "NVDA into earnings",
+        "likes": "42",
+        "comments": "7",
+        "has_more": False,
+        "category": "Market Updates",
+        "created_at": "Tue, January 14, 2025, 03:12PM",
+    },
+    {"id": "51230002", "has_more": True, "likes": "118", "comments": "23"},
+    {"id": "51230003", "title": None, "category": None, "comments": None},
+    {"id": "51230004", "link": None},
+]
+
+
+def extract_elements(scraper):
+    return [
+        scraper.extract_post(post)
+        for post in scraper.page.query_selector_all(SELECTORS["item"])
+    ]
+
+
+def extract_evaluate(scraper):
+    return scraper.page.evaluate(EXTRACT_FEED_JS, SELECTORS)
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed extraction benchmark")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(FIXTURE, "r") as f:
+        html = f.read()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        scraper = Scraper(None)
+        scraper.page = browser.new_page()
+        scraper.page.set_content(html)
+
+        fixture = extract_evaluate(scraper)
+        assert extract_elements(scraper) == fixture
+        assert len(fixture) == len(EXPECTED)
+        for raw, expected in zip(fixture, EXPECTED):
+            for key, value in expected.items():
+                assert raw[key] == value, (raw["id"], key, raw[key])
+        posts = [to_post_data(raw, find_tickers_in_text) for raw in fixture]
+        assert posts[0].posted_date == "2025-01-14 15:12:00"
+        assert "NVDA" in posts[0].found_tickers
+        assert posts[3] is None
+
+        scraper.page.evaluate(GROW_FEED_JS, args.posts)
+        elements, elements_time = timed(lambda: extract_elements(scraper), args.repeat)
+        evaluated, evaluate_time = timed(lambda: extract_evaluate(scraper), args.repeat)
+        assert elements == evaluated
+        browser.close()
+
+    print(f"posts: {len(evaluated)}")
+    print(f"per element query_selector: {elements_time * 1000:.1f}ms")
+    print(f"one page.evaluate:          {evaluate_time * 1000:.1f}ms")
+    print(f"speedup: {elements_time / evaluate_time:.1f}x (results identical)")
+
+
+if __name__ == "__main__":
+    main()
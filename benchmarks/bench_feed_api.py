@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from modules.repository.repository_interface import UpsertResult
+from modules.tradingedge_scraper.feed_api import (
+    FeedResponseCollector,
+    parse_feed_response,
+)
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_feed_api --pages 20
+# The fixture checks run without a browser, the ingestion comparison needs a
+# Playwright Chromium (python -m playwright install chromium).
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Renders the API items into the same markup as the real feed, short descriptions
+# are cut and expanded in a detail panel, like on tradingedge.club
+FEED_HTML = """<!DOCTYPE html>
+<html><body>
+<ul class="feed"></ul>
+<div id="detail"></div>
+<script>
+let next = "/api/v1/networks/1/feed?page=1";
+const feed = document.querySelector("ul.feed");
+function ago(created) {
+    const days = Math.floor((Date.now() - new Date(created)) / 86400000);
+    return days > 0 ? `Posted ${days}d ago` : "Posted 1h ago";
+}
+function render(post) {
+    const text = post.description.replace(/<[^>]+>/g, " ").trim();
+    const long = text.length > 60;
+    const li = document.createElement("li");
+    li.className = "feed-item";
+    li.setAttribute("data-post-id", String(post.id));
+    const created = new Date(post.created_at);
+    const title = created.toLocaleString("en-US", {weekday: "short", month: "long",
+        day: "2-digit", year: "numeric", hour: "2-digit", minute: "2-digit", hour12: true})
+        .replace(/ ([AP]M)$/, "$1").replace(" at ", ", ");
+    li.innerHTML = `
+        <div class="mighty-attribution-name"><span>${post.creator.name}</span></div>
+        <div class="feed-item-meta-location">
+            <span class="feed-item-post-created-at" title="${title}">${ago(post.created_at)}</span>
+        </div>
+        <a class="feed-item-post" href="${post.permalink}">
+            ${post.title ? `<div class="feed-item-post-title"><h1>${post.title}</h1></div>` : ""}
+            <div class="feed-item-post-description">${long ? text.slice(0, 60) : text}</div>
+        </a>
+        ${long ? '<div class="mighty-wysiwyg-content-show-more">Show more</div>' : ""}
+        ${post.tags.length ? `<span class="post-tag-name">${post.tags[0].name}</span>` : ""}
+        <div class="mighty-post-stat-cheer"><span class="mighty-post-stat-cheer-count">${post.cheers_count}</span></div>
+        <div class="mighty-post-stat-comment"><span class="mighty-post-stat-comment-count">${post.comments_count}</span></div>`;
+    const more = li.querySelector(".mighty-wysiwyg-content-show-more");
+    if (more) {
+        more.addEventListener("click", () => {
+            document.getElementById("detail").innerHTML = `
+                <div class="detail-layout-description">${post.description}</div>
+                <button class="btn-close" onclick="this.parentElement.innerHTML = ''">x</button>`;
+        });
+    }
+    feed.appendChild(li);
+}
+async function loadMore() {
+    if (!next) return;
+    const url = next;
+    next = null;
+    const page = await (await fetch(url)).json();
+    page.items.forEach(render);
+    next = page.links.next;
+    document.body.style.minHeight = `${feed.children.length * 400}px`;
+}
+window.addEventListener("scroll", () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 10) loadMore();
+});
+loadMore();
+</script>
+</body></html>
+"""
+
+
+def load_fixture_pages():
+    pages = []
+    for name in ("feed_api_page1.json", "feed_api_page2.json"):
+        with open(os.path.join(FIXTURES, name), "r") as f:
+            pages.append(json.load(f))
+    return pages
+
+
+def synthetic_pages(fixture_pages, count, spacing=timedelta(minutes=20)):
+    # Repeats the fixture items over count pages with unique ids and dates going
+    # back from now, so the feed stays within the scraper's lookback
+    items = [item for page in fixture_pages for item in page["items"]]
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    pages = []
+    for number in range(count):
+        page_items = []
+        for i, item in enumerate(items):
+            copy = dict(item)
+            position = number * len(items) + i
+            copy["id"] = 52000000 + position
+            copy["created_at"] = (now - position * spacing).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            )
+            copy["permalink"] = f"https://tradingedge.club/posts/{copy['id']}"
+            page_items.append(copy)
+        next_url = None
+        if number + 1 < count:
+            next_url = f"/api/v1/networks/1/feed?page={number + 2}"
+        pages.append({"items": page_items, "links": {"next": next_url}})
+    return pages
+
+
+class FeedStub:
+    def __init__(self, pages, html=FEED_HTML):
+        self.pages = pages
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/feed":
+                    body, content_type = html.encode(), "text/html"
+                else:
+                    number = int(parse_qs(url.query).get("page", ["1"])[0])
+                    body = json.dumps(stub.pages[number - 1]).encode()
+                    content_type = "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CollectingRepository:
+    def __init__(self):
+        self.posts = []
+
+    def upsert_posts(self, posts):
+        self.posts = list(posts)
+        return UpsertResult(inserted=len(posts), updated=0)
+
+
+def check_fixtures(fixture_pages):
+    posts = [post for page in fixture_pages for post in parse_feed_response(page)]
+    assert [post["id"] for post in posts] == ["51230001", "51230002", "51230003"]
+    assert posts[0]["likes"] == "42" and posts[0]["comments"] == "7"
+    assert posts[0]["category"] == "Market Updates"
+    assert posts[1]["description"].startswith("SPY levels for the week")
+    assert "Support at 580" in posts[1]["description"]
+    assert posts[2]["title"] is None and posts[2]["category"] is None
+    assert all(post["has_more"] is False for post in posts)
+    collector = FeedResponseCollector()
+    collector.add(posts)
+    assert [post["id"] for post in collector.drain()] == [
+        "51230001",
+        "51230002",
+        "51230003",
+    ]
+    assert collector.drain() is None
+    print("fixtures: ok")
+
+
+def scrape(browser, url, ingestion):
+    from modules.tradingedge_scraper import scraper as scraper_module
+
+    scraper = scraper_module.Scraper(
+        None, url=url, ingestion=ingestion, incremental=False
+    )
+    scraper.storage = CollectingRepository()
+    scraper.page = browser.new_page()
+    if ingestion == "network":
+        scraper.collector = FeedResponseCollector()
+        scraper.page.on("response", scraper.collector.on_response)
+    scraper.page.goto(url, wait_until="networkidle")
+    start = time.perf_counter()
+    scraper.scrape_posts()
+    elapsed = time.perf_counter() - start
+    scraper.page.close()
+    return {post.id: post for post in scraper.storage.posts}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed API ingestion benchmark")
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    fixture_pages = load_fixture_pages()
+    check_fixtures(fixture_pages)
+
+    from playwright.sync_api import sync_playwright
+
+    with FeedStub(
+        synthetic_pages(fixture_pages, args.pages)
+    ) as stub, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        network, network_time = scrape(browser, f"{stub.url}/feed", "network")
+        dom, dom_time = scrape(browser, f"{stub.url}/feed", "dom")
+        browser.close()
+
+    assert network.keys() == dom.keys(), (len(network), len(dom))
+    for id, post in network.items():
+        for field in (
+            "title",
+            "description",
+            "likes",
+            "comments",
+            "link",
+            "posted_date",
+        ):
+            assert getattr(post, field) == getattr(dom[id], field), (id, field)
+    print(f"posts: {len(network)} (identical)")
+    print(f"dom ingestion:     {dom_time:.1f}s")
+    print(f"network ingestion: {network_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
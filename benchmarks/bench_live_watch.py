@@ -0,0 +1,89 @@
+import argparse
+import os
+import tempfile
+
+from benchmarks.bench_feed_api import CollectingRepository, FeedStub
+from modules.tradingedge_scraper.feed_state import FeedState
+from modules.tradingedge_scraper.session import SessionStore
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_live_watch --seconds 60 --every 5
+# Serves a feed that inserts a new post at the top every few seconds, like the
+# site's live updates, and reports the latency from a post appearing to it being
+# stored. With reload polling that latency is up to the polling interval.
+# Needs a Playwright Chromium (python -m playwright install chromium).
+
+LIVE_FEED_HTML = """<!DOCTYPE html>
+<html><body>
+<ul class="feed"></ul>
+<script>
+let next = 1;
+const feed = document.querySelector("ul.feed");
+function insert() {
+    const id = String(60000000 + next++);
+    const created = new Date();
+    const title = created.toLocaleString("en-US", {weekday: "short", month: "long",
+        day: "2-digit", year: "numeric", hour: "2-digit", minute: "2-digit", hour12: true})
+        .replace(/ ([AP]M)$/, "$1").replace(" at ", ", ");
+    const li = document.createElement("li");
+    li.className = "feed-item";
+    li.setAttribute("data-post-id", id);
+    li.innerHTML = `
+        <div class="mighty-attribution-name"><span>Trader</span></div>
+        <div class="feed-item-meta-location">
+            <span class="feed-item-post-created-at" title="${title}">Posted 1m ago</span>
+        </div>
+        <a class="feed-item-post" href="/posts/${id}">
+            <div class="feed-item-post-description">Live post ${id} on $SPY</div>
+        </a>
+        <div class="mighty-post-stat-cheer"><span class="mighty-post-stat-cheer-count">0</span></div>
+        <div class="mighty-post-stat-comment"><span class="mighty-post-stat-comment-count">0</span></div>`;
+    feed.prepend(li);
+}
+insert();
+setInterval(insert, EVERY_MS);
+</script>
+</body></html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live watch latency benchmark")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--every", type=float, default=5)
+    args = parser.parse_args()
+
+    from playwright.sync_api import sync_playwright
+    from modules.tradingedge_scraper import scraper as scraper_module
+
+    html = LIVE_FEED_HTML.replace("EVERY_MS", str(int(args.every * 1000)))
+    tmp = tempfile.mkdtemp()
+    with FeedStub([], html) as stub, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        url = f"{stub.url}/feed"
+        scraper = scraper_module.Scraper(
+            None,
+            url=url,
+            ingestion="dom",
+            block_resources=False,
+            live_watch=True,
+        )
+        scraper.feed_state = FeedState(url, os.path.join(tmp, "feed_state.json"))
+        scraper.session = SessionStore(os.path.join(tmp, "session.json"))
+        scraper.storage = CollectingRepository()
+        context = scraper.open_context(browser)
+        scraper.scrape_posts()
+        timer = scraper.watch(args.seconds)
+        context.close()
+        browser.close()
+
+    count, total, longest = timer.spans.get("appearance_to_storage", [0, 0.0, 0.0])
+    print(f"live posts stored: {count}")
+    if count:
+        print(f"appearance to storage: {total / count:.2f}s mean, {longest:.2f}s max")
+    print(f"reload polling: up to {scraper.polling_rate}s")
+
+
+if __name__ == "__main__":
+    main()
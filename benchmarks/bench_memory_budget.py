@@ -0,0 +1,83 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.bench_feed_api import (
+    CollectingRepository,
+    FeedStub,
+    load_fixture_pages,
+    synthetic_pages,
+)
+from modules.tradingedge_scraper.session import SessionStore
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_memory_budget --cycles 50 --pages 40
+# Runs full depth cycles against the feed stub, once with the memory budget and
+# once without it, and prints the Python and browser RSS after every cycle.
+# Needs a Playwright Chromium (python -m playwright install chromium).
+
+
+def run(browser, url, cycles, budget):
+    from modules.tradingedge_scraper import scraper as scraper_module
+
+    scraper = scraper_module.Scraper(
+        None,
+        url=url,
+        incremental=False,
+        adaptive_polling=False,
+        block_resources=False,
+        prune_dom=budget,
+        recycle_after_cycles=max(1, cycles // 5) if budget else 0,
+        browser_rss_watermark=0,
+    )
+    scraper.storage = CollectingRepository()
+    scraper.session = SessionStore(os.path.join(tempfile.mkdtemp(), "session.json"))
+    context = scraper.open_context(browser)
+    history = []
+    for _ in range(cycles):
+        scraper.scrape_posts()
+        history.append((scraper.python_rss, scraper.browser_rss))
+        if scraper.recycle_reason() is not None:
+            context = scraper.recycle_context(browser, context)
+        else:
+            scraper.page.reload(wait_until="networkidle")
+    context.close()
+    return history, len(scraper.storage.posts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory budget benchmark")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    from playwright.sync_api import sync_playwright
+
+    with FeedStub(
+        synthetic_pages(load_fixture_pages(), args.pages)
+    ) as stub, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        results = {}
+        for name, budget in (("no budget", False), ("budget", True)):
+            start = time.perf_counter()
+            history, posts = run(browser, f"{stub.url}/feed", args.cycles, budget)
+            results[name] = history
+            print(
+                f"{name}: {posts} posts per cycle, {time.perf_counter() - start:.1f}s"
+            )
+        browser.close()
+
+    print("cycle  no budget (python/browser MB)  budget (python/browser MB)")
+    for cycle, (plain, budgeted) in enumerate(
+        zip(results["no budget"], results["budget"]), 1
+    ):
+        print(
+            f"{cycle:5}  {plain[0] / 1e6:8.0f} / {plain[1] / 1e6:6.0f}"
+            f"            {budgeted[0] / 1e6:8.0f} / {budgeted[1] / 1e6:6.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
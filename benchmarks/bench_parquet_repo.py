@@ -0,0 +1,137 @@
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from modules.repository.parquet_repo import ParquetRepository
+from modules.repository.repository_interface import PostData
+from modules.repository.sqlite3_repo import Sqlite3Repository
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_parquet_repo --posts 1000000
+
+TICKERS = ["AAPL", "TSLA", "NVDA", "AMD", "MSFT", "META", "AMZN", "GOOG", "PLTR"]
+
+
+def synthetic_posts(count, days, seed=42):
+    # Sorted by date like the scraper produces them, about count / days posts per day
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    step = days * 86400 / count
+    for i in range(count):
+        posted = start + datetime.timedelta(seconds=int(i * step))
+        tickers = ", ".join(rng.sample(TICKERS, rng.randint(0, 3)))
+        yield PostData(
+            likes=rng.randint(0, 500),
+            comments=rng.randint(0, 50),
+            id=f"{i:09d}",
+            posted_date=posted.strftime("%Y-%m-%d %H:%M:%S"),
+            author=f"author{rng.randint(0, 200)}",
+            title=f"Post {i} about {tickers or 'the market'}",
+            description="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6,
+            link=f"https://tradingedge.club/posts/{i}",
+            category=f"category{rng.randint(0, 8)}",
+            ticker_notification_sent=tickers.split(", ")[0] if tickers else None,
+            found_tickers=tickers or None,
+        )
+
+
+def load(repo, posts, batch_size):
+    batch = []
+    for post in posts:
+        batch.append(post)
+        if len(batch) == batch_size:
+            repo.upsert_posts(batch)
+            batch = []
+    if batch:
+        repo.upsert_posts(batch)
+
+
+def timed(fn, repeat=3):
+    # best of repeat runs, reads are warm after the first one
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ParquetRepository vs Sqlite3Repository"
+    )
+    parser.add_argument("--posts", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch", type=int, default=10000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_parquet_")
+    try:
+        repos = {
+            "sqlite3": Sqlite3Repository(
+                preloaded_credentials={
+                    "sqlite3_file": os.path.join(workdir, "scraper.db")
+                }
+            ),
+            "parquet": ParquetRepository(
+                preloaded_credentials={"parquet_dir": os.path.join(workdir, "parquet")},
+                compaction=False,
+            ),
+        }
+        print(f"posts: {args.posts}, days: {args.days}, batch: {args.batch}")
+        for name, repo in repos.items():
+            _, elapsed = timed(
+                lambda: load(repo, synthetic_posts(args.posts, args.days), args.batch),
+                repeat=1,
+            )
+            print(
+                f"{name:>8} load: {elapsed:.1f}s ({args.posts / elapsed:.0f} posts/s)"
+            )
+        _, elapsed = timed(repos["parquet"].compact, repeat=1)
+        print(f"{'parquet':>8} compaction: {elapsed:.1f}s")
+
+        end = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=args.days)
+        since = end - datetime.timedelta(days=30)
+        columns = ["title", "posted_date", "found_tickers"]
+        queries = {
+            "last 30 days, 3 columns": lambda repo: len(
+                repo.get_feed(since=since, columns=columns)
+            ),
+            "count last 30 days": lambda repo: repo.count_feed(since=since),
+            "one page of 50": lambda repo: len(repo.get_feed(limit=50, offset=100)),
+            "ticker NVDA, 30 days": lambda repo: len(
+                repo.get_feed_for_ticker("NVDA", since=since)
+            ),
+        }
+        print(f"{'query':<26} {'sqlite3':>10} {'parquet':>10} {'rows':>8}")
+        for label, query in queries.items():
+            results = {}
+            times = {}
+            for name, repo in repos.items():
+                results[name], times[name] = timed(lambda: query(repo))
+            assert results["sqlite3"] == results["parquet"], results
+            print(
+                f"{label:<26} {times['sqlite3'] * 1000:>8.1f}ms "
+                f"{times['parquet'] * 1000:>8.1f}ms {results['parquet']:>8}"
+            )
+        size = sum(
+            os.path.getsize(os.path.join(path, name))
+            for path, _, names in os.walk(os.path.join(workdir, "parquet"))
+            for name in names
+        )
+        print(
+            f"on disk: sqlite3 {os.path.getsize(os.path.join(workdir, 'scraper.db')) / 1e6:.0f}MB, "
+            f"parquet {size / 1e6:.0f}MB"
+        )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.bench_feed_api import FEED_HTML, load_fixture_pages, synthetic_pages
+from modules.repository.repository_interface import UpsertResult
+from modules.tradingedge_scraper.feed_state import FeedState
+from modules.tradingedge_scraper.replay import SITE_URL, ReplayServer
+from modules.tradingedge_scraper.session import SessionStore
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_replay --cycles 3 --pages 20
+# python -m benchmarks.bench_replay --har benchmarks/fixtures/replay/personal_feed.har
+# Replays a HAR (by default a synthetic one built from the feed API fixtures) to
+# the unchanged Scraper through a ReplayServer, so it runs without credentials or
+# network, e.g. in CI after python -m playwright install chromium.
+
+FEED_PATH = "/members/29038203/feed"
+DETAIL_HTML = """<!DOCTYPE html>
+<html><body><div class="detail-layout-description">{description}</div></body></html>
+"""
+
+
+def har_entry(url, body, mime_type):
+    return {
+        "request": {"method": "GET", "url": url, "headers": []},
+        "response": {
+            "status": 200,
+            "headers": [{"name": "Content-Type", "value": mime_type}],
+            "content": {"mimeType": mime_type, "text": body},
+        },
+    }
+
+
+def synthetic_har(path, pages):
+    # The feed stub of bench_feed_api as if it was recorded from the site
+    entries = [har_entry(f"{SITE_URL}{FEED_PATH}", FEED_HTML, "text/html")]
+    for number, page in enumerate(pages, 1):
+        entries.append(
+            har_entry(
+                f"{SITE_URL}/api/v1/networks/1/feed?page={number}",
+                json.dumps(page),
+                "application/json",
+            )
+        )
+        for item in page["items"]:
+            entries.append(
+                har_entry(
+                    item["permalink"],
+                    DETAIL_HTML.format(description=item["description"]),
+                    "text/html",
+                )
+            )
+    with open(path, "w") as f:
+        json.dump({"log": {"version": "1.2", "entries": entries}}, f)
+    return path
+
+
+class CountingProxy:
+    # Counts every Playwright call made through a page, and through the element
+    # handles and locators it returns
+    def __init__(self, target, counts):
+        self._target = target
+        self._counts = counts
+
+    def _wrap(self, result):
+        if isinstance(result, list):
+            return [self._wrap(item) for item in result]
+        if type(result).__module__.startswith("playwright"):
+            return CountingProxy(result, self._counts)
+        return result
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self._counts[name] = self._counts.get(name, 0) + 1
+            return self._wrap(attribute(*args, **kwargs))
+
+        return call
+
+
+class CountingRepository:
+    def __init__(self):
+        self.writes = 0
+        self.posts = 0
+
+    def upsert_posts(self, posts):
+        self.writes += 1
+        self.posts += len(posts)
+        return UpsertResult(inserted=len(posts), updated=0)
+
+
+def run(har_path, cycles, url):
+    from playwright.sync_api import sync_playwright
+    from modules.tradingedge_scraper import scraper as scraper_module
+
+    tmp = tempfile.mkdtemp()
+    results = []
+    with ReplayServer(har_path) as server, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        scraper = scraper_module.Scraper(
+            None,
+            url=url,
+            site_url=server.url,
+            adaptive_polling=False,
+        )
+        scraper.feed_state = FeedState(scraper.url, os.path.join(tmp, "state.json"))
+        scraper.session = SessionStore(os.path.join(tmp, "session.json"))
+        scraper.storage = CountingRepository()
+        context = scraper.open_context(browser)
+        for cycle in range(cycles):
+            counts = {}
+            page = scraper.page
+            scraper.page = CountingProxy(page, counts)
+            writes = scraper.storage.writes
+            full = cycle == 0
+            scraper.scrape_posts(full=full)
+            scraper.page = page
+            timer = scraper.timer
+            posts = timer.counters.get("posts", 0)
+            waits = timer.spans.get("wait_for_posts", [0, 0.0, 0.0])
+            results.append(
+                {
+                    "cycle": "full" if full else "incremental",
+                    "posts": posts,
+                    "seconds": timer.elapsed(),
+                    "posts_per_second": posts / timer.elapsed(),
+                    "scroll_waits": waits[0],
+                    "scroll_wait_seconds": waits[1],
+                    "scroll_timeouts": timer.counters.get("scroll_timeouts", 0),
+                    "playwright_calls": sum(counts.values()),
+                    "playwright_calls_per_post": sum(counts.values()) / max(1, posts),
+                    "db_writes": scraper.storage.writes - writes,
+                }
+            )
+            scraper.page.reload(wait_until="networkidle")
+        context.close()
+        browser.close()
+        if server.misses:
+            print(f"not recorded: {sorted(set(server.misses))[:10]}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper throughput benchmark")
+    parser.add_argument(
+        "--har", help="recorded HAR, see modules.tradingedge_scraper.replay"
+    )
+    parser.add_argument("--url", default=f"{SITE_URL}{FEED_PATH}")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    har_path = args.har
+    if har_path is None:
+        har_path = synthetic_har(
+            os.path.join(tempfile.mkdtemp(), "feed.har"),
+            synthetic_pages(load_fixture_pages(), args.pages),
+        )
+    results = run(har_path, args.cycles, args.url)
+
+    print(
+        f"{'cycle':<12} {'posts':>6} {'posts/s':>8} {'waits':>6} {'wait s':>7} "
+        f"{'timeouts':>8} {'pw calls/post':>13} {'db writes':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['cycle']:<12} {result['posts']:>6} "
+            f"{result['posts_per_second']:>8.1f} {result['scroll_waits']:>6} "
+            f"{result['scroll_wait_seconds']:>7.2f} {result['scroll_timeouts']:>8} "
+            f"{result['playwright_calls_per_post']:>13.2f} {result['db_writes']:>9}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
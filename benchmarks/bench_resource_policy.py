@@ -0,0 +1,219 @@
+import argparse
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from modules.tradingedge_scraper.instrumentation import tree_rss_bytes
+from modules.tradingedge_scraper.resource_policy import (
+    RequestBlocker,
+    ResourcePolicy,
+    install_blocker,
+)
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_resource_policy --profile --reloads 10
+# Without --profile only the policy checks run, the profile needs a Playwright
+# Chromium (python -m playwright install chromium).
+
+POSTS = 40
+ANALYTICS_DELAY = 0.3  # seconds, a slow third-party script delays networkidle
+
+# A feed page with what the real site loads next to the posts: avatars and post
+# images, a web font, a video embed and an analytics script from a third party
+FEED_HTML = """<!DOCTYPE html>
+<html><head>
+<style>
+@font-face {{ font-family: "Feed"; src: url("/static/feed.woff2") format("woff2"); }}
+body {{ font-family: "Feed", sans-serif; }}
+</style>
+<script src="/third-party/analytics.js"></script>
+</head><body>
+<ul class="feed">{items}</ul>
+<video src="/static/intro.mp4" autoplay muted></video>
+<script>fetch("/api/v1/networks/1/feed?page=1").then((r) => r.json());</script>
+</body></html>
+"""
+ITEM_HTML = """<li class="feed-item" data-post-id="{id}">
+<img class="avatar" src="/static/avatar-{avatar}.png">
+<div class="feed-item-post-description">Post {id} about $SPY and $QQQ</div>
+<img src="/static/post-{id}.jpg">
+</li>"""
+
+STATIC_SIZES = {
+    ".png": ("image/png", 8_000),
+    ".jpg": ("image/jpeg", 120_000),
+    ".woff2": ("font/woff2", 40_000),
+    ".mp4": ("video/mp4", 2_000_000),
+}
+
+# The fixture's third party is served from the same host, so its path is blocked
+PROFILE_POLICY = ResourcePolicy().with_overrides(block_patterns=[r"/third-party/"])
+NO_BLOCKING = ResourcePolicy(blocked_types=set(), blocked_patterns=[])
+
+
+class FixtureSite:
+    def __init__(self):
+        items = "".join(
+            ITEM_HTML.format(id=100 + i, avatar=i % 8) for i in range(POSTS)
+        )
+        page = FEED_HTML.format(items=items).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                extension = os.path.splitext(path)[1]
+                if path == "/feed":
+                    content_type, body = "text/html", page
+                elif path.startswith("/third-party/"):
+                    time.sleep(ANALYTICS_DELAY)
+                    content_type, body = "text/javascript", b"window.tracked = 1;"
+                elif path.startswith("/api/"):
+                    content_type, body = "application/json", b'{"items": []}'
+                elif extension in STATIC_SIZES:
+                    content_type, size = STATIC_SIZES[extension]
+                    body = b"\0" * size
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+
+class FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = FakeRequest(resource_type, url)
+        self.aborted = False
+
+    def abort(self):
+        self.aborted = True
+
+    def continue_(self):
+        pass
+
+
+def check_policy():
+    policy = ResourcePolicy()
+    assert policy.should_block("image", "https://cdn.tradingedge.club/a.png")
+    assert policy.should_block("script", "https://www.googletagmanager.com/gtm.js")
+    # the feed itself is never blocked
+    assert not policy.should_block("xhr", "https://tradingedge.club/api/v1/feed")
+    assert not policy.should_block("fetch", "https://tradingedge.club/api/v1/feed")
+    assert not policy.should_block("document", "https://tradingedge.club/feed")
+    overridden = policy.with_overrides(
+        allow_types=["image"], allow_patterns=[r"hotjar"]
+    )
+    assert not overridden.should_block("image", "https://cdn.tradingedge.club/a.png")
+    assert not overridden.should_block("script", "https://static.hotjar.com/c.js")
+    assert policy.should_block("image", "https://cdn.tradingedge.club/a.png")
+
+    blocker = RequestBlocker(policy)
+    for resource_type, url in [
+        ("image", "https://cdn.tradingedge.club/a.png"),
+        ("image", "https://cdn.tradingedge.club/b.png"),
+        ("font", "https://cdn.tradingedge.club/f.woff2"),
+        ("xhr", "https://tradingedge.club/api/v1/feed"),
+    ]:
+        route = FakeRoute(resource_type, url)
+        blocker.route(route)
+        assert route.aborted == (resource_type != "xhr")
+    assert blocker.blocked == {"image": 2, "font": 1}
+    assert blocker.allowed == {"xhr": 1}
+    assert blocker.bytes_saved() == 2 * 40_000 + 30_000
+    blocker.reset()
+    assert blocker.blocked == {} and blocker.allowed == {}
+    print("policy: ok")
+
+
+def profile(browser_type, url, policy, reloads):
+    browser = browser_type.launch(headless=True)
+    context = browser.new_context()
+    blocker = install_blocker(context, policy)
+    page = context.new_page()
+    page.goto(url, wait_until="networkidle")
+    blocker.reset()
+    latencies = []
+    for _ in range(reloads):
+        start = time.perf_counter()
+        page.reload(wait_until="networkidle")
+        latencies.append(time.perf_counter() - start)
+    # this process, the Playwright driver and all Chromium processes
+    rss = tree_rss_bytes()
+    result = {
+        "reload": statistics.median(latencies),
+        "rss": rss,
+        "blocked": dict(blocker.blocked),
+        "allowed": dict(blocker.allowed),
+        "bytes_allowed": blocker.bytes_allowed(),
+        "bytes_saved": blocker.bytes_saved(),
+    }
+    browser.close()
+    return result
+
+
+def print_profile(name, result, reloads):
+    print(
+        f"{name:<12} reload {result['reload'] * 1000:7.1f}ms (median)  "
+        f"rss {result['rss'] / 1e6:7.1f}MB  "
+        f"~{result['bytes_saved'] / 1e6 / reloads:.2f}MB saved per reload"
+    )
+    for resource_type in sorted(set(result["blocked"]) | set(result["allowed"])):
+        print(
+            f"  {resource_type:<12} blocked {result['blocked'].get(resource_type, 0):5}"
+            f"  allowed {result['allowed'].get(resource_type, 0):5}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request blocking benchmark")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--reloads", type=int, default=10)
+    args = parser.parse_args()
+
+    check_policy()
+    if not args.profile:
+        return
+
+    from playwright.sync_api import sync_playwright
+
+    with FixtureSite() as site, sync_playwright() as p:
+        url = f"{site.url}/feed"
+        unblocked = profile(p.chromium, url, NO_BLOCKING, args.reloads)
+        blocked = profile(p.chromium, url, PROFILE_POLICY, args.reloads)
+    print_profile("no blocking", unblocked, args.reloads)
+    print_profile("blocking", blocked, args.reloads)
+    print(
+        f"reload {unblocked['reload'] / blocked['reload']:.1f}x faster, "
+        f"rss {(unblocked['rss'] - blocked['rss']) / 1e6:.1f}MB lower"
+    )
+
+
+if __name__ == "__main__":
+    main()
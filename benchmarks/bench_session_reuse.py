@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.bench_feed_api import (
+    FEED_HTML,
+    CollectingRepository,
+    load_fixture_pages,
+    synthetic_pages,
+)
+from modules.tradingedge_scraper.feed_api import FeedResponseCollector
+from modules.tradingedge_scraper.session import SessionStore, is_signed_out
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_session_reuse --starts 3
+# Needs a Playwright Chromium (python -m playwright install chromium).
+
+SIGN_IN_DELAY = 1.0  # seconds the stub takes to check a password
+SESSION_COOKIE = "session=valid"
+
+SIGN_IN_HTML = b"""<!DOCTYPE html>
+<html><body>
+<form method="post" action="/sign_in">
+<input name="email"><input name="password" type="password">
+<button type="submit">Sign In</button>
+</form>
+</body></html>
+"""
+
+
+class SignInStub:
+    # The feed stub of bench_feed_api behind a cookie session, like tradingedge.club
+    def __init__(self, pages):
+        self.logins = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send(self, status, body=b"", content_type="text/html", headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(SIGN_IN_DELAY)
+                stub.logins += 1
+                self.send(
+                    302,
+                    headers=[
+                        ("Set-Cookie", f"{SESSION_COOKIE}; Path=/"),
+                        ("Location", "/spaces/1"),
+                    ],
+                )
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/sign_in":
+                    self.send(200, SIGN_IN_HTML)
+                elif SESSION_COOKIE not in self.headers.get("Cookie", ""):
+                    self.send(302, headers=[("Location", "/sign_in")])
+                elif url.path == "/spaces/1":
+                    self.send(200, b"<html><body>Space</body></html>")
+                elif url.path == "/feed":
+                    self.send(200, FEED_HTML.encode())
+                else:
+                    number = int(parse_qs(url.query).get("page", ["1"])[0])
+                    body = json.dumps(pages[number - 1]).encode()
+                    self.send(200, body, "application/json")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start(browser, url, session):
+    # The startup of Scraper.run up to the end of the first cycle
+    from modules.tradingedge_scraper import scraper as scraper_module
+
+    scraper = scraper_module.Scraper(
+        None, url=url, incremental=False, block_resources=False
+    )
+    scraper.session = session
+    scraper.storage = CollectingRepository()
+    scraper.website_credentials = {"email": "bench@example.com", "password": "x"}
+    scraper.started = time.perf_counter()
+    context = browser.new_context(storage_state=session.load())
+    scraper.page = context.new_page()
+    scraper.collector = FeedResponseCollector()
+    scraper.page.on("response", scraper.collector.on_response)
+    scraper.open_feed(context)
+    assert not is_signed_out(scraper.page.url)
+    scraper.scrape_posts()
+    context.close()
+    return scraper.time_to_first_post
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session reuse benchmark")
+    parser.add_argument("--starts", type=int, default=3)
+    args = parser.parse_args()
+
+    from playwright.sync_api import sync_playwright
+
+    pages = synthetic_pages(load_fixture_pages(), 2)
+    with tempfile.TemporaryDirectory() as tmp, SignInStub(
+        pages
+    ) as stub, sync_playwright() as p:
+        session = SessionStore(os.path.join(tmp, "browser_session.json"))
+        browser = p.chromium.launch(headless=True)
+        url = f"{stub.url}/feed"
+        cold = []
+        for _ in range(args.starts):
+            session.clear()
+            cold.append(start(browser, url, session))
+        warm = [start(browser, url, session) for _ in range(args.starts)]
+        browser.close()
+
+    print(f"sign ins: {stub.logins} for {args.starts} cold starts")
+    print(f"cold start, time to first post: {min(cold):.2f}s")
+    print(f"warm start, time to first post: {min(warm):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
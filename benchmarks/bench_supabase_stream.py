@@ -0,0 +1,67 @@
+import argparse
+import time
+
+from modules.repository.supabase_repo import SupabaseRepository
+from .postgrest_stub import PostgrestStub, synthetic_posts
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_supabase_stream --rows 50000 --latency 0.02
+
+
+def connect(stub):
+    return SupabaseRepository(
+        preloaded_credentials={
+            "supabase_url": stub.url,
+            # the client only checks that the key looks like a JWT
+            "supabase_api_key": "stub.stub.stub",
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SupabaseRepository streaming reads")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds/request")
+    parser.add_argument("--page-sizes", default="250,500,1000")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    args = parser.parse_args()
+
+    rows = synthetic_posts(args.rows)
+    print(f"rows: {args.rows}, simulated latency: {args.latency * 1000:.0f}ms/request")
+    print(
+        f"{'page size':>10} {'workers':>8} {'requests':>9} {'seconds':>8} {'rows/s':>10}"
+    )
+    with PostgrestStub(rows, latency=args.latency) as stub:
+        repo = connect(stub)
+        for page_size in [int(v) for v in args.page_sizes.split(",")]:
+            for concurrency in [int(v) for v in args.concurrency.split(",")]:
+                start = time.perf_counter()
+                received = sum(
+                    len(chunk)
+                    for chunk in repo.iter_feed(
+                        page_size=page_size, concurrency=concurrency
+                    )
+                )
+                elapsed = time.perf_counter() - start
+                assert received == args.rows, received
+                print(
+                    f"{page_size:>10} {concurrency:>8} "
+                    f"{repo.last_fetch_report['requests']:>9} {elapsed:>8.3f} "
+                    f"{received / elapsed:>10.0f}"
+                )
+
+    # A server with a lower max-rows than the page size must not truncate the result
+    with PostgrestStub(rows, max_rows=300) as stub:
+        repo = connect(stub)
+        feed = repo.get_feed()
+        report = repo.last_fetch_report
+        assert len(feed) == args.rows, len(feed)
+        print(
+            f"max-rows=300 with page size 1000: {len(feed)} rows in "
+            f"{report['requests']} requests, {report['short_pages']} short page(s) detected"
+        )
+
+
+if __name__ == "__main__":
+    main()
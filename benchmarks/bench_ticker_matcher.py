@@ -0,0 +1,86 @@
+import argparse
+import random
+import re
+import time
+
+from modules.settings import Settings
+from modules.tradingedge_scraper.ticker_matcher import TickerMatcher
+
+
+# Run from the repository root with:
+# python -m benchmarks.bench_ticker_matcher --posts 5000
+
+
+def legacy_find_tickers_in_text(article_text, valid_tickers, watchlist_positions):
+    # Copy of the original list based implementation, kept as the baseline
+    possible_tickers = re.findall(r"(?:^|\b)[A-Z]{1,7}(?:\b|$)", article_text)
+    found = [t for t in possible_tickers if t in valid_tickers]
+    watched = [t for t in found if t in watchlist_positions]
+    return list(set(watched)), list(set(found))
+
+
+def build_posts(tickers, count, words_per_post, seed=42):
+    rng = random.Random(seed)
+    words = [
+        "the",
+        "market",
+        "is",
+        "looking",
+        "strong",
+        "I",
+        "bought",
+        "more",
+        "calls",
+        "on",
+        "earnings",
+        "CEO",
+        "USA",
+        "AI",
+        "breakout",
+        "support",
+    ]
+    posts = []
+    for _ in range(count):
+        tokens = [
+            rng.choice(tickers) if rng.random() < 0.08 else rng.choice(words)
+            for _ in range(words_per_post)
+        ]
+        posts.append(" ".join(tokens))
+    return posts
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find_tickers_in_text benchmark")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    tickers = Settings.fetch_tickers_list()
+    watchlist = Settings.get_setting("watchlist_positions") or []
+    posts = build_posts(tickers, args.posts, args.words)
+
+    legacy, legacy_time = timed(
+        lambda: [legacy_find_tickers_in_text(p, tickers, watchlist) for p in posts]
+    )
+    matcher, build_time = timed(lambda: TickerMatcher(tickers, watchlist))
+    batched, batch_time = timed(lambda: matcher.match_many(posts))
+
+    for (old_watched, old_found), (new_watched, new_found) in zip(legacy, batched):
+        assert set(old_watched) == set(new_watched)
+        assert set(old_found) == set(new_found)
+
+    print(f"posts: {len(posts)}, words per post: {args.words}")
+    print(f"legacy find_tickers_in_text: {legacy_time:.3f}s")
+    print(f"TickerMatcher build:         {build_time * 1000:.2f}ms")
+    print(f"TickerMatcher.match_many:    {batch_time:.3f}s")
+    print(f"speedup: {legacy_time / batch_time:.1f}x (results identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Minimal PostgREST compatible server for the posts table, enough for the range
+# paginated reads of SupabaseRepository. Filters other than eq on content_parsed are
+# ignored, rows are served in the order they were generated.
+
+
+def synthetic_posts(count):
+    return [
+        {
+            "id": f"{i:08d}",
+            "author": f"author{i % 50}",
+            "title": f"Post {i} about AAPL",
+            "description": "Lorem ipsum dolor sit amet, " * 8,
+            "posted_date": f"2025-01-{1 + i % 28:02d} {i % 24:02d}:00:00",
+            "likes": i % 100,
+            "comments": i % 10,
+            "link": f"https://tradingedge.club/posts/{i}",
+            "category": f"category{i % 5}",
+            "content_parsed": False,
+            "tickers_notifications_sent": "",
+            "found_tickers": "AAPL",
+        }
+        for i in range(count)
+    ]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, with_body):
+        server = self.server
+        # postgrest-py sends a json body even with GET, drain it to keep the connection usable
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        url = urlparse(self.path)
+        if not url.path.startswith("/rest/v1/"):
+            self.send_error(404)
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        rows = server.rows
+        if params.get("content_parsed") in ("eq.false", "eq.False"):
+            rows = [row for row in rows if not row["content_parsed"]]
+        total = len(rows)
+        start = int(params.get("offset", 0))
+        limit = int(params.get("limit", total))
+        if server.max_rows is not None:
+            limit = min(limit, server.max_rows)
+        page = rows[start : start + limit]
+        select = params.get("select")
+        if select and select != "*":
+            columns = select.split(",")
+            page = [{c: row.get(c) for c in columns} for row in page]
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        body = json.dumps(page).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        range_header = f"{start}-{start + len(page) - 1}" if page else "*"
+        if "count=" in (self.headers.get("Prefer") or ""):
+            self.send_header("Content-Range", f"{range_header}/{total}")
+        else:
+            self.send_header("Content-Range", f"{range_header}/*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+
+class PostgrestStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, rows, max_rows=None, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.rows = rows
+        self.max_rows = max_rows
+        self.latency = latency
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
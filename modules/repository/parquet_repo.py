@@ -0,0 +1,794 @@
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from loguru import logger
+from typing import List
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from config import LOCAL_DIR
+from .repository_interface import (
+    PostRepository,
+    PostData,
+    UpsertResult,
+    Changes,
+    CHANGE_COLUMNS,
+    SEARCH_COLUMNS,
+    TRENDING_COLUMNS,
+    ENGAGEMENT_WINDOW,
+    check_feed_columns,
+    downsample_engagement_frame,
+    highlight_snippet,
+    momentum,
+    search_terms,
+    to_observed_at,
+    to_posted_date,
+    utc_now,
+)
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # Windows locks byte ranges with msvcrt instead
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_PARQUET_DIR = os.path.join(LOCAL_DIR, "parquet")
+COMPACTION_INTERVAL = 60  # seconds
+COMPACTION_MIN_FILES = 8  # partitions with more small files than this get compacted
+UNKNOWN_DAY = "unknown"
+
+POSTS_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("author", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("posted_date", pa.string()),
+        ("date", pa.string()),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+        ("link", pa.string()),
+        ("category", pa.string()),
+        ("content_parsed", pa.bool_()),
+        ("ticker_notification_sent", pa.string()),
+        ("found_tickers", pa.string()),
+        ("change_seq", pa.int64()),
+        # every write of a post gets a new version, reads keep the highest one
+        ("_version", pa.int64()),
+    ]
+)
+# Likes and comments history, a row whenever the counts of a post change
+ENGAGEMENT_SCHEMA = pa.schema(
+    [
+        ("post_id", pa.string()),
+        ("observed_at", pa.string()),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+    ]
+)
+ENGAGEMENT_PARTITIONING = ds.partitioning(
+    pa.schema([("observed_day", pa.string())]), flavor="hive"
+)
+PARTITIONING = ds.partitioning(pa.schema([("posted_day", pa.string())]), flavor="hive")
+# Columns that never change once a post is stored. Filters on them can be pushed
+# down into the scan, filters on anything else are applied after deduplication.
+IMMUTABLE_COLUMNS = {"id", "author", "posted_date", "link", "category", "posted_day"}
+CONTENT_COLUMNS = ["title", "description", "ticker_notification_sent", "found_tickers"]
+
+
+def _db_column(column: str) -> str:
+    return "ticker_notification_sent" if column == "watched_tickers" else column
+
+
+def _posted_day(posted_date) -> str:
+    return posted_date[:10] if posted_date else UNKNOWN_DAY
+
+
+def _lock_file(lock_file):
+    # Blocks until this process holds the exclusive lock on lock_file
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            # LK_LOCK itself only retries for about 10 seconds
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PrebuildHook(PostRepository, type):
+    def __call__(cls, *args, **kwargs):
+        logger.info("Pre-object build hook (metaclass) executing...")
+        credentials = kwargs.get(
+            "preloaded_credentials", {"parquet_dir": DEFAULT_PARQUET_DIR}
+        )
+        storage = credentials.get("parquet_dir", DEFAULT_PARQUET_DIR)
+
+        instance = super().__call__(storage, *args, **kwargs)
+
+        return instance
+
+
+class ParquetRepository(metaclass=PrebuildHook):
+    """
+    Serverless storage in date partitioned Parquet files.
+
+    Posts live in posts/posted_day=YYYY-MM-DD/ directories. Every write appends a
+    small file with new row versions, a background thread compacts partitions that
+    collected many small files into one. Reads prune partitions by date, only
+    load the requested columns and keep the newest version of each post.
+    Writers in different processes (scraper, bot) are serialized with a file lock.
+    Changes of likes and comments are appended to engagement/observed_day=.../
+    the same way, the compaction thread also downsamples old engagement samples.
+    """
+
+    def __init__(self, storage, preloaded_credentials=None, compaction=True):
+        self.root = storage
+        self.posts_dir = os.path.join(self.root, "posts")
+        self.engagement_dir = os.path.join(self.root, "engagement")
+        os.makedirs(self.posts_dir, exist_ok=True)
+        self._meta_path = os.path.join(self.root, "_meta.json")
+        self._cursors_path = os.path.join(self.root, "_cursors.json")
+        self._lock_path = os.path.join(self.root, "_lock")
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._meta = self._read_json(self._meta_path, {"version": 0, "change_seq": 0})
+        if not os.path.isdir(self.engagement_dir):
+            # Posts stored before the history existed start with their current counts
+            with self._writing():
+                os.makedirs(self.engagement_dir, exist_ok=True)
+                self._append_engagement(self._read(["likes", "comments"]))
+        self._stop = threading.Event()
+        self._compactor = None
+        if compaction:
+            self._compactor = threading.Thread(
+                target=self._compaction_loop, daemon=True
+            )
+            self._compactor.start()
+
+    @staticmethod
+    def _read_json(path, default):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    # ---------------------------------------------------------------- reading
+
+    def _dataset(self, days=None):
+        # days limits the scan to these partitions without listing the others
+        if days is not None:
+            paths = [
+                os.path.join(self.posts_dir, f"posted_day={day}") for day in set(days)
+            ]
+            files = [
+                os.path.join(path, name)
+                for path in paths
+                if os.path.isdir(path)
+                for name in os.listdir(path)
+                if name.endswith(".parquet")
+            ]
+            return ds.dataset(
+                files,
+                schema=POSTS_SCHEMA.append(pa.field("posted_day", pa.string())),
+                format="parquet",
+                partitioning=PARTITIONING,
+                partition_base_dir=self.posts_dir,
+            )
+        return ds.dataset(
+            self.posts_dir,
+            schema=POSTS_SCHEMA.append(pa.field("posted_day", pa.string())),
+            format="parquet",
+            partitioning=PARTITIONING,
+            exclude_invalid_files=False,
+        )
+
+    def _days(self, descending=True):
+        # Partition names in posted_date order, posts without a date come last
+        days = sorted(
+            entry.split("=", 1)[1]
+            for entry in os.listdir(self.posts_dir)
+            if entry.startswith("posted_day=")
+        )
+        dated = [day for day in days if day != UNKNOWN_DAY]
+        if descending:
+            dated.reverse()
+        return dated + [day for day in days if day == UNKNOWN_DAY]
+
+    def _read(self, columns, filter=None, days=None) -> pd.DataFrame:
+        # Latest version of every post matching the (immutable column) filter
+        columns = list(dict.fromkeys(["id", "_version"] + list(columns)))
+        for attempt in range(3):
+            try:
+                table = self._dataset(days).to_table(columns=columns, filter=filter)
+                break
+            except FileNotFoundError:
+                # a compaction replaced files during the scan, scan again
+                if attempt == 2:
+                    raise
+                time.sleep(0.05)
+        df = table.to_pandas()
+        if df.empty:
+            return df
+        df = df.sort_values("_version").drop_duplicates("id", keep="last")
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def _date_filter(since, until):
+        expression = None
+        if since is not None:
+            since = to_posted_date(since)
+            expression = (pc.field("posted_day") >= since[:10]) & (
+                pc.field("posted_date") >= since
+            )
+        if until is not None:
+            until = to_posted_date(until)
+            until_expression = (pc.field("posted_day") <= until[:10]) & (
+                pc.field("posted_date") < until
+            )
+            expression = (
+                until_expression
+                if expression is None
+                else expression & until_expression
+            )
+        return expression
+
+    def _feed_filter(self, since, until, categories, authors):
+        expression = self._date_filter(since, until)
+        for column, values in (("category", categories), ("author", authors)):
+            if values:
+                column_expression = pc.field(column).isin(list(values))
+                expression = (
+                    column_expression
+                    if expression is None
+                    else expression & column_expression
+                )
+        return expression
+
+    @staticmethod
+    def _to_feed_frame(df, columns) -> pd.DataFrame:
+        df = df.rename(columns={"ticker_notification_sent": "watched_tickers"})
+        df = df.reindex(columns=columns)
+        if "posted_date" in df.columns:
+            df["posted_date"] = pd.to_datetime(df["posted_date"])
+        return df.reset_index(drop=True)
+
+    def post_exists(self, id) -> bool:
+        return not self._read([], filter=pc.field("id") == str(id)).empty
+
+    def get_feed(
+        self,
+        since=None,
+        until=None,
+        categories=None,
+        authors=None,
+        columns=None,
+        order_by="posted_date",
+        descending=True,
+        limit=None,
+        offset=None,
+        after=None,
+    ) -> pd.DataFrame:
+        columns = check_feed_columns(columns, order_by)
+        order_column = _db_column(order_by)
+        read_columns = [_db_column(c) for c in columns + [order_by]]
+        filter = self._feed_filter(since, until, categories, authors)
+        if after is not None and order_by == "posted_date":
+            after = (to_posted_date(after[0]), after[1])
+            # posted_date never changes, so partitions past the cursor can be skipped
+            day_filter = (
+                pc.field("posted_day") <= after[0][:10]
+                if descending
+                else pc.field("posted_day") >= after[0][:10]
+            )
+            filter = day_filter if filter is None else filter & day_filter
+
+        def after_cursor(df):
+            if after is None:
+                return df
+            after_value, after_id = after
+            if descending:
+                keep = (df[order_column] < after_value) | (
+                    (df[order_column] == after_value) & (df["id"] < after_id)
+                )
+            else:
+                keep = (df[order_column] > after_value) | (
+                    (df[order_column] == after_value) & (df["id"] > after_id)
+                )
+            return df[keep]
+
+        start = int(offset or 0)
+        stop = None if limit is None else start + int(limit)
+        if stop is not None and order_by == "posted_date":
+            # Partitions are ordered by posted_date too, read them newest (or oldest)
+            # first and stop as soon as the requested page is covered
+            frames = []
+            found = 0
+            for day in self._days(descending):
+                df = after_cursor(self._read(read_columns, filter=filter, days=[day]))
+                if not df.empty:
+                    frames.append(df)
+                    found += len(df)
+                if found >= stop:
+                    break
+            df = pd.concat(frames) if frames else pd.DataFrame(columns=read_columns)
+        else:
+            df = after_cursor(self._read(read_columns, filter=filter))
+        if df.empty:
+            return self._to_feed_frame(df, columns)
+        df = df.sort_values(
+            [order_column, "id"], ascending=not descending, na_position="last"
+        )
+        return self._to_feed_frame(df.iloc[start:stop], columns)
+
+    def count_feed(self, since=None, until=None, categories=None, authors=None) -> int:
+        return len(
+            self._read([], filter=self._feed_filter(since, until, categories, authors))
+        )
+
+    def get_feed_for_ticker(self, ticker: str, since=None, limit=None) -> pd.DataFrame:
+        columns = [c for c in check_feed_columns(None, "posted_date")]
+        df = self._read(
+            [_db_column(c) for c in columns], filter=self._date_filter(since, None)
+        )
+        if df.empty:
+            return self._to_feed_frame(df, columns)
+        # found_tickers is stored as "AAPL, TSLA", match whole entries only
+        pattern = rf"(?:^|,)\s*{re.escape(ticker)}\s*(?:,|$)"
+        df = df[df["found_tickers"].str.contains(pattern, na=False)]
+        df = df.sort_values("posted_date", ascending=False, na_position="last")
+        if limit is not None:
+            df = df.head(int(limit))
+        return self._to_feed_frame(df, columns)
+
+    def get_unprocessed_posts(self) -> pd.DataFrame:
+        df = self._read(["title", "link", "ticker_notification_sent", "content_parsed"])
+        if df.empty:
+            return pd.DataFrame(
+                columns=["id", "title", "link", "ticker_notification_sent"]
+            )
+        df = df[~df["content_parsed"].fillna(False).astype(bool)]
+        return df[["id", "title", "link", "ticker_notification_sent"]].reset_index(
+            drop=True
+        )
+
+    def changes_since(self, cursor: int, limit: int = 1000) -> Changes:
+        # A newer version never has a lower change_seq, so the cursor filter can be
+        # pushed down into the scan before deduplication
+        columns = [_db_column(c) for c in CHANGE_COLUMNS]
+        if self._read_json(self._meta_path, self._meta)["change_seq"] <= int(cursor):
+            # nothing was written since cursor, consumers polling the feed skip the scan
+            df = pd.DataFrame(columns=columns)
+        else:
+            df = self._read(columns, filter=pc.field("change_seq") > int(cursor))
+        posts = self._to_feed_frame(
+            df.sort_values("change_seq").head(int(limit)) if not df.empty else df,
+            CHANGE_COLUMNS,
+        )
+        posts["content_parsed"] = posts["content_parsed"].fillna(False).astype(bool)
+        next_cursor = int(posts["change_seq"].iloc[-1]) if len(posts) else int(cursor)
+        return Changes(posts=posts, cursor=next_cursor)
+
+    def search(self, query: str, limit: int = 20, since=None) -> pd.DataFrame:
+        terms = search_terms(query)
+        if not terms:
+            return pd.DataFrame(columns=SEARCH_COLUMNS)
+        df = self._read(
+            ["author", "title", "description", "posted_date", "link", "category"],
+            filter=self._date_filter(since, None),
+        )
+        if df.empty:
+            return pd.DataFrame(columns=SEARCH_COLUMNS)
+        text = (df["title"].fillna("") + " " + df["description"].fillna("")).str.lower()
+        hits = pd.Series(0, index=df.index)
+        for term in terms:
+            term_hits = text.str.count(term.lower())
+            df = df[term_hits > 0]
+            text = text[term_hits > 0]
+            hits = hits[term_hits > 0] + term_hits[term_hits > 0]
+        df = df.assign(rank=-hits).sort_values(
+            ["rank", "posted_date"], ascending=[True, False]
+        )
+        df = df.head(int(limit))
+        df["snippet"] = [
+            highlight_snippet(f"{row.title or ''} {row.description or ''}", terms)
+            for row in df.itertuples()
+        ]
+        df["posted_date"] = pd.to_datetime(df["posted_date"])
+        return df[SEARCH_COLUMNS].reset_index(drop=True)
+
+    def _engagement_days(self, descending=False):
+        return sorted(
+            (
+                entry.split("=", 1)[1]
+                for entry in os.listdir(self.engagement_dir)
+                if entry.startswith("observed_day=")
+            ),
+            reverse=descending,
+        )
+
+    def _read_engagement(self, days, filter=None) -> pd.DataFrame:
+        files = [
+            os.path.join(path, name)
+            for path in (
+                os.path.join(self.engagement_dir, f"observed_day={day}") for day in days
+            )
+            if os.path.isdir(path)
+            for name in sorted(os.listdir(path))
+            if name.endswith(".parquet")
+        ]
+        # files are named in write order, samples of the same second keep that order
+        for attempt in range(3):
+            try:
+                return (
+                    ds.dataset(files, schema=ENGAGEMENT_SCHEMA, format="parquet")
+                    .to_table(filter=filter)
+                    .to_pandas()
+                )
+            except FileNotFoundError:
+                # a downsampling replaced files during the scan, scan again
+                if attempt == 2:
+                    raise
+                time.sleep(0.05)
+                files = [file for file in files if os.path.exists(file)]
+
+    def trending(self, window=ENGAGEMENT_WINDOW, limit=20, now=None) -> pd.DataFrame:
+        # Reads the partitions of the window, and for the baselines the days before
+        # it only until every post that changed inside the window has one
+        window = pd.Timedelta(window)
+        now = utc_now() if now is None else pd.Timestamp(now)
+        start = to_observed_at(now - window)
+        days = self._engagement_days()
+        recent = self._read_engagement(
+            [day for day in days if day >= start[:10]],
+            filter=pc.field("observed_at") > start,
+        ).sort_values("observed_at", kind="stable")
+        if recent.empty:
+            return pd.DataFrame(columns=TRENDING_COLUMNS)
+        latest = recent.drop_duplicates("post_id", keep="last").set_index("post_id")
+        baseline = {}
+        missing = set(latest.index)
+        for day in reversed([day for day in days if day <= start[:10]]):
+            samples = self._read_engagement(
+                [day],
+                filter=pc.field("post_id").isin(list(missing))
+                & (pc.field("observed_at") <= start),
+            )
+            for row in (
+                samples.sort_values("observed_at", kind="stable")
+                .drop_duplicates("post_id", keep="last")
+                .itertuples()
+            ):
+                baseline[row.post_id] = (row.likes, row.comments)
+            missing -= set(samples["post_id"])
+            if not missing:
+                break
+        # posts first seen inside the window count from their first sample
+        first = recent.drop_duplicates("post_id", keep="first").set_index("post_id")
+        for post_id in missing:
+            baseline[post_id] = (
+                first.at[post_id, "likes"],
+                first.at[post_id, "comments"],
+            )
+        baseline = pd.DataFrame.from_dict(
+            baseline, orient="index", columns=["likes", "comments"]
+        ).reindex(latest.index)
+        gained = pd.DataFrame(
+            {
+                "likes_gained": latest["likes"] - baseline["likes"],
+                "comments_gained": latest["comments"] - baseline["comments"],
+            }
+        )
+        gained["momentum"] = momentum(
+            gained["likes_gained"], gained["comments_gained"], window
+        )
+        gained = gained[gained["momentum"] > 0]
+        if gained.empty:
+            return pd.DataFrame(columns=TRENDING_COLUMNS)
+        posts = self._current(gained.index).set_index("id")
+        df = gained.join(posts, how="inner").rename_axis("id").reset_index()
+        df["posted_date"] = pd.to_datetime(df["posted_date"])
+        df = df.sort_values(["momentum", "posted_date"], ascending=False)
+        return df[TRENDING_COLUMNS].head(int(limit)).reset_index(drop=True)
+
+    # ---------------------------------------------------------------- writing
+
+    @contextmanager
+    def _writing(self):
+        # Exclusive across threads and processes, nested blocks reuse the held lock
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self._lock_path, "a") as lock_file:
+                _lock_file(lock_file)
+                self._lock_depth = 1
+                try:
+                    # another process may have written since we last looked
+                    self._meta = self._read_json(self._meta_path, self._meta)
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    _unlock_file(lock_file)
+
+    def _next(self, key: str, count: int = 1) -> int:
+        # Reserves count values of a counter and returns the first one
+        first = self._meta[key] + 1
+        self._meta[key] += count
+        self._write_json(self._meta_path, self._meta)
+        return first
+
+    def _append(self, df: pd.DataFrame):
+        # One new file per touched partition, holding the new row versions
+        if df.empty:
+            return
+        df = df.copy()
+        df["_version"] = range(
+            self._next("version", len(df)), self._meta["version"] + 1
+        )
+        for day, rows in df.groupby(df["posted_date"].map(_posted_day)):
+            path = os.path.join(self.posts_dir, f"posted_day={day}")
+            os.makedirs(path, exist_ok=True)
+            table = pa.Table.from_pandas(
+                rows[POSTS_SCHEMA.names], schema=POSTS_SCHEMA, preserve_index=False
+            )
+            name = f"part-{int(rows['_version'].max()):012d}-{uuid.uuid4().hex[:8]}"
+            tmp_path = os.path.join(path, f".{name}.tmp")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, os.path.join(path, f"{name}.parquet"))
+
+    def _append_engagement(self, df: pd.DataFrame):
+        # df has id, likes and comments of posts whose counts changed
+        if df.empty:
+            return
+        now = to_observed_at(utc_now())
+        samples = pd.DataFrame(
+            {
+                "post_id": df["id"].astype(str),
+                "observed_at": now,
+                "likes": df["likes"].astype("int64"),
+                "comments": df["comments"].astype("int64"),
+            }
+        )
+        path = os.path.join(self.engagement_dir, f"observed_day={now[:10]}")
+        os.makedirs(path, exist_ok=True)
+        self._write_engagement(
+            path, f"part-{self._meta['version']:012d}-{uuid.uuid4().hex[:8]}", samples
+        )
+
+    @staticmethod
+    def _write_engagement(path, name, samples):
+        table = pa.Table.from_pandas(
+            samples[ENGAGEMENT_SCHEMA.names],
+            schema=ENGAGEMENT_SCHEMA,
+            preserve_index=False,
+        )
+        tmp_path = os.path.join(path, f".{name}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(path, f"{name}.parquet"))
+
+    def _current(self, ids, days=None) -> pd.DataFrame:
+        return self._read(
+            [c for c in POSTS_SCHEMA.names if c != "_version"],
+            filter=pc.field("id").isin(list(ids)),
+            days=days,
+        )
+
+    def _existing(self, incoming: pd.DataFrame) -> pd.DataFrame:
+        # Stored versions of the incoming posts by id. Usually they are in the
+        # partitions of the incoming posted_date, the posts found nowhere else are
+        # looked up in all partitions, the feed may have shown another posted_date.
+        existing = self._current(
+            incoming["id"], days=incoming["posted_date"].map(_posted_day)
+        )
+        missing = set(incoming["id"]) - set(existing["id"])
+        if missing:
+            moved = self._current(missing)
+            if not moved.empty:
+                existing = pd.concat([existing, moved], ignore_index=True)
+        return existing.set_index("id")
+
+    def upsert_posts(self, posts: List[PostData]) -> UpsertResult:
+        # Keep the last version of a post if it shows up twice in one batch
+        posts = list({post.id: post for post in posts}.values())
+        if not posts:
+            return UpsertResult(inserted=0, updated=0)
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        incoming = pd.DataFrame([post.__dict__ for post in posts])
+        with self._writing():
+            existing = self._existing(incoming)
+            rows = []
+            engagement = []
+            for post in incoming.to_dict("records"):
+                current = (
+                    existing.loc[post["id"]] if post["id"] in existing.index else None
+                )
+                if current is None or any(
+                    current[c] != post[c] for c in ["likes", "comments"]
+                ):
+                    engagement.append(post)
+                if current is None:
+                    post.update(date=now, content_parsed=False, change_seq=None)
+                else:
+                    # same columns the sqlite3 upsert updates, the rest is carried over
+                    updated = {
+                        c: post[c] for c in ["likes", "comments"] + CONTENT_COLUMNS
+                    }
+                    changed = any(current[c] != post[c] for c in CONTENT_COLUMNS)
+                    post = {**current.to_dict(), **updated, "id": post["id"]}
+                    if changed:
+                        post["change_seq"] = None
+                rows.append(post)
+            df = pd.DataFrame(rows)
+            new_seq = df["change_seq"].isna()
+            if new_seq.any():
+                first = self._next("change_seq", int(new_seq.sum()))
+                df.loc[new_seq, "change_seq"] = range(first, first + int(new_seq.sum()))
+            self._append(df)
+            self._append_engagement(pd.DataFrame(engagement, columns=incoming.columns))
+        return UpsertResult(inserted=len(rows) - len(existing), updated=len(existing))
+
+    def create_post(self, post: PostData):
+        self.upsert_posts([post])
+
+    def update_post(self, post: PostData):
+        with self._writing():
+            current = self._current([post.id])
+            if current.empty:
+                return
+            row = current.iloc[0].to_dict()
+            # same columns the sqlite3 backend updates
+            self.upsert_posts(
+                [
+                    PostData(
+                        **{
+                            **{c: row[c] for c in PostData.__dataclass_fields__},
+                            "title": post.title,
+                            "description": post.description,
+                            "likes": post.likes,
+                            "comments": post.comments,
+                        }
+                    )
+                ]
+            )
+
+    def mark_posts_processed(self, ids: List[str]) -> int:
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self._writing():
+            current = self._current(ids)
+            current = current[~current["content_parsed"].fillna(False).astype(bool)]
+            current = current.assign(content_parsed=True)
+            self._append(current)
+        return len(current)
+
+    def update_post_tags(self, id):
+        self.mark_posts_processed([id])
+
+    def load_cursor(self, consumer: str) -> int:
+        return self._read_json(self._cursors_path, {}).get(consumer, 0)
+
+    def save_cursor(self, consumer: str, cursor: int):
+        with self._writing():
+            cursors = self._read_json(self._cursors_path, {})
+            cursors[consumer] = int(cursor)
+            self._write_json(self._cursors_path, cursors)
+
+    # ------------------------------------------------------------- compaction
+
+    def compact(self, min_files: int = COMPACTION_MIN_FILES) -> int:
+        # Rewrites partitions with at least min_files files into a single file
+        # holding only the latest version of each post, returns partitions compacted
+        compacted = 0
+        for entry in sorted(os.listdir(self.posts_dir)):
+            path = os.path.join(self.posts_dir, entry)
+            if not entry.startswith("posted_day=") or not os.path.isdir(path):
+                continue
+            with self._writing():
+                files = [
+                    os.path.join(path, name)
+                    for name in os.listdir(path)
+                    if name.endswith(".parquet")
+                ]
+                if len(files) < max(2, min_files):
+                    continue
+                table = ds.dataset(
+                    files, schema=POSTS_SCHEMA, format="parquet"
+                ).to_table()
+                df = table.to_pandas().sort_values("_version")
+                df = df.drop_duplicates("id", keep="last")
+                name = f"part-{int(df['_version'].max()):012d}-compacted"
+                tmp_path = os.path.join(path, f".{name}.tmp")
+                pq.write_table(
+                    pa.Table.from_pandas(df, schema=POSTS_SCHEMA, preserve_index=False),
+                    tmp_path,
+                )
+                os.replace(tmp_path, os.path.join(path, f"{name}.parquet"))
+                for file in files:
+                    if not file.endswith(f"{name}.parquet"):
+                        os.remove(file)
+            compacted += 1
+        return compacted
+
+    def _rewrite_engagement(self, day, keep, min_files) -> int:
+        # Replaces the files of a day with one holding the samples keep(samples)
+        # returns, if that removes samples or there are at least min_files files
+        path = os.path.join(self.engagement_dir, f"observed_day={day}")
+        files = [
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.endswith(".parquet")
+        ]
+        samples = self._read_engagement([day])
+        kept = keep(samples)
+        removed = len(samples) - len(kept)
+        if not removed and len(files) < max(2, min_files):
+            return 0
+        name = f"part-{self._meta['version']:012d}-compacted"
+        self._write_engagement(path, name, kept)
+        for file in files:
+            if not file.endswith(f"{name}.parquet"):
+                os.remove(file)
+        return removed
+
+    def downsample_engagement(self, now=None) -> int:
+        # Buckets never span days, so every day is downsampled on its own. Recent
+        # days lose no samples, their small files are merged once there are many.
+        now = utc_now() if now is None else pd.Timestamp(now)
+        removed = 0
+        for day in self._engagement_days():
+            with self._writing():
+                removed += self._rewrite_engagement(
+                    day,
+                    lambda samples: downsample_engagement_frame(samples, now),
+                    min_files=COMPACTION_MIN_FILES,
+                )
+        return removed
+
+    def _compaction_loop(self):
+        while not self._stop.wait(COMPACTION_INTERVAL):
+            try:
+                compacted = self.compact()
+                if compacted:
+                    logger.debug(f"Compacted {compacted} parquet partitions")
+                removed = self.downsample_engagement()
+                if removed:
+                    logger.debug(f"Downsampled {removed} engagement samples")
+            except Exception as e:
+                logger.error(f"Parquet compaction failed: {e}")
+
+    def close(self):
+        self._stop.set()
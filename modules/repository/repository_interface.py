@@ -1,11 +1,143 @@
+import re
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 from pydantic.dataclasses import dataclass
 from pydantic import model_validator, ValidationError
 from loguru import logger
 import pandas as pd
 
 
+# Columns get_feed can return, "watched_tickers" is stored as ticker_notification_sent
+FEED_COLUMNS = [
+    "id",
+    "author",
+    "title",
+    "description",
+    "posted_date",
+    "likes",
+    "comments",
+    "link",
+    "category",
+    "watched_tickers",
+    "found_tickers",
+]
+DEFAULT_FEED_COLUMNS = FEED_COLUMNS[1:]
+# Columns of changes_since, change_seq is the position in the change feed
+CHANGE_COLUMNS = ["change_seq"] + FEED_COLUMNS + ["content_parsed"]
+
+
+def check_feed_columns(columns, order_by: str) -> List[str]:
+    # Column names end up in SQL / PostgREST queries, so only known ones are allowed
+    columns = list(columns or DEFAULT_FEED_COLUMNS)
+    unknown = [c for c in columns + [order_by] if c not in FEED_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown feed columns: {unknown}")
+    return columns
+
+
+def split_tickers(value: Optional[str]) -> List[str]:
+    # found_tickers and ticker_notification_sent are stored as "AAPL, TSLA"
+    return [ticker.strip() for ticker in (value or "").split(",") if ticker.strip()]
+
+
+def to_posted_date(value) -> Optional[str]:
+    # posted_date is stored as text in the format the scraper writes
+    if value is None:
+        return None
+    return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Columns of search results, snippet marks the matched terms with **
+SEARCH_COLUMNS = [
+    "id",
+    "author",
+    "title",
+    "snippet",
+    "posted_date",
+    "link",
+    "category",
+    "rank",
+]
+
+
+def search_terms(query: str) -> List[str]:
+    # Words of a free text search, operators and punctuation are ignored
+    return re.findall(r"\w+", query or "")
+
+
+def highlight_snippet(text: Optional[str], terms: List[str], width: int = 160) -> str:
+    # Cuts a window around the first matched term and marks all terms with **,
+    # for backends without a native snippet function
+    text = text or ""
+    if not terms:
+        return text[:width]
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - width // 3) if match else 0
+    window = text[start : start + width]
+    window = pattern.sub(lambda m: f"**{m.group(0)}**", window)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(text) else ""
+    return f"{prefix}{window}{suffix}"
+
+
+# Columns of trending, likes_gained and comments_gained are counted over the window
+TRENDING_COLUMNS = [
+    "id",
+    "author",
+    "title",
+    "link",
+    "category",
+    "posted_date",
+    "likes",
+    "comments",
+    "likes_gained",
+    "comments_gained",
+    "momentum",
+]
+ENGAGEMENT_WINDOW = pd.Timedelta(hours=6)  # default window of trending
+COMMENT_WEIGHT = 3  # a comment is rarer than a like, it counts as this many likes
+# Samples older than the age are thinned out to the last one per bucket
+ENGAGEMENT_DOWNSAMPLING = [
+    (pd.Timedelta(days=2), "hour"),
+    (pd.Timedelta(days=14), "day"),
+]
+# length of the observed_at prefix the samples of a bucket share
+ENGAGEMENT_BUCKETS = {"hour": 13, "day": 10}
+
+
+def to_observed_at(value) -> str:
+    # Engagement samples are stored with UTC timestamps as text
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def utc_now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz="UTC")
+
+
+def momentum(likes_gained, comments_gained, window) -> float:
+    # Weighted engagement gained per hour, works on scalars and Series
+    hours = pd.Timedelta(window).total_seconds() / 3600
+    return (likes_gained + COMMENT_WEIGHT * comments_gained) / hours
+
+
+def downsample_engagement_frame(samples: pd.DataFrame, now) -> pd.DataFrame:
+    # Backends without SQL: keeps the samples ENGAGEMENT_DOWNSAMPLING keeps
+    samples = samples.sort_values(["post_id", "observed_at"], kind="stable")
+    for age, bucket in ENGAGEMENT_DOWNSAMPLING:
+        cutoff = to_observed_at(pd.Timestamp(now) - age)
+        old = samples["observed_at"] < cutoff
+        buckets = samples["observed_at"].str[: ENGAGEMENT_BUCKETS[bucket]]
+        last = ~samples.assign(bucket=buckets).duplicated(
+            ["post_id", "bucket"], keep="last"
+        )
+        samples = samples[~old | last]
+    return samples
+
+
 @dataclass
 class PostData:
     likes: int
@@ -37,6 +169,17 @@ class PostData:
         return values
 
 
+class UpsertResult(NamedTuple):
+    inserted: int
+    updated: int
+
+
+class Changes(NamedTuple):
+    posts: pd.DataFrame
+    # pass this to the next changes_since call (and persist it with save_cursor)
+    cursor: int
+
+
 class PostRepository(ABC):
     @abstractmethod
     def get_credentials(self):
@@ -51,13 +194,49 @@ class PostRepository(ABC):
         pass
 
     @abstractmethod
-    def get_feed(self, title: str) -> pd.DataFrame:
+    def get_feed(
+        self,
+        since=None,
+        until=None,
+        categories: Optional[List[str]] = None,
+        authors: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        order_by: str = "posted_date",
+        descending: bool = True,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        after: Optional[tuple] = None,
+    ) -> pd.DataFrame:
+        # Filters, projection and pagination are applied by the storage backend.
+        # after is a keyset cursor: the (order_by value, id) of the last row already shown
+        pass
+
+    @abstractmethod
+    def count_feed(
+        self,
+        since=None,
+        until=None,
+        categories: Optional[List[str]] = None,
+        authors: Optional[List[str]] = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    def get_feed_for_ticker(
+        self, ticker: str, since=None, limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        # Posts mentioning exactly this ticker, newest first
         pass
 
     @abstractmethod
     def update_post(self, post: PostData) -> bool:
         pass
 
+    @abstractmethod
+    def upsert_posts(self, posts: List[PostData]) -> UpsertResult:
+        # Insert new posts and update existing ones in a single write
+        pass
+
     @abstractmethod
     def get_unprocessed_posts(self) -> pd.DataFrame:
         pass
@@ -65,3 +244,42 @@ class PostRepository(ABC):
     @abstractmethod
     def update_post_tags(self, id: str):
         pass
+
+    @abstractmethod
+    def mark_posts_processed(self, ids: List[str]) -> int:
+        # Bulk version of update_post_tags, one write for the whole batch
+        pass
+
+    @abstractmethod
+    def changes_since(self, cursor: int, limit: int = 1000) -> Changes:
+        # Posts inserted or changed (title, description, tickers) after cursor,
+        # in the order they changed
+        pass
+
+    @abstractmethod
+    def load_cursor(self, consumer: str) -> int:
+        # Last change feed position a consumer has processed, 0 if it never ran
+        pass
+
+    @abstractmethod
+    def save_cursor(self, consumer: str, cursor: int):
+        pass
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 20, since=None) -> pd.DataFrame:
+        # Full text search over titles and descriptions, best matches first
+        pass
+
+    @abstractmethod
+    def trending(
+        self, window=ENGAGEMENT_WINDOW, limit: int = 20, now=None
+    ) -> pd.DataFrame:
+        # Posts that gained the most likes and comments per hour over the last
+        # window, from the engagement samples recorded whenever the counts changed
+        pass
+
+    @abstractmethod
+    def downsample_engagement(self, now=None) -> int:
+        # Thins out old engagement samples (see ENGAGEMENT_DOWNSAMPLING), returns
+        # the number of samples removed
+        pass
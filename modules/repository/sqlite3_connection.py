@@ -0,0 +1,174 @@
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+import pandas as pd
+
+
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+DEFAULT_CACHE_SIZE = -64 * 1024  # negative values are KiB, so 64MB of page cache
+DEFAULT_BUSY_TIMEOUT = 5000  # milliseconds
+DEFAULT_CACHED_STATEMENTS = 256
+MAX_BUSY_RETRIES = 5
+
+
+class StatementStats:
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+
+def _statement_key(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()[:120]
+
+
+class SqliteConnectionManager:
+    """
+    Long-lived, tuned sqlite3 connections, one per thread.
+
+    Streamlit, the scraper and the telegram bot all use the same database file,
+    so every connection runs in WAL mode with a busy timeout, and statements that
+    still hit a lock are retried with a short backoff. Keeping the connection open
+    also keeps sqlite3's prepared statement cache warm between calls.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        mmap_size: int = DEFAULT_MMAP_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        busy_timeout: int = DEFAULT_BUSY_TIMEOUT,
+        cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+    ):
+        self.db_path = db_path
+        self.mmap_size = int(mmap_size)
+        self.cache_size = int(cache_size)
+        self.busy_timeout = int(busy_timeout)
+        self.cached_statements = int(cached_statements)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connection_opens = 0
+        self.busy_waits = 0
+        self.busy_wait_ms = 0.0
+        self._statements: dict[str, StatementStats] = {}
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout / 1000,
+                cached_statements=self.cached_statements,
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+            conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+            conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self.connection_opens += 1
+            logger.debug(f"Opened sqlite3 connection to {self.db_path}")
+        return conn
+
+    def _run(self, sql: str, fn):
+        # Retry statements that still find the database locked after the busy timeout
+        key = _statement_key(sql)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except sqlite3.OperationalError as e:
+                message = str(e)
+                if attempt >= MAX_BUSY_RETRIES or (
+                    "locked" not in message and "busy" not in message
+                ):
+                    raise
+                attempt += 1
+                waited = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    self.busy_waits += 1
+                    self.busy_wait_ms += waited
+                logger.warning(f"Database busy, retry {attempt} for: {key}")
+                time.sleep(0.05 * 2**attempt)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._statements.setdefault(key, StatementStats()).add(elapsed_ms)
+            return result
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        conn = self.connection()
+        return self._run(sql, lambda: conn.execute(sql, params))
+
+    def executemany(self, sql: str, seq_of_params) -> sqlite3.Cursor:
+        conn = self.connection()
+        seq_of_params = list(seq_of_params)
+        return self._run(sql, lambda: conn.executemany(sql, seq_of_params))
+
+    def executescript(self, sql: str):
+        conn = self.connection()
+        return self._run(sql, lambda: conn.executescript(sql))
+
+    def read_sql(self, sql: str, params=None) -> pd.DataFrame:
+        conn = self.connection()
+        return self._run(sql, lambda: pd.read_sql_query(sql, conn, params=params))
+
+    @contextmanager
+    def transaction(self):
+        # Commits once the outermost block exits, nested blocks join the open transaction.
+        # BEGIN IMMEDIATE up front, sqlite3 would only begin at the first write and
+        # reads before it would run outside the transaction
+        conn = self.connection()
+        if self._local.depth == 0 and not conn.in_transaction:
+            self.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield self
+        except Exception:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            statements = {
+                key: {
+                    "count": s.count,
+                    "total_ms": round(s.total_ms, 3),
+                    "avg_ms": round(s.total_ms / s.count, 3),
+                    "max_ms": round(s.max_ms, 3),
+                }
+                for key, s in self._statements.items()
+            }
+            return {
+                "connection_opens": self.connection_opens,
+                "busy_waits": self.busy_waits,
+                "busy_wait_ms": round(self.busy_wait_ms, 3),
+                "statements": statements,
+            }
+
+    def close(self):
+        # Closes the calling thread's connection
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
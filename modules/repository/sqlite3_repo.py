@@ -1,18 +1,54 @@
 import datetime
+import json
 import os
+import time
 from loguru import logger
 import sqlite3
 from typing import List, NamedTuple, Optional
 import inquirer
 from colorama import Fore, init
 from ..tradingedge_scraper.validators import validate_url
-from .repository_interface import PostRepository, PostData
+from .repository_interface import (
+    PostRepository,
+    PostData,
+    UpsertResult,
+    Changes,
+    CHANGE_COLUMNS,
+    SEARCH_COLUMNS,
+    TRENDING_COLUMNS,
+    COMMENT_WEIGHT,
+    ENGAGEMENT_BUCKETS,
+    ENGAGEMENT_DOWNSAMPLING,
+    ENGAGEMENT_WINDOW,
+    check_feed_columns,
+    search_terms,
+    split_tickers,
+    to_observed_at,
+    to_posted_date,
+    utc_now,
+)
+from .sqlite3_connection import (
+    SqliteConnectionManager,
+    DEFAULT_BUSY_TIMEOUT,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_MMAP_SIZE,
+)
 
 import sys
 from collections import namedtuple
 import pandas as pd
 
 
+ENGAGEMENT_DOWNSAMPLE_INTERVAL = 60 * 60  # seconds between downsampling runs
+# PRAGMA user_version of a database set up by _create_schema, bump it whenever
+# the tables, indexes or triggers created there change
+SCHEMA_VERSION = 1
+
+
+def _db_column(column: str) -> str:
+    return "ticker_notification_sent" if column == "watched_tickers" else column
+
+
 class PrebuildHook(PostRepository, type):
     def __call__(cls, *args, **kwargs):
         logger.info("Pre-object build hook (metaclass) executing...")
@@ -29,107 +65,594 @@ class PrebuildHook(PostRepository, type):
 class Sqlite3Repository(metaclass=PrebuildHook):
     def __init__(self, storage, preloaded_credentials=None):
         self.db_path = storage
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS posts (
-                    id PRIMARY KEY,
-                    author VARCHAR(255) NOT NULL,
-                    title TEXT,
-                    description TEXT,
-                    posted_date TEXT,
-                    date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    likes INTEGER NOT NULL DEFAULT 0,
-                    comments INTEGER NOT NULL DEFAULT 0,
-                    link TEXT NOT NULL,
-                    category VARCHAR(255) NOT NULL,
-                    content_parsed BOOLEAN NOT NULL DEFAULT FALSE,
-                    ticker_notification_sent VARCHAR(100) DEFAULT NULL,
-                    found_tickers TEXT DEFAULT NULL
+        credentials = preloaded_credentials or {}
+        # Optional tuning knobs, read from the storage section of credentials.json
+        self.db = SqliteConnectionManager(
+            self.db_path,
+            mmap_size=credentials.get("sqlite3_mmap_size", DEFAULT_MMAP_SIZE),
+            cache_size=credentials.get("sqlite3_cache_size", DEFAULT_CACHE_SIZE),
+            busy_timeout=credentials.get("sqlite3_busy_timeout", DEFAULT_BUSY_TIMEOUT),
+        )
+        self._downsampled_at = 0.0
+        # The schema setup drops and recreates triggers and checks for data to
+        # backfill, it only runs for databases behind SCHEMA_VERSION
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with self.db.transaction() as tx:
+                self._create_schema(tx)
+
+    def _create_schema(self, tx):
+        # another process may have set the schema up since the check
+        if tx.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        tx.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id PRIMARY KEY,
+                author VARCHAR(255) NOT NULL,
+                title TEXT,
+                description TEXT,
+                posted_date TEXT,
+                date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                likes INTEGER NOT NULL DEFAULT 0,
+                comments INTEGER NOT NULL DEFAULT 0,
+                link TEXT NOT NULL,
+                category VARCHAR(255) NOT NULL,
+                content_parsed BOOLEAN NOT NULL DEFAULT FALSE,
+                ticker_notification_sent VARCHAR(100) DEFAULT NULL,
+                found_tickers TEXT DEFAULT NULL
+            );"""
+        )
+        # One row per ticker mentioned in a post, so per ticker lookups are exact
+        # ("AMD" must not match "AMDL") and go through an index
+        tx.execute(
+            """
+            CREATE TABLE IF NOT EXISTS post_tickers (
+                post_id TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                watched BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (post_id, ticker)
+            ) WITHOUT ROWID;"""
+        )
+        tx.execute(
+            "CREATE INDEX IF NOT EXISTS idx_post_tickers_ticker ON post_tickers (ticker)"
+        )
+        tx.execute(
+            "CREATE INDEX IF NOT EXISTS idx_posts_posted_date ON posts (posted_date)"
+        )
+        tx.execute(
+            "CREATE INDEX IF NOT EXISTS idx_posts_content_parsed ON posts (content_parsed)"
+        )
+        if tx.execute("SELECT 1 FROM post_tickers LIMIT 1").fetchone() is None:
+            # Databases created before post_tickers existed are backfilled once
+            rows = tx.execute(
+                """SELECT id, found_tickers, ticker_notification_sent FROM posts
+                WHERE found_tickers IS NOT NULL AND found_tickers != ''"""
+            ).fetchall()
+            self._sync_post_tickers(tx, rows)
+        self._create_change_feed(tx)
+        self._create_search_index(tx)
+        self._create_engagement(tx)
+        tx.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _create_engagement(self, tx):
+        # Append only history of likes and comments. Triggers add a sample when a
+        # post is stored and whenever its counts change, so unchanged posts cost
+        # nothing no matter how often they are scraped.
+        exists = tx.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_engagement'"
+        ).fetchone()
+        tx.execute(
+            """
+            CREATE TABLE IF NOT EXISTS post_engagement (
+                post_id TEXT NOT NULL,
+                observed_at TEXT NOT NULL,
+                likes INTEGER NOT NULL,
+                comments INTEGER NOT NULL,
+                PRIMARY KEY (post_id, observed_at)
+            ) WITHOUT ROWID;"""
+        )
+        tx.execute(
+            """CREATE INDEX IF NOT EXISTS idx_post_engagement_observed_at
+            ON post_engagement (observed_at)"""
+        )
+        # The conflict clause of the statement that fires a trigger overrides the
+        # one inside it, so an ON CONFLICT upsert of posts would turn an
+        # INSERT OR REPLACE here into a primary key error when the counts change
+        # twice within a second. Update that second's sample or insert a new one.
+        add_sample = """
+                UPDATE post_engagement SET likes = NEW.likes, comments = NEW.comments
+                WHERE post_id = NEW.id
+                    AND observed_at = strftime('%Y-%m-%d %H:%M:%S', 'now');
+                INSERT INTO post_engagement (post_id, observed_at, likes, comments)
+                SELECT NEW.id, strftime('%Y-%m-%d %H:%M:%S', 'now'), NEW.likes, NEW.comments
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM post_engagement
+                    WHERE post_id = NEW.id
+                        AND observed_at = strftime('%Y-%m-%d %H:%M:%S', 'now')
                 );"""
+        # recreated, databases may still have the INSERT OR REPLACE version
+        tx.execute("DROP TRIGGER IF EXISTS post_engagement_insert")
+        tx.execute("DROP TRIGGER IF EXISTS post_engagement_update")
+        tx.execute(
+            f"""
+            CREATE TRIGGER post_engagement_insert
+            AFTER INSERT ON posts
+            BEGIN {add_sample}
+            END;"""
+        )
+        tx.execute(
+            f"""
+            CREATE TRIGGER post_engagement_update
+            AFTER UPDATE OF likes, comments ON posts
+            WHEN OLD.likes IS NOT NEW.likes OR OLD.comments IS NOT NEW.comments
+            BEGIN {add_sample}
+            END;"""
+        )
+        if not exists:
+            # Posts stored before the history existed start with their current counts
+            tx.execute(
+                """
+                INSERT INTO post_engagement (post_id, observed_at, likes, comments)
+                SELECT id, strftime('%Y-%m-%d %H:%M:%S', 'now'), likes, comments
+                FROM posts"""
+            )
+
+    def _create_search_index(self, tx):
+        # External content FTS5 index over posts, kept in sync by triggers
+        exists = tx.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+        ).fetchone()
+        if exists:
+            return
+        tx.execute(
+            """
+            CREATE VIRTUAL TABLE posts_fts USING fts5(
+                title,
+                description,
+                content = 'posts',
+                content_rowid = 'rowid',
+                tokenize = 'unicode61 remove_diacritics 2'
+            );"""
+        )
+        tx.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts
+            BEGIN
+                INSERT INTO posts_fts (rowid, title, description)
+                VALUES (NEW.rowid, NEW.title, NEW.description);
+            END;"""
+        )
+        tx.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts
+            BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, title, description)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+            END;"""
+        )
+        tx.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_fts_update
+            AFTER UPDATE OF title, description ON posts
+            BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, title, description)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+                INSERT INTO posts_fts (rowid, title, description)
+                VALUES (NEW.rowid, NEW.title, NEW.description);
+            END;"""
+        )
+        # Index the posts that were stored before the search index existed
+        tx.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+    def _create_change_feed(self, tx):
+        # Every insert and every content change takes the next value of a global
+        # sequence, consumers remember the last value they have seen (see changes_since)
+        columns = [row[1] for row in tx.execute("PRAGMA table_info(posts)").fetchall()]
+        if "change_seq" not in columns:
+            tx.execute("ALTER TABLE posts ADD COLUMN change_seq INTEGER DEFAULT NULL")
+        tx.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_sequence (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );"""
+        )
+        tx.execute(
+            "INSERT OR IGNORE INTO change_sequence (name, value) VALUES ('posts', 0)"
+        )
+        # Posts written before the change feed existed get a sequence number once
+        tx.execute(
+            """
+            UPDATE posts
+            SET change_seq = rowid
+                + (SELECT value FROM change_sequence WHERE name = 'posts')
+            WHERE change_seq IS NULL"""
+        )
+        tx.execute(
+            """
+            UPDATE change_sequence
+            SET value = MAX(value, (SELECT COALESCE(MAX(change_seq), 0) FROM posts))
+            WHERE name = 'posts'"""
+        )
+        tx.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_posts_change_seq ON posts (change_seq)"
+        )
+        bump_change_seq = """
+                UPDATE change_sequence SET value = value + 1 WHERE name = 'posts';
+                UPDATE posts
+                SET change_seq = (SELECT value FROM change_sequence WHERE name = 'posts')
+                WHERE rowid = NEW.rowid;"""
+        tx.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS posts_change_seq_insert
+            AFTER INSERT ON posts
+            BEGIN {bump_change_seq}
+            END;"""
+        )
+        # likes and comments change on every scrape, they are not worth a change event
+        tx.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS posts_change_seq_update
+            AFTER UPDATE OF title, description, ticker_notification_sent, found_tickers
+            ON posts
+            WHEN OLD.title IS NOT NEW.title
+                OR OLD.description IS NOT NEW.description
+                OR OLD.ticker_notification_sent IS NOT NEW.ticker_notification_sent
+                OR OLD.found_tickers IS NOT NEW.found_tickers
+            BEGIN {bump_change_seq}
+            END;"""
+        )
+        tx.execute(
+            """
+            CREATE TABLE IF NOT EXISTS consumer_cursors (
+                consumer TEXT PRIMARY KEY,
+                cursor INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            );"""
+        )
+
+    def _sync_post_tickers(self, tx, rows):
+        # rows are (post_id, found_tickers, ticker_notification_sent) tuples
+        if not rows:
+            return
+        tx.execute(
+            "DELETE FROM post_tickers WHERE post_id IN (SELECT value FROM json_each(?))",
+            (json.dumps([row[0] for row in rows]),),
+        )
+        ticker_rows = []
+        for post_id, found_tickers, watched_tickers in rows:
+            watched = set(split_tickers(watched_tickers))
+            ticker_rows.extend(
+                (post_id, ticker, ticker in watched)
+                for ticker in split_tickers(found_tickers)
             )
-            conn.commit()
+        tx.executemany(
+            "INSERT OR IGNORE INTO post_tickers (post_id, ticker, watched) VALUES (?, ?, ?)",
+            ticker_rows,
+        )
+
+    def connection_stats(self) -> dict:
+        # Connection opens, busy waits and per statement timings of this repository
+        return self.db.stats()
 
     def create_post(self, post: PostData):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            insert_data = {
-                **post.__dict__,
-                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            }
-            for field_name in [
-                "content_parsed",
-            ]:
-                insert_data.pop(field_name)
-            values_queries = ", ".join(["?"] * len(insert_data.keys()))
-            query = f"""INSERT INTO POSTS ({', '.join(insert_data.keys())}) VALUES ({ values_queries } )"""
-            try:
-                cursor.execute(query, tuple([m for m in insert_data.values()]))
-            except sqlite3.IntegrityError as e:
-                logger.error(f"Error inserting post: {e}")
-            conn.commit()
+        insert_data = {
+            **post.__dict__,
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        for field_name in [
+            "content_parsed",
+        ]:
+            insert_data.pop(field_name)
+        values_queries = ", ".join(["?"] * len(insert_data.keys()))
+        query = f"""INSERT INTO POSTS ({', '.join(insert_data.keys())}) VALUES ({ values_queries } )"""
+        try:
+            with self.db.transaction() as tx:
+                tx.execute(query, tuple([m for m in insert_data.values()]))
+                self._sync_post_tickers(
+                    tx, [(post.id, post.found_tickers, post.ticker_notification_sent)]
+                )
+        except sqlite3.IntegrityError as e:
+            logger.error(f"Error inserting post: {e}")
 
     def post_exists(self, id: int) -> bool:
-        results = None
-        with sqlite3.connect(self.db_path) as conn:
-            query = """
-                SELECT
-                    author, title, description,
-                    date, likes, comments, link, category
-                FROM POSTS WHERE id = ?
-            """
-            params = (id,)
-            results = pd.read_sql_query(query, conn, params=params)
-        return not results.empty
-
-    def get_feed(self) -> pd.DataFrame:
-        results = None
-        with sqlite3.connect(self.db_path) as conn:
-            query = """SELECT 
-                    author, title, description,
-                    posted_date, likes, comments, link, category, ticker_notification_sent, found_tickers
-            FROM posts"""
-            results = pd.read_sql_query(query, conn)
-            results.rename(
-                {"ticker_notification_sent": "watched_tickers"}, axis=1, inplace=True
+        query = "SELECT 1 FROM posts WHERE id = ? LIMIT 1"
+        return self.db.execute(query, (id,)).fetchone() is not None
+
+    @staticmethod
+    def _feed_filters(since, until, categories, authors):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("posted_date >= ?")
+            params.append(to_posted_date(since))
+        if until is not None:
+            clauses.append("posted_date < ?")
+            params.append(to_posted_date(until))
+        if categories:
+            clauses.append("category IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(categories)))
+        if authors:
+            clauses.append("author IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(authors)))
+        return clauses, params
+
+    def get_feed(
+        self,
+        since=None,
+        until=None,
+        categories=None,
+        authors=None,
+        columns=None,
+        order_by="posted_date",
+        descending=True,
+        limit=None,
+        offset=None,
+        after=None,
+    ) -> pd.DataFrame:
+        columns = check_feed_columns(columns, order_by)
+        clauses, params = self._feed_filters(since, until, categories, authors)
+        direction = "DESC" if descending else "ASC"
+        if after is not None:
+            # keyset pagination, stays fast no matter how deep the page is
+            clauses.append(
+                f"({_db_column(order_by)}, id) {'<' if descending else '>'} (?, ?)"
             )
+            after_value, after_id = after
+            if order_by == "posted_date":
+                after_value = to_posted_date(after_value)
+            params.extend([after_value, after_id])
+        query = (
+            f"SELECT {', '.join(f'{_db_column(c)} AS {c}' for c in columns)} FROM posts"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY {_db_column(order_by)} {direction}, id {direction}"
+        if limit is not None or offset is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else int(limit), int(offset or 0)])
+        results = self.db.read_sql(query, params)
+        if "posted_date" in results.columns:
             results["posted_date"] = pd.to_datetime(results["posted_date"])
         return results
 
+    def count_feed(self, since=None, until=None, categories=None, authors=None) -> int:
+        clauses, params = self._feed_filters(since, until, categories, authors)
+        query = "SELECT COUNT(*) FROM posts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return self.db.execute(query, params).fetchone()[0]
+
+    def get_feed_for_ticker(self, ticker: str, since=None, limit=None) -> pd.DataFrame:
+        query = """SELECT
+                p.author, p.title, p.description,
+                p.posted_date, p.likes, p.comments, p.link, p.category,
+                p.ticker_notification_sent, p.found_tickers
+            FROM post_tickers t
+            JOIN posts p ON p.id = t.post_id
+            WHERE t.ticker = ?"""
+        params = [ticker]
+        if since is not None:
+            query += " AND p.posted_date >= ?"
+            params.append(to_posted_date(since))
+        query += " ORDER BY p.posted_date DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        results = self.db.read_sql(query, params)
+        results.rename(
+            {"ticker_notification_sent": "watched_tickers"}, axis=1, inplace=True
+        )
+        results["posted_date"] = pd.to_datetime(results["posted_date"])
+        return results
+
     def update_post(self, post: PostData):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            query = """
-                UPDATE posts
-                SET title = ?,
-                    description = ?,
-                    likes = ?,
-                    comments = ?
-            WHERE id = ?"""
-            cursor.execute(
+        query = """
+            UPDATE posts
+            SET title = ?,
+                description = ?,
+                likes = ?,
+                comments = ?
+        WHERE id = ?"""
+        with self.db.transaction() as tx:
+            tx.execute(
                 query,
                 (post.title, post.description, post.likes, post.comments, post.id),
             )
-            conn.commit()
+
+    def upsert_posts(self, posts: List[PostData]) -> UpsertResult:
+        # Keep the last version of a post if it shows up twice in one batch
+        posts = list({post.id: post for post in posts}.values())
+        if not posts:
+            return UpsertResult(inserted=0, updated=0)
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        rows = []
+        for post in posts:
+            insert_data = {**post.__dict__, "date": now}
+            insert_data.pop("content_parsed")
+            rows.append(insert_data)
+        columns = list(rows[0].keys())
+        updated_columns = [
+            "title",
+            "description",
+            "likes",
+            "comments",
+            "ticker_notification_sent",
+            "found_tickers",
+        ]
+        query = f"""
+            INSERT INTO posts ({', '.join(columns)})
+            VALUES ({', '.join(['?'] * len(columns))})
+            ON CONFLICT(id) DO UPDATE SET
+                {', '.join(f'{c} = excluded.{c}' for c in updated_columns)}
+        """
+        with self.db.transaction() as tx:
+            # Runs in the upsert's transaction (see transaction), only to report the counts
+            existing = tx.execute(
+                "SELECT COUNT(*) FROM posts WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([post.id for post in posts]),),
+            ).fetchone()[0]
+            tx.executemany(query, [tuple(r[c] for c in columns) for r in rows])
+            self._sync_post_tickers(
+                tx,
+                [
+                    (post.id, post.found_tickers, post.ticker_notification_sent)
+                    for post in posts
+                ],
+            )
+        if time.monotonic() - self._downsampled_at > ENGAGEMENT_DOWNSAMPLE_INTERVAL:
+            self.downsample_engagement()
+        return UpsertResult(inserted=len(rows) - existing, updated=existing)
 
     def get_unprocessed_posts(self) -> pd.DataFrame:
-        with sqlite3.connect(self.db_path) as conn:
-            query = """
-                SELECT id, title, link, ticker_notification_sent FROM posts WHERE content_parsed = FALSE
-            """
-            results = pd.read_sql_query(query, conn)
-        return results
+        query = """
+            SELECT id, title, link, ticker_notification_sent FROM posts WHERE content_parsed = FALSE
+        """
+        return self.db.read_sql(query)
 
     def update_post_tags(self, id):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            query = """
-                UPDATE posts
-                SET content_parsed = TRUE
-            WHERE id = ?"""
-            cursor.execute(query, (id,))
-            conn.commit()
+        query = """
+            UPDATE posts
+            SET content_parsed = TRUE
+        WHERE id = ?"""
+        with self.db.transaction() as tx:
+            tx.execute(query, (id,))
+
+    def mark_posts_processed(self, ids: List[str]) -> int:
+        if not ids:
+            return 0
+        query = """
+            UPDATE posts
+            SET content_parsed = TRUE
+        WHERE id IN (SELECT value FROM json_each(?))"""
+        with self.db.transaction() as tx:
+            return tx.execute(query, (json.dumps(list(ids)),)).rowcount
+
+    def changes_since(self, cursor: int, limit: int = 1000) -> Changes:
+        query = f"""
+            SELECT {', '.join(f'{_db_column(c)} AS {c}' for c in CHANGE_COLUMNS)}
+            FROM posts
+            WHERE change_seq > ?
+            ORDER BY change_seq
+            LIMIT ?"""
+        posts = self.db.read_sql(query, (int(cursor), int(limit)))
+        posts["content_parsed"] = posts["content_parsed"].astype(bool)
+        posts["posted_date"] = pd.to_datetime(posts["posted_date"])
+        next_cursor = int(posts["change_seq"].iloc[-1]) if len(posts) else int(cursor)
+        return Changes(posts=posts, cursor=next_cursor)
+
+    def search(self, query: str, limit: int = 20, since=None) -> pd.DataFrame:
+        terms = search_terms(query)
+        if not terms:
+            return pd.DataFrame(columns=SEARCH_COLUMNS)
+        # Quote every word so user input can't break the FTS5 query syntax,
+        # the last word also matches as a prefix while the user is typing
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        sql = """
+            SELECT
+                p.id, p.author, p.title,
+                snippet(posts_fts, -1, '**', '**', '…', 24) AS snippet,
+                p.posted_date, p.link, p.category,
+                bm25(posts_fts, 2.0, 1.0) AS rank
+            FROM posts_fts
+            JOIN posts p ON p.rowid = posts_fts.rowid
+            WHERE posts_fts MATCH ?"""
+        params = [match]
+        if since is not None:
+            sql += " AND p.posted_date >= ?"
+            params.append(to_posted_date(since))
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(int(limit))
+        results = self.db.read_sql(sql, params)
+        results["posted_date"] = pd.to_datetime(results["posted_date"])
+        return results
+
+    def trending(self, window=ENGAGEMENT_WINDOW, limit=20, now=None) -> pd.DataFrame:
+        # Only posts with a sample inside the window can have gained anything, they
+        # are found with a range scan of idx_post_engagement_observed_at (without
+        # ANALYZE statistics sqlite prefers scanning the whole table). Their
+        # baseline is the last sample before the window (the first one for posts
+        # first seen inside it), a single primary key seek per post.
+        window = pd.Timedelta(window)
+        now = utc_now() if now is None else pd.Timestamp(now)
+        start = to_observed_at(now - window)
+        hours = window.total_seconds() / 3600
+        query = """
+            SELECT
+                p.id, p.author, p.title, p.link, p.category, p.posted_date,
+                p.likes, p.comments,
+                p.likes - b.likes AS likes_gained,
+                p.comments - b.comments AS comments_gained,
+                ((p.likes - b.likes) + ? * (p.comments - b.comments)) / ? AS momentum
+            FROM (
+                SELECT DISTINCT post_id
+                FROM post_engagement INDEXED BY idx_post_engagement_observed_at
+                WHERE observed_at > ?
+            ) c
+            JOIN post_engagement b
+                ON b.post_id = c.post_id
+                AND b.observed_at = COALESCE(
+                    (SELECT MAX(observed_at) FROM post_engagement
+                    WHERE post_id = c.post_id AND observed_at <= ?),
+                    (SELECT MIN(observed_at) FROM post_engagement
+                    WHERE post_id = c.post_id)
+                )
+            JOIN posts p ON p.id = c.post_id
+            WHERE momentum > 0
+            ORDER BY momentum DESC, p.posted_date DESC
+            LIMIT ?"""
+        results = self.db.read_sql(
+            query, (COMMENT_WEIGHT, hours, start, start, int(limit))
+        )
+        results["posted_date"] = pd.to_datetime(results["posted_date"])
+        return results[TRENDING_COLUMNS]
+
+    def downsample_engagement(self, now=None) -> int:
+        now = utc_now() if now is None else pd.Timestamp(now)
+        removed = 0
+        with self.db.transaction() as tx:
+            for age, bucket in ENGAGEMENT_DOWNSAMPLING:
+                cutoff = to_observed_at(now - age)
+                # a sample goes if the next one of the post is in the same bucket,
+                # that is a primary key seek per sample
+                prefix = ENGAGEMENT_BUCKETS[bucket]
+                removed += tx.execute(
+                    f"""
+                    DELETE FROM post_engagement AS e
+                    WHERE observed_at < ?
+                        AND substr(e.observed_at, 1, {prefix}) = substr((
+                            SELECT MIN(n.observed_at) FROM post_engagement n
+                            WHERE n.post_id = e.post_id
+                                AND n.observed_at > e.observed_at
+                                AND n.observed_at < ?
+                        ), 1, {prefix})""",
+                    (cutoff, cutoff),
+                ).rowcount
+        self._downsampled_at = time.monotonic()
+        if removed:
+            logger.debug(f"Downsampled {removed} engagement samples")
+        return removed
+
+    def load_cursor(self, consumer: str) -> int:
+        row = self.db.execute(
+            "SELECT cursor FROM consumer_cursors WHERE consumer = ?", (consumer,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def save_cursor(self, consumer: str, cursor: int):
+        query = """
+            INSERT INTO consumer_cursors (consumer, cursor, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(consumer) DO UPDATE SET
+                cursor = excluded.cursor,
+                updated_at = excluded.updated_at"""
+        with self.db.transaction() as tx:
+            tx.execute(
+                query,
+                (
+                    consumer,
+                    int(cursor),
+                    datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                ),
+            )
 
 
 if __name__ == "__main__":
@@ -1,12 +1,37 @@
 import datetime
 import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from loguru import logger
 from typing import List, NamedTuple, Optional
 import inquirer
 from colorama import Fore, init
 from ..tradingedge_scraper.validators import validate_url
-from .repository_interface import PostRepository, PostData
+from .repository_interface import (
+    PostRepository,
+    PostData,
+    UpsertResult,
+    Changes,
+    CHANGE_COLUMNS,
+    DEFAULT_FEED_COLUMNS,
+    SEARCH_COLUMNS,
+    TRENDING_COLUMNS,
+    COMMENT_WEIGHT,
+    ENGAGEMENT_DOWNSAMPLING,
+    ENGAGEMENT_WINDOW,
+    check_feed_columns,
+    highlight_snippet,
+    momentum,
+    search_terms,
+    to_observed_at,
+    to_posted_date,
+    utc_now,
+)
 from supabase import create_client
+from postgrest.exceptions import APIError
 import sys
 from collections import namedtuple
 import pandas as pd
@@ -14,6 +39,142 @@ import pandas as pd
 
 init(autoreset=True)
 
+DEFAULT_PAGE_SIZE = 1000  # Supabase's default PostgREST max-rows
+DEFAULT_CONCURRENCY = 4
+# ids end up in the request url, keep it well below common url length limits
+MAX_IDS_PER_REQUEST = 500
+# upsert_posts updates the same columns as the sqlite3 backend, a stored post keeps
+# KEPT_COLUMNS as well as date and content_parsed
+UPDATED_COLUMNS = [
+    "title",
+    "description",
+    "likes",
+    "comments",
+    "ticker_notification_sent",
+    "found_tickers",
+]
+KEPT_COLUMNS = ["author", "link", "category", "posted_date"]
+ENGAGEMENT_DOWNSAMPLE_INTERVAL = 60 * 60  # seconds between downsampling runs
+# PostgREST / Postgres error codes of a function, table or column that does not exist
+MISSING_SCHEMA_CODES = {"PGRST202", "PGRST204", "PGRST205", "42883", "42P01", "42703"}
+
+# Server side part of the change feed, run once in the Supabase SQL editor.
+# The scraper is the only writer, so sequence values become visible in order.
+CHANGE_FEED_SQL = """
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+CREATE SEQUENCE IF NOT EXISTS posts_change_seq;
+UPDATE posts SET change_seq = nextval('posts_change_seq') WHERE change_seq IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_posts_change_seq ON posts (change_seq);
+
+CREATE OR REPLACE FUNCTION bump_posts_change_seq() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+        OR NEW.title IS DISTINCT FROM OLD.title
+        OR NEW.description IS DISTINCT FROM OLD.description
+        OR NEW.tickers_notifications_sent IS DISTINCT FROM OLD.tickers_notifications_sent
+        OR NEW.found_tickers IS DISTINCT FROM OLD.found_tickers THEN
+        NEW.change_seq := nextval('posts_change_seq');
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER posts_change_seq BEFORE INSERT OR UPDATE ON posts
+    FOR EACH ROW EXECUTE FUNCTION bump_posts_change_seq();
+
+CREATE TABLE IF NOT EXISTS consumer_cursors (
+    consumer TEXT PRIMARY KEY,
+    cursor BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Server side part of the engagement history, run once in the Supabase SQL editor.
+# A trigger appends a sample whenever the likes or comments of a post change,
+# trending_posts finds the posts that changed inside the window with a range scan
+# and their baselines with one index seek each.
+ENGAGEMENT_SQL = """
+CREATE TABLE IF NOT EXISTS post_engagement (
+    post_id TEXT NOT NULL,
+    observed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    likes INTEGER NOT NULL,
+    comments INTEGER NOT NULL,
+    PRIMARY KEY (post_id, observed_at)
+);
+CREATE INDEX IF NOT EXISTS idx_post_engagement_observed_at
+    ON post_engagement (observed_at);
+INSERT INTO post_engagement (post_id, likes, comments)
+    SELECT p.id::text, p.likes, p.comments FROM posts p
+    WHERE NOT EXISTS (SELECT 1 FROM post_engagement e WHERE e.post_id = p.id::text);
+
+CREATE OR REPLACE FUNCTION record_post_engagement() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+        OR NEW.likes IS DISTINCT FROM OLD.likes
+        OR NEW.comments IS DISTINCT FROM OLD.comments THEN
+        INSERT INTO post_engagement (post_id, observed_at, likes, comments)
+        VALUES (NEW.id::text, now(), NEW.likes, NEW.comments)
+        ON CONFLICT (post_id, observed_at) DO UPDATE
+            SET likes = excluded.likes, comments = excluded.comments;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER post_engagement AFTER INSERT OR UPDATE ON posts
+    FOR EACH ROW EXECUTE FUNCTION record_post_engagement();
+
+CREATE OR REPLACE FUNCTION trending_posts(
+    window_start TIMESTAMPTZ, comment_weight REAL, max_rows INTEGER
+) RETURNS TABLE (
+    post_id TEXT,
+    likes INTEGER,
+    comments INTEGER,
+    likes_gained INTEGER,
+    comments_gained INTEGER
+) AS $$
+    SELECT c.post_id, l.likes, l.comments,
+        l.likes - b.likes, l.comments - b.comments
+    FROM (
+        SELECT DISTINCT e.post_id FROM post_engagement e
+        WHERE e.observed_at > window_start
+    ) c
+    CROSS JOIN LATERAL (
+        SELECT e.likes, e.comments FROM post_engagement e
+        WHERE e.post_id = c.post_id
+        ORDER BY e.observed_at DESC LIMIT 1
+    ) l
+    CROSS JOIN LATERAL (
+        -- the last sample before the window, the first one for new posts
+        (SELECT e.likes, e.comments FROM post_engagement e
+        WHERE e.post_id = c.post_id AND e.observed_at <= window_start
+        ORDER BY e.observed_at DESC LIMIT 1)
+        UNION ALL
+        (SELECT e.likes, e.comments FROM post_engagement e
+        WHERE e.post_id = c.post_id
+        ORDER BY e.observed_at LIMIT 1)
+        LIMIT 1
+    ) b
+    WHERE (l.likes - b.likes) + comment_weight * (l.comments - b.comments) > 0
+    ORDER BY (l.likes - b.likes) + comment_weight * (l.comments - b.comments) DESC
+    LIMIT max_rows
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION downsample_post_engagement(
+    cutoff TIMESTAMPTZ, bucket TEXT
+) RETURNS INTEGER AS $$
+    WITH removed AS (
+        DELETE FROM post_engagement
+        WHERE observed_at < cutoff
+            AND (post_id, observed_at) NOT IN (
+                SELECT post_id, MAX(observed_at) FROM post_engagement
+                WHERE observed_at < cutoff
+                GROUP BY post_id, date_trunc(bucket, observed_at)
+            )
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM removed
+$$ LANGUAGE sql;
+"""
+
 
 async def create_table_if_not_exists(table_name, columns_definition, engine):
     """
@@ -61,6 +222,10 @@ def get_credentials():
     return inquirer.prompt(supabase_prompts)
 
 
+def _db_column(column: str) -> str:
+    return "tickers_notifications_sent" if column == "watched_tickers" else column
+
+
 class PrebuildHook(PostRepository, type):
     def __call__(cls, *args, **kwargs):
         logger.info("Pre-object build hook (metaclass) executing...")
@@ -82,6 +247,12 @@ class SupabaseRepository(metaclass=PrebuildHook):
     def __init__(self, storage, creds, preloaded_credentials=None):
         self.supabase = storage
         self.creds = creds
+        # rows, requests and short pages of the last streamed read
+        self.last_fetch_report = None
+        self._downsampled_at = 0.0
+        # set once ENGAGEMENT_SQL / CHANGE_FEED_SQL turned out not to be applied
+        self._engagement_missing = False
+        self._change_feed_missing = False
 
     def create_post(self, post: PostData):
         self.supabase.table("posts").insert(
@@ -99,30 +270,229 @@ class SupabaseRepository(metaclass=PrebuildHook):
         )
         return not df.empty
 
-    def get_feed(self) -> pd.DataFrame:
+    @staticmethod
+    def _feed_filters(query, since, until, categories, authors):
+        if since is not None:
+            query = query.gte("posted_date", to_posted_date(since))
+        if until is not None:
+            query = query.lt("posted_date", to_posted_date(until))
+        if categories:
+            query = query.in_("category", list(categories))
+        if authors:
+            query = query.in_("author", list(authors))
+        return query
+
+    def _iter_pages(
+        self,
+        build_query,
+        start=0,
+        stop=None,
+        page_size=DEFAULT_PAGE_SIZE,
+        concurrency=DEFAULT_CONCURRENCY,
+    ):
+        # Streams the rows of a select as a sequence of range requests. build_query(count)
+        # has to return a new, filtered and ordered select builder on every call.
+        # Pages are yielded in order while up to `concurrency` requests are in flight.
+        report = {"expected_rows": None, "rows": 0, "requests": 0, "short_pages": 0}
+        self.last_fetch_report = report
+        first_stop = start + page_size if stop is None else min(start + page_size, stop)
+        if first_stop <= start:
+            return
+        single_page = stop is not None and stop - start <= page_size
         response = (
-            self.supabase.table("posts")
-            .select(
-                "author",
-                "title",
-                "description",
-                "posted_date",
-                "likes",
-                "comments",
-                "link",
-                "category",
-                "tickers_notifications_sent",
-                "found_tickers",
-            )
+            build_query(None if single_page else "exact")
+            .range(start, first_stop - 1)
             .execute()
         )
-        df = pd.DataFrame(response.data)
+        report["requests"] += 1
+        rows = response.data
+        report["rows"] += len(rows)
+        if single_page:
+            # No count to compare against, a short page is either the end of the
+            # result or a server cap (max-rows) below page_size. Keep reading the
+            # range until it is full or the server has nothing more.
+            offset = start + len(rows)
+            chunk = rows
+            while chunk and offset < first_stop:
+                report["short_pages"] += 1
+                chunk = build_query(None).range(offset, first_stop - 1).execute().data
+                report["requests"] += 1
+                rows = rows + chunk
+                offset += len(chunk)
+            report["rows"] = len(rows)
+            report["expected_rows"] = len(rows)
+            if rows:
+                yield rows
+            return
+        if response.count is None:
+            logger.warning("PostgREST did not return a row count, reading sequentially")
+            end = None
+        else:
+            end = response.count if stop is None else min(response.count, stop)
+            report["expected_rows"] = max(0, end - start)
+        if len(rows) < first_stop - start and (end is None or start + len(rows) < end):
+            # Fewer rows than requested although more exist, the server caps responses
+            # (max-rows). Continue with the page size the server actually allows.
+            report["short_pages"] += 1
+            logger.warning(
+                f"PostgREST capped a page at {len(rows)} rows (requested {page_size}), "
+                f"continuing with that page size"
+            )
+            page_size = max(1, len(rows))
+        if rows:
+            yield rows
+
+        def fetch(offset):
+            # Reads [offset, offset + page_size) completely, short pages are re-requested
+            page_end = (
+                offset + page_size if end is None else min(offset + page_size, end)
+            )
+            data, requests, short_pages = [], 0, 0
+            while offset < page_end:
+                chunk = build_query(None).range(offset, page_end - 1).execute().data
+                requests += 1
+                if not chunk:
+                    break
+                if offset + len(chunk) < page_end:
+                    short_pages += 1
+                data.extend(chunk)
+                offset += len(chunk)
+            return data, requests, short_pages
+
+        if end is None:
+            offset = start + len(rows)
+            while rows:
+                rows, requests, short_pages = fetch(offset)
+                report["requests"] += requests
+                report["rows"] += len(rows)
+                offset += len(rows)
+                if rows:
+                    yield rows
+            return
+
+        offsets = iter(range(start + len(rows), end, page_size))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = deque(pool.submit(fetch, o) for o in islice(offsets, concurrency))
+            while pending:
+                rows, requests, short_pages = pending.popleft().result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(pool.submit(fetch, next_offset))
+                report["requests"] += requests
+                report["short_pages"] += short_pages
+                report["rows"] += len(rows)
+                if rows:
+                    yield rows
+        if report["rows"] < report["expected_rows"]:
+            logger.warning(
+                f"Truncated result: expected {report['expected_rows']} rows, "
+                f"received {report['rows']}"
+            )
+
+    @staticmethod
+    def _feed_frame(rows, columns) -> pd.DataFrame:
+        df = pd.DataFrame(rows, columns=[_db_column(c) for c in columns])
         df.rename(
             columns={"tickers_notifications_sent": "watched_tickers"}, inplace=True
         )
-        df["posted_date"] = pd.to_datetime(df["posted_date"])
+        if "posted_date" in df.columns:
+            df["posted_date"] = pd.to_datetime(df["posted_date"])
         return df
 
+    def iter_feed(
+        self,
+        since=None,
+        until=None,
+        categories=None,
+        authors=None,
+        columns=None,
+        order_by="posted_date",
+        descending=True,
+        limit=None,
+        offset=None,
+        after=None,
+        page_size=DEFAULT_PAGE_SIZE,
+        concurrency=DEFAULT_CONCURRENCY,
+    ):
+        # Same arguments as get_feed, yields the result as DataFrame chunks
+        columns = check_feed_columns(columns, order_by)
+
+        def build_query(count=None):
+            query = self.supabase.table("posts").select(
+                *[_db_column(c) for c in columns], count=count
+            )
+            query = self._feed_filters(query, since, until, categories, authors)
+            if after is not None:
+                # keyset pagination, PostgREST has no row value comparison so spell it out
+                after_value, after_id = after
+                if order_by == "posted_date":
+                    after_value = to_posted_date(after_value)
+                op = "lt" if descending else "gt"
+                order_column = _db_column(order_by)
+                query = query.or_(
+                    f'{order_column}.{op}."{after_value}",'
+                    f'and({order_column}.eq."{after_value}",id.{op}."{after_id}")'
+                )
+            return query.order(_db_column(order_by), desc=descending).order(
+                "id", desc=descending
+            )
+
+        start = int(offset or 0)
+        stop = None if limit is None else start + int(limit)
+        for rows in self._iter_pages(build_query, start, stop, page_size, concurrency):
+            yield self._feed_frame(rows, columns)
+
+    def get_feed(
+        self,
+        since=None,
+        until=None,
+        categories=None,
+        authors=None,
+        columns=None,
+        order_by="posted_date",
+        descending=True,
+        limit=None,
+        offset=None,
+        after=None,
+    ) -> pd.DataFrame:
+        chunks = list(
+            self.iter_feed(
+                since=since,
+                until=until,
+                categories=categories,
+                authors=authors,
+                columns=columns,
+                order_by=order_by,
+                descending=descending,
+                limit=limit,
+                offset=offset,
+                after=after,
+            )
+        )
+        if not chunks:
+            return self._feed_frame([], check_feed_columns(columns, order_by))
+        return pd.concat(chunks, ignore_index=True)
+
+    def count_feed(self, since=None, until=None, categories=None, authors=None) -> int:
+        query = self.supabase.table("posts").select("id", count="exact", head=True)
+        query = self._feed_filters(query, since, until, categories, authors)
+        return query.execute().count or 0
+
+    def get_feed_for_ticker(self, ticker: str, since=None, limit=None) -> pd.DataFrame:
+        # Exact match inside the comma separated list, so "AMD" does not match "AMDL"
+        query = (
+            self.supabase.table("posts")
+            .select(*[_db_column(c) for c in DEFAULT_FEED_COLUMNS])
+            .filter("found_tickers", "match", f"(^|, ){re.escape(ticker)}(,|$)")
+        )
+        if since is not None:
+            query = query.gte("posted_date", to_posted_date(since))
+        query = query.order("posted_date", desc=True)
+        if limit is not None:
+            query = query.limit(int(limit))
+        # explicit columns, so a ticker without posts still gets the feed columns
+        return self._feed_frame(query.execute().data, DEFAULT_FEED_COLUMNS)
+
     def update_post(self, post: PostData):
         self.supabase.table("posts").update(
             {
@@ -131,19 +501,256 @@ class SupabaseRepository(metaclass=PrebuildHook):
                 "likes": int(post.likes),
                 "comments": int(post.comments),
             }
-        ).eq("id", id).execute()
+        ).eq("id", post.id).execute()
+
+    def upsert_posts(self, posts: List[PostData]) -> UpsertResult:
+        # Keep the last version of a post if it shows up twice in one batch
+        posts = list({post.id: post for post in posts}.values())
+        if not posts:
+            return UpsertResult(inserted=0, updated=0)
+        # Stored rows only get the columns the sqlite3 backend updates. Bulk upserts
+        # write every column that is sent, so date and content_parsed are left out
+        # (the bot may mark a post processed meanwhile) and the columns a post
+        # keeps are sent with their stored values.
+        ids = [post.id for post in posts]
+        existing = {}
+        for start in range(0, len(ids), MAX_IDS_PER_REQUEST):
+            for row in (
+                self.supabase.table("posts")
+                .select("id", *KEPT_COLUMNS)
+                .in_("id", ids[start : start + MAX_IDS_PER_REQUEST])
+                .execute()
+                .data
+            ):
+                existing[row["id"]] = row
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        inserted, updated = [], []
+        for post in posts:
+            current = existing.get(post.id)
+            if current is None:
+                inserted.append({**post.__dict__, "date": now, "content_parsed": False})
+            else:
+                updated.append(
+                    {**current, **{c: getattr(post, c) for c in UPDATED_COLUMNS}}
+                )
+        if inserted:
+            # a post stored by someone else since the lookup is left alone
+            self.supabase.table("posts").upsert(
+                inserted, on_conflict="id", ignore_duplicates=True
+            ).execute()
+        if updated:
+            self.supabase.table("posts").upsert(
+                updated, on_conflict="id", default_to_null=False
+            ).execute()
+        if time.monotonic() - self._downsampled_at > ENGAGEMENT_DOWNSAMPLE_INTERVAL:
+            # the posts are written, a failed maintenance run must not fail the batch
+            try:
+                self.downsample_engagement()
+            except Exception as e:
+                logger.error(f"Downsampling the engagement history failed: {e}")
+        return UpsertResult(inserted=len(inserted), updated=len(updated))
 
     def get_unprocessed_posts(self) -> pd.DataFrame:
-        data = (
-            self.supabase.table("posts")
-            .select("id", "title", "link", "tickers_notifications_sent")
-            .eq("content_parsed", False)
-            .execute()
-            .data
-        )
-        return pd.DataFrame(data)
+        columns = ["id", "title", "link", "tickers_notifications_sent"]
+
+        def build_query(count=None):
+            return (
+                self.supabase.table("posts")
+                .select(*columns, count=count)
+                .eq("content_parsed", False)
+                .order("id")
+            )
+
+        rows = [row for page in self._iter_pages(build_query) for row in page]
+        return pd.DataFrame(rows, columns=columns)
 
     def update_post_tags(self, id):
         self.supabase.table("posts").update({"content_parsed": True}).eq(
             "id", id
         ).execute()
+
+    def mark_posts_processed(self, ids: List[str]) -> int:
+        ids = list(ids)
+        updated = 0
+        for start in range(0, len(ids), MAX_IDS_PER_REQUEST):
+            response = (
+                self.supabase.table("posts")
+                .update({"content_parsed": True})
+                .in_("id", ids[start : start + MAX_IDS_PER_REQUEST])
+                .execute()
+            )
+            updated += len(response.data)
+        return updated
+
+    def _missing_change_feed(self, e: APIError):
+        if e.code not in MISSING_SCHEMA_CODES:
+            raise e
+        if not self._change_feed_missing:
+            logger.warning(
+                "The change feed is not set up in this Supabase project, reading the "
+                "unprocessed posts instead. Run supabase_repo.CHANGE_FEED_SQL in the "
+                f"SQL editor to enable it ({e.message})"
+            )
+        self._change_feed_missing = True
+
+    def changes_since(self, cursor: int, limit: int = 1000) -> Changes:
+        if not self._change_feed_missing:
+            try:
+                rows = (
+                    self.supabase.table("posts")
+                    .select(*[_db_column(c) for c in CHANGE_COLUMNS])
+                    .gt("change_seq", int(cursor))
+                    .order("change_seq")
+                    .limit(int(limit))
+                    .execute()
+                    .data
+                )
+            except APIError as e:
+                self._missing_change_feed(e)
+        if self._change_feed_missing:
+            # Without CHANGE_FEED_SQL: the posts not processed yet, the cursor stays.
+            # Consumers mark them processed, so the next call returns the next ones.
+            rows = (
+                self.supabase.table("posts")
+                .select(*[_db_column(c) for c in CHANGE_COLUMNS if c != "change_seq"])
+                .eq("content_parsed", False)
+                .order("id")
+                .limit(int(limit))
+                .execute()
+                .data
+            )
+            posts = self._feed_frame(rows, CHANGE_COLUMNS)
+            posts["content_parsed"] = posts["content_parsed"].astype(bool)
+            return Changes(posts=posts, cursor=int(cursor))
+        posts = self._feed_frame(rows, CHANGE_COLUMNS)
+        posts["content_parsed"] = posts["content_parsed"].astype(bool)
+        next_cursor = int(posts["change_seq"].iloc[-1]) if len(posts) else int(cursor)
+        return Changes(posts=posts, cursor=next_cursor)
+
+    def search(self, query: str, limit: int = 20, since=None) -> pd.DataFrame:
+        # PostgREST has no ranking for ilike filters, posts matching every word are
+        # returned newest first and the snippet is cut out client side
+        terms = search_terms(query)
+        if not terms:
+            return pd.DataFrame(columns=SEARCH_COLUMNS)
+        columns = [
+            "id",
+            "author",
+            "title",
+            "description",
+            "posted_date",
+            "link",
+            "category",
+        ]
+        request = self.supabase.table("posts").select(*columns)
+        for term in terms:
+            request = request.or_(f"title.ilike.*{term}*,description.ilike.*{term}*")
+        if since is not None:
+            request = request.gte("posted_date", to_posted_date(since))
+        rows = request.order("posted_date", desc=True).limit(int(limit)).execute().data
+        results = pd.DataFrame(rows, columns=columns)
+        results["snippet"] = [
+            highlight_snippet(f"{row.title or ''} {row.description or ''}", terms)
+            for row in results.itertuples()
+        ]
+        results["rank"] = range(len(results))
+        results["posted_date"] = pd.to_datetime(results["posted_date"])
+        return results[SEARCH_COLUMNS]
+
+    def _engagement_rpc(self, function, params):
+        # Calls a function of ENGAGEMENT_SQL, None if it was never applied
+        if self._engagement_missing:
+            return None
+        try:
+            return self.supabase.rpc(function, params).execute().data
+        except APIError as e:
+            if e.code not in MISSING_SCHEMA_CODES:
+                raise
+            self._engagement_missing = True
+            logger.warning(
+                "The engagement history is not set up in this Supabase project, run "
+                f"supabase_repo.ENGAGEMENT_SQL in the SQL editor to enable it ({e.message})"
+            )
+            return None
+
+    def trending(self, window=ENGAGEMENT_WINDOW, limit=20, now=None) -> pd.DataFrame:
+        # Needs ENGAGEMENT_SQL, the gains are computed server side and only the
+        # posts that made the list are read. Empty without it.
+        window = pd.Timedelta(window)
+        now = utc_now() if now is None else pd.Timestamp(now)
+        rows = self._engagement_rpc(
+            "trending_posts",
+            {
+                "window_start": f"{to_observed_at(now - window)}+00:00",
+                "comment_weight": COMMENT_WEIGHT,
+                "max_rows": int(limit),
+            },
+        )
+        if not rows:
+            return pd.DataFrame(columns=TRENDING_COLUMNS)
+        gained = pd.DataFrame(
+            rows,
+            columns=["post_id", "likes", "comments", "likes_gained", "comments_gained"],
+        ).rename(columns={"post_id": "id"})
+        columns = ["id", "author", "title", "link", "category", "posted_date"]
+        posts = pd.DataFrame(
+            self.supabase.table("posts")
+            .select(*columns)
+            .in_("id", gained["id"].tolist())
+            .execute()
+            .data,
+            columns=columns,
+        )
+        posts["id"] = posts["id"].astype(str)
+        df = gained.merge(posts, on="id")
+        df["momentum"] = momentum(df["likes_gained"], df["comments_gained"], window)
+        df["posted_date"] = pd.to_datetime(df["posted_date"])
+        df = df.sort_values(["momentum", "posted_date"], ascending=False)
+        return df[TRENDING_COLUMNS].reset_index(drop=True)
+
+    def downsample_engagement(self, now=None) -> int:
+        now = utc_now() if now is None else pd.Timestamp(now)
+        removed = 0
+        for age, bucket in ENGAGEMENT_DOWNSAMPLING:
+            removed += (
+                self._engagement_rpc(
+                    "downsample_post_engagement",
+                    {"cutoff": f"{to_observed_at(now - age)}+00:00", "bucket": bucket},
+                )
+                or 0
+            )
+        self._downsampled_at = time.monotonic()
+        return removed
+
+    def load_cursor(self, consumer: str) -> int:
+        if self._change_feed_missing:
+            return 0
+        try:
+            rows = (
+                self.supabase.table("consumer_cursors")
+                .select("cursor")
+                .eq("consumer", consumer)
+                .execute()
+                .data
+            )
+        except APIError as e:
+            self._missing_change_feed(e)
+            return 0
+        return rows[0]["cursor"] if rows else 0
+
+    def save_cursor(self, consumer: str, cursor: int):
+        if self._change_feed_missing:
+            return
+        try:
+            self.supabase.table("consumer_cursors").upsert(
+                {
+                    "consumer": consumer,
+                    "cursor": int(cursor),
+                    "updated_at": datetime.datetime.now(
+                        datetime.timezone.utc
+                    ).isoformat(),
+                },
+                on_conflict="consumer",
+            ).execute()
+        except APIError as e:
+            self._missing_change_feed(e)
@@ -1,20 +1,16 @@
 import json
-import csv
 from config import LOCAL_DIR
+from modules.symbol_universe import SymbolUniverse
 from loguru import logger
 
 
 class Settings:
     @staticmethod
     def fetch_tickers_list() -> list[str]:
-        # read list from static csv file 'static/nasdaq_screener_1736874960864.csv', column Symbol
-        tickers_list = []
-        with open("static/nasdaq_screener_1736874960864.csv", mode="r") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                tickers_list.append(row["Symbol"])
+        # Symbols from the static NASDAQ screener csv, read through the compiled
+        # and memory-mapped symbol universe index instead of re-parsing the csv
         # return ["AAPL", "TSLA", "NVDA", "AMD", "COKE", "ARM", "F"]  # Example list
-        return tickers_list
+        return SymbolUniverse.shared(columns=("symbol",)).symbols()
 
     @staticmethod
     def get_setting(setting_name) -> str | list[str] | dict:
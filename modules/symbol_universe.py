@@ -0,0 +1,250 @@
+import csv
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from config import CURRENT_DIR, LOCAL_DIR
+from loguru import logger
+
+
+DEFAULT_SYMBOLS_CSV = os.path.join(
+    CURRENT_DIR, "static", "nasdaq_screener_1736874960864.csv"
+)
+
+# index column name -> (csv header, kind)
+COLUMNS = {
+    "symbol": ("Symbol", "str"),
+    "name": ("Name", "str"),
+    "sector": ("Sector", "str"),
+    "industry": ("Industry", "str"),
+    "market_cap": ("Market Cap", "f64"),
+}
+
+# Layout of the index file (little endian):
+#   header     magic, format version, rows, columns, hash slots, csv mtime, csv size, csv sha256
+#   directory  one entry per column: name, kind, section offset
+#   sections   str columns: uint32 offsets[rows + 1] followed by the utf-8 blob
+#              f64 columns: float64 values[rows]
+#   hash table uint32 slots[hash slots], row + 1 or 0 for empty, keyed by crc32(symbol)
+_MAGIC = b"SYMUNIDX"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sHIHIdQ32sQ")
+_DIR_ENTRY = struct.Struct("<16sBQ")
+_KINDS = {"str": 0, "f64": 1}
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+
+def _index_path_for(csv_path: str) -> str:
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(LOCAL_DIR, f"{name}.symidx")
+
+
+def _file_sha256(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _parse_market_cap(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def compile_index(csv_path: str, index_path: str) -> None:
+    # Parse the screener CSV once and write the binary index next to the other local data
+    rows = []
+    with open(csv_path, mode="r", newline="") as file:
+        for row in csv.DictReader(file):
+            symbol = (row.get("Symbol") or "").strip()
+            if symbol:
+                rows.append(row)
+
+    slots = 1
+    while slots < len(rows) * 2:
+        slots <<= 1
+
+    sections = []
+    for column, (header, kind) in COLUMNS.items():
+        if kind == "f64":
+            values = [_parse_market_cap(row.get(header)) for row in rows]
+            sections.append(struct.pack(f"<{len(values)}d", *values))
+            continue
+        encoded = [(row.get(header) or "").strip().encode("utf-8") for row in rows]
+        offsets = [0]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        sections.append(struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(encoded))
+
+    table = [0] * slots
+    for row_number, row in enumerate(rows):
+        slot = zlib.crc32(row["Symbol"].strip().encode("utf-8")) & (slots - 1)
+        while table[slot]:
+            # duplicate symbols keep their first row, same as a dict built from the csv
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = row_number + 1
+
+    stat = os.stat(csv_path)
+    position = _HEADER.size + _DIR_ENTRY.size * len(COLUMNS)
+    directory = []
+    for (column, (_, kind)), section in zip(COLUMNS.items(), sections):
+        directory.append(_DIR_ENTRY.pack(column.encode(), _KINDS[kind], position))
+        position += len(section)
+    header = _HEADER.pack(
+        _MAGIC,
+        _FORMAT_VERSION,
+        len(rows),
+        len(COLUMNS),
+        slots,
+        stat.st_mtime,
+        stat.st_size,
+        _file_sha256(csv_path),
+        position,
+    )
+
+    # Write to a temp file and swap it in, so concurrent readers never see a partial index
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(b"".join(directory))
+            f.write(b"".join(sections))
+            f.write(struct.pack(f"<{slots}I", *table))
+        os.replace(tmp_path, index_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logger.info(f"Compiled symbol universe index with {len(rows)} symbols")
+
+
+def _read_header(index_path: str):
+    try:
+        with open(index_path, "rb") as f:
+            raw = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    header = _HEADER.unpack(raw)
+    if header[0] != _MAGIC or header[1] != _FORMAT_VERSION:
+        return None
+    return header
+
+
+def _index_is_fresh(csv_path: str, index_path: str) -> bool:
+    header = _read_header(index_path)
+    if header is None:
+        return False
+    _, _, _, _, _, mtime, size, sha256, _ = header
+    stat = os.stat(csv_path)
+    if stat.st_mtime == mtime and stat.st_size == size:
+        return True
+    # mtime changed (checkout, copy), only rebuild if the content changed as well
+    return stat.st_size == size and _file_sha256(csv_path) == sha256
+
+
+class SymbolUniverse:
+    """
+    Read-only view over the compiled symbol index.
+
+    The index is memory-mapped, so all processes share the same page cache and
+    only the columns that are actually read become resident. Lookups by symbol
+    go through the on-disk hash table and are O(1).
+    """
+
+    _shared: dict = {}
+
+    def __init__(self, index_path: str, columns=None):
+        self.index_path = index_path
+        with open(index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (_, _, self._rows, ncols, self._slots, _, _, _, self._table_offset) = (
+            _HEADER.unpack_from(self._mmap, 0)
+        )
+        wanted = set(columns or COLUMNS) | {"symbol"}
+        unknown = wanted - set(COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown symbol universe columns: {sorted(unknown)}")
+        self._sections = {}
+        for i in range(ncols):
+            name, kind, offset = _DIR_ENTRY.unpack_from(
+                self._mmap, _HEADER.size + i * _DIR_ENTRY.size
+            )
+            name = name.rstrip(b"\0").decode()
+            if name in wanted:
+                self._sections[name] = (kind, offset)
+        self.columns = tuple(c for c in COLUMNS if c in self._sections)
+
+    @classmethod
+    def load(cls, csv_path: str = DEFAULT_SYMBOLS_CSV, columns=None):
+        # Compile the index if it is missing or stale, then map it
+        index_path = _index_path_for(csv_path)
+        if not _index_is_fresh(csv_path, index_path):
+            compile_index(csv_path, index_path)
+        return cls(index_path, columns=columns)
+
+    @classmethod
+    def shared(cls, csv_path: str = DEFAULT_SYMBOLS_CSV, columns=None):
+        # One mapping per process and column selection
+        key = (csv_path, tuple(sorted(columns)) if columns else None)
+        if key not in cls._shared:
+            cls._shared[key] = cls.load(csv_path, columns=columns)
+        return cls._shared[key]
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __contains__(self, symbol) -> bool:
+        return isinstance(symbol, str) and self.row(symbol) is not None
+
+    def _raw(self, column: str, row: int) -> bytes:
+        _, offset = self._sections[column]
+        start, end = struct.unpack_from("<II", self._mmap, offset + row * 4)
+        blob = offset + (self._rows + 1) * 4
+        return self._mmap[blob + start : blob + end]
+
+    def row(self, symbol: str) -> int | None:
+        key = symbol.encode("utf-8")
+        mask = self._slots - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = _U32.unpack_from(self._mmap, self._table_offset + slot * 4)[0]
+            if entry == 0:
+                return None
+            if self._raw("symbol", entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def value(self, column: str, row: int):
+        if column not in self._sections:
+            raise KeyError(f"Column {column} was not loaded")
+        kind, offset = self._sections[column]
+        if kind == _KINDS["f64"]:
+            return _F64.unpack_from(self._mmap, offset + row * 8)[0]
+        return self._raw(column, row).decode("utf-8")
+
+    def get(self, symbol: str) -> dict | None:
+        row = self.row(symbol)
+        if row is None:
+            return None
+        return {column: self.value(column, row) for column in self.columns}
+
+    def symbols(self) -> list[str]:
+        # Decodes the whole symbol column in one go, used to build in-memory matchers
+        _, offset = self._sections["symbol"]
+        offsets = struct.unpack_from(f"<{self._rows + 1}I", self._mmap, offset)
+        blob = offset + (self._rows + 1) * 4
+        data = self._mmap[blob : blob + offsets[-1]]
+        return [
+            data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(self._rows)
+        ]
+
+    def close(self):
+        self._mmap.close()
@@ -1,10 +1,13 @@
 from telegram import Update
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler
 from modules.repository.sqlite3_repo import Sqlite3Repository
 from modules.settings import Settings
+import argparse
 import asyncio
 import json
+import signal
 from loguru import logger
 from jinja2 import Environment, FileSystemLoader
 import pandas as pd
@@ -66,40 +69,187 @@ logger.add(
 )
 
 
-async def send_update(chat_id: str, context: ContextTypes.DEFAULT_TYPE, data):
-    env = Environment(loader=FileSystemLoader(searchpath="."))
-    # Load the HTML template that we created (styled_stocks.j2)
-    template = env.get_template("./modules/telegram_bot/message_template.j2")
+MAX_MESSAGE_LENGTH = 4096  # Telegram rejects longer messages
+ALERT_POLL_INTERVAL = 5  # seconds between change feed reads in daemon mode
+ALERT_RETRY_DELAY = 30  # seconds to wait after Telegram or the storage failed
+ALERT_MAX_RETRY_DELAY = 10 * 60  # the retry delay doubles up to this while failing
 
-    # Render the template with our data
-    message_text = template.render(posts=data)
-    await context.bot.send_message(
-        chat_id, text=message_text, parse_mode=ParseMode.HTML
-    )
+# The HTML template is loaded and compiled once, every message only renders it.
+# Messages are sent with ParseMode.HTML, so titles with <, > or & are escaped.
+MESSAGE_TEMPLATE = Environment(
+    loader=FileSystemLoader(searchpath=os.path.dirname(os.path.abspath(__file__))),
+    autoescape=True,
+).get_template("message_template.j2")
+
+
+def render_message(data) -> str:
+    return MESSAGE_TEMPLATE.render(posts=data)
 
 
-def compile_message_datalist(
-    unprocessed: pd.DataFrame, repo: Sqlite3Repository | SupabaseRepository
+async def send_update(
+    chat_id: str, context: ContextTypes.DEFAULT_TYPE, data, delivered=None
 ) -> list:
-    msg_data = []
-    for idx, row in unprocessed.iterrows():
-        id_, title, link, watched_tickers = tuple(row)
-        repo.update_post_tags(id_)
-        if (
-            len([ticker for ticker in watched_tickers.split(",") if len(ticker) > 0])
-            > 0
-        ):
-            msg_data.append(
-                {
-                    "ticker": watched_tickers,
-                    "title": title,
-                    "link": link,
-                },
+    # Splits the alerts over as many messages as needed to stay below Telegram's limit.
+    # Posts whose id is in delivered went out in an earlier attempt and are skipped,
+    # the ids of every message Telegram accepts are added to it. Network errors are
+    # raised, so nothing gets acknowledged. A message Telegram rejects (BadRequest)
+    # would be rejected again on every retry, so its posts are sent one by one and
+    # the ones still rejected are returned instead.
+    delivered = set() if delivered is None else delivered
+    rejected = []
+
+    async def send(batch):
+        try:
+            await context.bot.send_message(
+                chat_id, text=render_message(batch), parse_mode=ParseMode.HTML
+            )
+        except BadRequest as e:
+            if len(batch) == 1:
+                logger.error(
+                    f"Telegram rejected the alert for post {batch[0]['id']} "
+                    f"({batch[0]['link']}), skipping it: {e}"
+                )
+                rejected.append(batch[0])
+                return
+            for post in batch:
+                await send([post])
+            return
+        delivered.update(post["id"] for post in batch)
+
+    batch = []
+    for post in data:
+        if post["id"] in delivered:
+            continue
+        if batch and len(render_message(batch + [post])) > MAX_MESSAGE_LENGTH:
+            await send(batch)
+            batch = []
+        batch.append(post)
+    if batch:
+        await send(batch)
+    return rejected
+
+
+def compile_message_datalist(unprocessed: pd.DataFrame) -> list:
+    # Columns are id, title, link and the watched tickers, whose name differs per backend
+    posts = unprocessed.set_axis(["id", "title", "link", "ticker"], axis=1)
+    watched = posts["ticker"].fillna("")
+    # Only posts that mention at least one watched ticker are sent
+    posts = posts[watched.str.replace(",", "", regex=False).str.len() > 0]
+    posts = posts[["id", "ticker", "title", "link"]].astype(object)
+    # the template checks for none, not NaN
+    return posts.where(posts.notna(), None).to_dict("records")
+
+
+# Name of the bot's position in the repository change feed
+CHANGE_FEED_CONSUMER = "telegram_bot"
+CHANGE_FEED_BATCH_SIZE = 1000
+
+
+async def send_new_posts(
+    repo: Sqlite3Repository | SupabaseRepository,
+    chat_id: str,
+    application,
+    delivered=None,
+):
+    # Follows the change feed from the bot's own cursor, so every run only reads
+    # posts that were inserted or changed since the last run. delivered carries the
+    # ids already sent over a failed attempt, see send_update.
+    delivered = set() if delivered is None else delivered
+    cursor = repo.load_cursor(CHANGE_FEED_CONSUMER)
+    while True:
+        changes = repo.changes_since(cursor, limit=CHANGE_FEED_BATCH_SIZE)
+        if changes.posts.empty:
+            return
+        # Edited posts show up in the change feed again, alert each post only once
+        new_posts = changes.posts[~changes.posts["content_parsed"]]
+        msg_data = compile_message_datalist(
+            new_posts[["id", "title", "link", "watched_tickers"]]
+        )
+        rejected = []
+        if len(msg_data) > 0:
+            rejected = await send_update(chat_id, application, msg_data, delivered)
+        # Acknowledge the whole batch only after Telegram accepted or rejected every
+        # message, a network error leaves the cursor where it was for the next run
+        marked = repo.mark_posts_processed(new_posts["id"].tolist())
+        repo.save_cursor(CHANGE_FEED_CONSUMER, changes.cursor)
+        delivered.difference_update(new_posts["id"])
+        cursor = changes.cursor
+        logger.info(
+            f"Sent {len(msg_data) - len(rejected)} alerts, skipped {len(rejected)} "
+            f"rejected ones, marked {marked} posts as processed"
+        )
+        if len(changes.posts) < CHANGE_FEED_BATCH_SIZE:
+            return
+
+
+def build_repository():
+    # The storage the scraper writes to, see its credentials.json
+    config = json.load(open("./modules/tradingedge_scraper/credentials.json"))
+    data = config.get("storage")
+    engine = data.pop("storage_engine")
+    match engine:
+        case "supabase-local" | "supabase-remote":
+            return SupabaseRepository(preloaded_credentials=data)
+        case "sqlite3":
+            return Sqlite3Repository(preloaded_credentials=data)
+        case "parquet":
+            # imported here, only the parquet backend needs pyarrow
+            from modules.repository.parquet_repo import (
+                ParquetRepository,
+            )
+
+            # the scraper compacts the files, the bot only appends processed flags
+            return ParquetRepository(preloaded_credentials=data, compaction=False)
+        case _:
+            logger.error(
+                f"Storage choice {engine} not implemented, but this should never happen."
             )
-    return msg_data
+            raise ValueError(f"Storage choice {engine} not implemented")
+
 
+async def run_daemon(repo, chat_id: str, application, interval=ALERT_POLL_INTERVAL):
+    # Follows the change feed until SIGTERM or SIGINT. The repository, the bot and
+    # the template stay loaded, so an alert goes out at most interval seconds after
+    # the scraper stored the post.
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows event loops have no signal handlers, the handler runs in the
+            # main thread between event loop steps
+            signal.signal(signum, lambda *_: loop.call_soon_threadsafe(stop.set))
+    logger.info(f"Watching the change feed every {interval}s")
+    # ids sent by an attempt that failed later on, so a retry doesn't repeat them
+    delivered = set()
+    retry_delay = max(interval, ALERT_RETRY_DELAY)
+    while not stop.is_set():
+        delay = interval
+        try:
+            await send_new_posts(repo, chat_id, application, delivered)
+            retry_delay = max(interval, ALERT_RETRY_DELAY)
+        except RetryAfter as e:
+            # flood control, Telegram says how long to wait
+            retry_after = e.retry_after
+            delay = getattr(retry_after, "total_seconds", lambda: retry_after)()
+            logger.warning(f"Telegram asked to wait {delay}s before sending again")
+        except Exception as e:
+            # The cursor only moves after a successful send, the next poll retries.
+            # Storage, network and Telegram errors often clear up on their own, the
+            # daemon keeps going and waits longer after every failure in a row.
+            logger.exception(f"Sending alerts failed: {e}")
+            delay = retry_delay
+            retry_delay = min(retry_delay * 2, ALERT_MAX_RETRY_DELAY)
+            logger.info(f"Retrying in {delay:.0f}s")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("Stopped watching the change feed")
 
-async def main():
+
+async def main(daemon=False, interval=ALERT_POLL_INTERVAL):
     global telegram_chat_id
     global telegram_bot_token
     # Check if the bot token and chat id are both set, othwerwise ask for them
@@ -113,32 +263,29 @@ async def main():
         settings["telegram_chat_id"] = telegram_chat_id
         settings["telegram_bot_token"] = telegram_bot_token
         Settings.save_settings(settings)
-    config = json.load(open("./modules/tradingedge_scraper/credentials.json"))
-    data = config.get("storage")
-    engine = data.pop("storage_engine")
-    repo = None
-    application = ApplicationBuilder().token(telegram_bot_token).build()
-    match engine:
-        case "supabase-local" | "supabase-remote":
-            repo = SupabaseRepository(preloaded_credentials=data)
-            unprocessed = repo.get_unprocessed_posts()
-            msg_data = compile_message_datalist(unprocessed, repo)
-            if len(msg_data) > 0:
-                await send_update(telegram_chat_id, application, msg_data)
-        case "sqlite3":
-            repo = Sqlite3Repository(preloaded_credentials=data)
-            unprocessed = repo.get_unprocessed_posts()
-            msg_data = compile_message_datalist(unprocessed, repo)
-            if len(msg_data) > 0:
-                await send_update(telegram_chat_id, application, msg_data)
-        case _:
-            logger.error(
-                f"Storage choice {engine} not implemented, but this should never happen."
-            )
-            raise ValueError(f"Storage choice {engine} not implemented")
+    repo = build_repository()
+    # initializes the bot and its http connection pool once, shuts them down on exit
+    async with ApplicationBuilder().token(telegram_bot_token).build() as application:
+        if daemon:
+            await run_daemon(repo, telegram_chat_id, application, interval)
+        else:
+            await send_new_posts(repo, telegram_chat_id, application)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
-
-    # run once
+    # python -m modules.telegram_bot.bot_alerts sends the pending alerts once,
+    # with --daemon it keeps running (e.g. as a systemd service) until SIGTERM
+    parser = argparse.ArgumentParser(description="Telegram alerts for watched tickers")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep following the change feed until SIGTERM",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=ALERT_POLL_INTERVAL,
+        help="seconds between change feed reads in daemon mode",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(daemon=args.daemon, interval=args.interval))
@@ -0,0 +1,530 @@
+import asyncio
+import functools
+import time
+from dataclasses import dataclass, field
+from loguru import logger
+from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from ..repository.repository_interface import UpsertResult
+from modules.settings import Settings
+from .cycle import (
+    BROWSER_RSS_WATERMARK,
+    FULL_REFRESH_INTERVAL,
+    PRUNE_KEEP_POSTS,
+    RECYCLE_AFTER_CYCLES,
+    SCROLL_WAIT_RETRIES,
+    FeedCycle,
+)
+from .extraction import (
+    EXTRACT_FEED_FROM_JS,
+    EXTRACT_FEED_JS,
+    EXTRACTION_VERSION,
+    FEED_IDS_JS,
+    MORE_POSTS_JS,
+    PRUNE_FEED_JS,
+    SCROLL_JS,
+    SELECTORS,
+)
+from .feed_api import FEED_API_VERSION, FeedResponseCollector
+from .feed_state import FeedState
+from .instrumentation import CycleTimer
+from .live_watch import (
+    WATCH_BINDING,
+    WATCH_RELOAD_INTERVAL,
+    WATCH_TICK,
+    LiveFeedBuffer,
+    watch_script,
+)
+from .long_descriptions import AsyncLongDescriptionFetcher, LongDescriptionCache
+from .resource_policy import ResourcePolicy, install_blocker_async
+from .polling import PollScheduler, user_timezone
+from .session import SessionStore, is_signed_out, login_async
+from .scraper import (
+    MAX_LOOKBACK_DAYS,
+    MAX_POLLING_RATE,
+    MIN_LOOKBACK_DAYS,
+    MIN_POLLING_RATE,
+    TIMEOUT_SLIDE_ANIMATION,
+    URL_LIST,
+    Scraper,
+    find_tickers_in_text,
+)
+
+MAX_ACTIVE_FEEDS = 2  # feeds scrolling at the same time, each one grows its page's DOM
+WRITER_MAX_BATCH = 500  # posts
+WRITER_FLUSH_DELAY = 0.5  # seconds to wait for other feeds before writing a batch
+FEED_RETRY_DELAY = 30  # seconds before a failed feed tries again, doubles per failure
+FEED_RETRY_MAX = 60 * 15  # seconds, longest wait between retries of a failed feed
+
+
+@dataclass
+class FeedConfig:
+    url: str
+    polling_rate: int = 60 * 5
+    lookback_days: int = 3
+    full_refresh_interval: int = FULL_REFRESH_INTERVAL
+    # polling_rate is the slowest rate during trading hours then, see PollScheduler
+    adaptive_polling: bool = True
+    min_polling_rate: int = MIN_POLLING_RATE
+    max_polling_rate: int = MAX_POLLING_RATE
+    prune_dom: bool = True
+    # the feed's page is replaced after this many cycles, 0 keeps it
+    recycle_after_cycles: int = RECYCLE_AFTER_CYCLES
+    # store posts as they are inserted, see Scraper.watch
+    live_watch: bool = False
+    watch_reload_interval: int = WATCH_RELOAD_INTERVAL
+    # keyword arguments of ResourcePolicy.with_overrides, e.g. {"allow_types": ["image"]}
+    resource_overrides: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.polling_rate = max(MIN_POLLING_RATE, self.polling_rate)
+        self.min_polling_rate = max(MIN_POLLING_RATE, self.min_polling_rate)
+        self.lookback_days = max(
+            MIN_LOOKBACK_DAYS, min(self.lookback_days, MAX_LOOKBACK_DAYS)
+        )
+        self.full_refresh_interval = max(self.polling_rate, self.full_refresh_interval)
+
+
+class BatchedWriter:
+    """
+    Single writer shared by all feeds. Posts queued within WRITER_FLUSH_DELAY of each
+    other go to the repository in one upsert_posts call, run in a worker thread since
+    the repositories are synchronous. write() returns once its posts are stored.
+    """
+
+    def __init__(
+        self, storage, max_batch=WRITER_MAX_BATCH, flush_delay=WRITER_FLUSH_DELAY
+    ):
+        self.storage = storage
+        self.max_batch = max_batch
+        self.flush_delay = flush_delay
+        self.queue = asyncio.Queue()
+        self.writes = 0
+
+    async def write(self, posts) -> UpsertResult:
+        if not posts:
+            return UpsertResult(inserted=0, updated=0)
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((posts, done))
+        return await done
+
+    async def run(self):
+        while True:
+            pending = [await self.queue.get()]
+            count = len(pending[0][0])
+            deadline = asyncio.get_running_loop().time() + self.flush_delay
+            while count < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+            # the same post from two feeds is written once, the last version wins
+            batch = list(
+                {post.id: post for posts, _ in pending for post in posts}.values()
+            )
+            try:
+                result = await asyncio.to_thread(self.storage.upsert_posts, batch)
+            except Exception as e:
+                for _, done in pending:
+                    # the waiting feed may have been cancelled meanwhile
+                    if not done.done():
+                        done.set_exception(e)
+                continue
+            self.writes += 1
+            logger.info(
+                f"Wrote {len(batch)} posts from {len(pending)} feed cycles: "
+                f"{result.inserted} new, {result.updated} updated"
+            )
+            for _, done in pending:
+                if not done.done():
+                    done.set_result(result)
+
+
+class FeedWorker(FeedCycle):
+    # One feed page in the shared browser context, with its own schedule and state
+    def __init__(
+        self,
+        feed: FeedConfig,
+        page,
+        writer: BatchedWriter,
+        active,
+        description_fetcher,
+        description_cache,
+        blocker=None,
+        sign_in=None,
+        started=None,
+        timezone=None,
+        new_page=None,
+        browser_rss_watermark=BROWSER_RSS_WATERMARK,
+    ):
+        scheduler = None
+        if feed.adaptive_polling:
+            scheduler = PollScheduler(
+                feed.polling_rate,
+                feed.min_polling_rate,
+                feed.max_polling_rate,
+                timezone=timezone,
+            )
+        super().__init__(
+            feed.url,
+            find_tickers_in_text,
+            feed.polling_rate,
+            feed.lookback_days,
+            full_refresh_interval=feed.full_refresh_interval,
+            feed_state=FeedState(feed.url),
+            scheduler=scheduler,
+            prune_dom=feed.prune_dom,
+            recycle_after_cycles=feed.recycle_after_cycles,
+            browser_rss_watermark=browser_rss_watermark,
+            live_buffer=LiveFeedBuffer() if feed.live_watch else None,
+            collector=FeedResponseCollector(),
+            description_cache=description_cache,
+            description_fetcher=description_fetcher,
+            blocker=blocker,
+            started=started or time.perf_counter(),
+            log_prefix=f"{feed.url}: ",
+        )
+        self.feed = feed
+        self.page = page
+        self.writer = writer
+        self.active = active
+        # coroutine signing the shared context in again once the session expired
+        self.sign_in = sign_in
+        # coroutine returning a fresh (page, blocker) for this feed, see recycle_page
+        self.new_page = new_page
+
+    async def attach(self):
+        # Listeners and scripts of a new feed page
+        self.page.on("response", self.collector.on_response_async)
+        if self.live_buffer is not None:
+            await self.page.expose_binding(WATCH_BINDING, self.live_buffer.on_item)
+            await self.page.add_init_script(watch_script(SELECTORS))
+
+    async def open_feed(self):
+        await self.page.goto(self.feed.url, wait_until="networkidle")
+        if self.sign_in is not None and is_signed_out(self.page.url):
+            await self.sign_in(self.feed.url)
+            await self.page.goto(self.feed.url, wait_until="networkidle")
+
+    async def run(self):
+        # Opening, reloading and scraping all fail per feed: the feed logs, backs
+        # off and opens its page again, the other feeds keep running
+        await self.attach()
+        failures = 0
+        opened = False
+        while True:
+            try:
+                if opened:
+                    await self.refresh()
+                else:
+                    await self.reopen()
+                opened = True
+                full = self.full_refresh_due()
+                async with self.active:
+                    await self.scrape(full)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                opened = False
+                logger.error(f"Scraping {self.feed.url} failed: {e}")
+            if failures:
+                delay = min(FEED_RETRY_MAX, FEED_RETRY_DELAY * 2 ** (failures - 1))
+                logger.info(
+                    f"{self.feed.url}: retrying in {delay}s after {failures} failures"
+                )
+                await asyncio.sleep(delay)
+            elif self.live_buffer is not None:
+                await self.watch(self.feed.watch_reload_interval)
+            else:
+                await asyncio.sleep(self.next_poll_delay())
+
+    async def refresh(self):
+        # Reloads the feed for the next cycle, or replaces the page when it is over budget
+        reload_started = time.perf_counter()
+        reason = self.recycle_reason()
+        if reason is not None:
+            logger.info(f"{self.feed.url}: recycling the page: {reason}")
+            await self.recycle_page()
+        else:
+            await self.page.reload(wait_until="networkidle")
+            if is_signed_out(self.page.url):
+                logger.info(f"{self.feed.url}: session expired")
+                await self.open_feed()
+        self.reload_seconds = time.perf_counter() - reload_started
+
+    async def reopen(self):
+        # First start, or after a failure: the feed again, on a new page if a failed
+        # recycle_page left this one closed
+        if self.page.is_closed() and self.new_page is not None:
+            self.page, self.blocker = await self.new_page()
+            await self.attach()
+            self.cycles = 0
+        await self.open_feed()
+
+    def recycle_reason(self):
+        # Same budget as Scraper, the context is shared by all feeds so only this
+        # feed's page is replaced
+        if self.new_page is None:
+            return None
+        return super().recycle_reason()
+
+    async def recycle_page(self):
+        await self.page.close()
+        self.page, self.blocker = await self.new_page()
+        await self.attach()
+        self.cycles = 0
+        await self.open_feed()
+
+    async def watch(self, duration):
+        # Same as Scraper.watch, the binding is called by the event loop meanwhile
+        self.live_buffer.drain()
+        timer = CycleTimer()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            await asyncio.sleep(WATCH_TICK)
+            items = self.live_buffer.drain()
+            if items:
+                try:
+                    await self.store_live_posts(items, timer)
+                except Exception as e:
+                    logger.error(f"Storing live posts of {self.feed.url} failed: {e}")
+        logger.info(f"{self.feed.url}: live watch: {timer.summary()}")
+
+    async def store_live_posts(self, items, timer):
+        selected = self.select_live_posts(items)
+        if not selected:
+            return
+        # index -1 keeps read_long_description from expanding in the feed
+        descriptions = await self.long_descriptions(
+            [(-1, raw) for raw, _ in selected if raw.get("has_more")]
+        )
+        batch = self.build_batch([raw for raw, _ in selected], descriptions)
+        with timer.measure("write"):
+            await self.writer.write(batch)
+        self.finish_live_posts(selected, timer)
+
+    async def load_posts(self, full):
+        while True:
+            count = await self.page.locator(SELECTORS["item"]).count()
+            if self.prune_due(count):
+                with self.timer.measure("prune"):
+                    pruned = await self.page.evaluate(
+                        PRUNE_FEED_JS, [SELECTORS, PRUNE_KEEP_POSTS]
+                    )
+                self.record_pruned(pruned)
+                count -= len(pruned)
+            if count == 0:
+                return
+            if not full and await self.last_screen_is_known(count):
+                return
+            last_post_raw_date = (
+                await self.page.locator(SELECTORS["item"])
+                .nth(count - 1)
+                .locator(SELECTORS["created_at_meta"])
+                .inner_text()
+            )
+            if self.past_lookback(last_post_raw_date):
+                return
+            if not await self.scroll_for_more_posts(count):
+                return
+
+    async def scroll_for_more_posts(self, count) -> bool:
+        # Same adaptive wait as Scraper.scroll_for_more_posts
+        for attempt in range(SCROLL_WAIT_RETRIES + 1):
+            with self.timer.measure("scroll"):
+                await self.page.evaluate(SCROLL_JS)
+            timeout = self.scroll_timeout.backoff(attempt)
+            started = time.perf_counter()
+            try:
+                with self.timer.measure("wait_for_posts"):
+                    await self.page.wait_for_function(
+                        MORE_POSTS_JS,
+                        arg=[SELECTORS["item"], count],
+                        timeout=timeout * 1000,
+                    )
+            except PlaywrightTimeoutError:
+                self.timer.count("scroll_timeouts")
+                continue
+            self.scroll_timeout.record(time.perf_counter() - started)
+            return True
+        return False
+
+    async def last_screen_is_known(self, count):
+        with self.timer.measure("known_check"):
+            screen = await self.page.evaluate(
+                EXTRACT_FEED_FROM_JS, [SELECTORS, self.screen_start(count)]
+            )
+        return self.screen_is_known(screen)
+
+    async def extract(self):
+        raw_posts = self.drain_network_posts()
+        if raw_posts is not None and self.covers_rendered(
+            raw_posts, await self.page.evaluate(FEED_IDS_JS, SELECTORS)
+        ):
+            return raw_posts, f"network, v{FEED_API_VERSION}"
+        raw_posts = self.pruned_posts + await self.page.evaluate(
+            EXTRACT_FEED_JS, SELECTORS
+        )
+        return raw_posts, f"evaluate, v{EXTRACTION_VERSION}"
+
+    async def long_descriptions(self, long_posts) -> dict:
+        # Cache first, then the shared background pages, expanding in the feed last
+        descriptions, missing = self.cached_descriptions(long_posts)
+        found = {}
+        if missing:
+            found = await self.description_fetcher.fetch(
+                [link for _, _, link in missing]
+            )
+        for index, _, link in missing:
+            if found.get(link) is None:
+                found[link] = await self.read_long_description(index)
+        return self.keep_descriptions(descriptions, long_posts, missing, found)
+
+    async def read_long_description(self, index):
+        # raw posts start with the pruned ones, which have no element left to expand
+        index -= len(self.pruned_posts)
+        if index < 0:
+            return None
+        with self.timer.measure("expand_post"):
+            item = self.page.locator(SELECTORS["item"]).nth(index)
+            await item.locator(SELECTORS["show_more"]).click()
+            detail = self.page.locator(SELECTORS["detail_description"]).first
+            try:
+                await detail.wait_for(timeout=TIMEOUT_SLIDE_ANIMATION * 1000)
+                description = await detail.inner_text()
+            except PlaywrightTimeoutError:
+                description = None
+            await self.page.locator(SELECTORS["close"]).first.click()
+            try:
+                await detail.wait_for(
+                    state="detached", timeout=TIMEOUT_SLIDE_ANIMATION * 1000
+                )
+            except PlaywrightTimeoutError:
+                self.timer.count("detail_close_timeouts")
+        return description
+
+    async def scrape(self, full):
+        self.start_cycle()
+        with self.timer.measure("load_posts"):
+            await self.load_posts(full)
+        with self.timer.measure("extract"):
+            raw_posts, source = await self.extract()
+        selected = self.select_posts(raw_posts, full)
+        with self.timer.measure("long_descriptions"):
+            descriptions = await self.long_descriptions(
+                [(index, raw) for index, raw in selected if raw.get("has_more")]
+            )
+        with self.timer.measure("match_tickers"):
+            batch = self.build_batch([raw for _, raw in selected], descriptions)
+        with self.timer.measure("write"):
+            await self.writer.write(batch)
+        self.finish_cycle(raw_posts, len(batch), full, source)
+
+
+class AsyncScraper:
+    """
+    Scrapes several feeds with one browser and one logged-in context. Every feed
+    gets its own page and polling schedule, at most max_active_feeds of them scroll
+    at the same time, and all of them write through one BatchedWriter.
+    """
+
+    def __init__(
+        self,
+        storage,
+        feeds,
+        website_credentials,
+        headless=True,
+        max_active_feeds=MAX_ACTIVE_FEEDS,
+        block_resources=True,
+        resource_policy=None,
+    ):
+        self.storage = storage
+        self.feeds = feeds
+        self.website_credentials = website_credentials
+        self.headless = headless
+        self.max_active_feeds = max_active_feeds
+        self.session = SessionStore()
+        self.context = None
+        self.login_lock = None
+        self.resource_policy = None
+        if block_resources:
+            self.resource_policy = resource_policy or ResourcePolicy()
+
+    async def new_feed_page(self, context, feed):
+        # Feed pages get their own route with the feed's overrides, it takes
+        # precedence over the context route covering login and description pages
+        page = await context.new_page()
+        if self.resource_policy is None:
+            return page, None
+        policy = self.resource_policy.with_overrides(**feed.resource_overrides)
+        return page, await install_blocker_async(page, policy)
+
+    async def sign_in(self, url):
+        # Feeds that find the session expired at the same time sign in once
+        async with self.login_lock:
+            probe = await self.context.new_page()
+            try:
+                await probe.goto(url, wait_until="domcontentloaded")
+                if not is_signed_out(probe.url):
+                    return  # another feed signed in meanwhile
+                await login_async(probe, url, self.website_credentials)
+                self.session.save(await self.context.storage_state())
+            finally:
+                await probe.close()
+
+    async def run(self):
+        started = time.perf_counter()
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless)
+            # signed in already if the last session is still valid
+            context = await browser.new_context(
+                user_agent="Chrome/91.0.4472.124",
+                storage_state=self.session.load(),
+            )
+            self.context = context
+            self.login_lock = asyncio.Lock()
+            if self.resource_policy is not None:
+                await install_blocker_async(context, self.resource_policy)
+
+            timezone = user_timezone(Settings.get_setting("timezone"))
+            writer = BatchedWriter(self.storage)
+            active = asyncio.Semaphore(self.max_active_feeds)
+            description_fetcher = AsyncLongDescriptionFetcher(context)
+            description_cache = LongDescriptionCache()
+            workers = []
+            for feed in self.feeds:
+                page, blocker = await self.new_feed_page(context, feed)
+                workers.append(
+                    FeedWorker(
+                        feed,
+                        page,
+                        writer,
+                        active,
+                        description_fetcher,
+                        description_cache,
+                        blocker,
+                        self.sign_in,
+                        started,
+                        timezone,
+                        functools.partial(self.new_feed_page, context, feed),
+                    )
+                )
+            writer_task = asyncio.create_task(writer.run())
+            try:
+                await asyncio.gather(*(worker.run() for worker in workers))
+            finally:
+                writer_task.cancel()
+                await browser.close()
+
+
+if __name__ == "__main__":
+    # Reuses the storage and website credentials of the sync scraper
+    scraper = Scraper(None)
+    scraper.build()
+    feeds = [FeedConfig(url) for url in URL_LIST.values()]
+    asyncio.run(AsyncScraper(scraper.storage, feeds, scraper.website_credentials).run())
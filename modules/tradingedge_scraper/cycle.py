@@ -0,0 +1,266 @@
+import time
+from urllib.parse import urljoin
+from loguru import logger
+from .extraction import is_past_lookback, raw_posted_date, to_post_data
+from .instrumentation import AdaptiveTimeout, CycleTimer, memory_usage
+
+
+# Incremental cycles stop scrolling once this many of the last loaded posts are known
+# and unchanged. Full depth refreshes, which also catch new likes and comments, only
+# run every FULL_REFRESH_INTERVAL seconds.
+KNOWN_SCREEN_POSTS = 10
+FULL_REFRESH_INTERVAL = 60 * 60  # 1 hour
+
+# Waits for the next posts after a scroll adapt to how long they recently took,
+# a wait that times out is retried SCROLL_WAIT_RETRIES times with a doubled timeout
+# before the end of the feed is assumed
+SCROLL_WAIT_INITIAL = 4  # seconds
+SCROLL_WAIT_MIN = 1  # seconds
+SCROLL_WAIT_MAX = 15  # seconds
+SCROLL_WAIT_RETRIES = 1
+
+# Memory budget of a long running scraper. Deep scrolls extract and empty all but
+# the last PRUNE_KEEP_POSTS feed items once more than PRUNE_AFTER_POSTS are
+# rendered, and the browser context is replaced after RECYCLE_AFTER_CYCLES cycles
+# or once the browser processes use more than BROWSER_RSS_WATERMARK.
+PRUNE_AFTER_POSTS = 60
+PRUNE_KEEP_POSTS = 20  # at least KNOWN_SCREEN_POSTS
+RECYCLE_AFTER_CYCLES = 200
+BROWSER_RSS_WATERMARK = 1500 * 1024 * 1024  # bytes
+
+
+class FeedCycle:
+    """
+    The part of scraping a feed that needs no browser: which posts a cycle writes,
+    long descriptions from the cache, the pruning and recycling budget, the next
+    poll and the bookkeeping after every cycle. Scraper (sync Playwright) and
+    FeedWorker (async Playwright) inherit it and only add the page calls.
+    """
+
+    def __init__(
+        self,
+        url,
+        find_tickers,
+        polling_rate,
+        lookback_days,
+        full_refresh_interval=FULL_REFRESH_INTERVAL,
+        feed_state=None,
+        scheduler=None,
+        prune_dom=True,
+        recycle_after_cycles=RECYCLE_AFTER_CYCLES,
+        browser_rss_watermark=BROWSER_RSS_WATERMARK,
+        live_buffer=None,
+        collector=None,
+        description_cache=None,
+        description_fetcher=None,
+        blocker=None,
+        started=None,
+        log_prefix="",
+    ):
+        self.url = url
+        self.find_tickers = find_tickers  # text -> (found tickers, watched tickers)
+        self.polling_rate = polling_rate
+        self.lookback_days = lookback_days
+        self.full_refresh_interval = full_refresh_interval
+        self.feed_state = feed_state  # None scrapes every cycle at full depth
+        self.scheduler = scheduler  # None polls every polling_rate seconds
+        self.prune_dom = prune_dom
+        self.recycle_after_cycles = recycle_after_cycles
+        self.browser_rss_watermark = browser_rss_watermark
+        self.live_buffer = live_buffer
+        # reads posts from the feed's JSON responses, None always reads the DOM
+        self.collector = collector
+        self.description_cache = description_cache
+        self.description_fetcher = description_fetcher
+        self.blocker = blocker
+        self.started = started
+        self.log_prefix = log_prefix  # tells the feeds apart in the log
+        self.page = None
+        self.posted_dates = []  # of the last cycle, when there is no feed state
+        self.pruned_posts = []  # raw posts of the items pruned in this cycle
+        self.cycles = 0  # since the page or context was created
+        self.python_rss = None
+        self.browser_rss = None
+        self.scroll_timeout = AdaptiveTimeout(
+            SCROLL_WAIT_INITIAL, SCROLL_WAIT_MIN, SCROLL_WAIT_MAX
+        )
+        self.timer = CycleTimer()
+        self.reload_seconds = None
+        self.time_to_first_post = None  # seconds from the start to the first cycle
+
+    def full_refresh_due(self) -> bool:
+        return self.feed_state is None or self.feed_state.full_refresh_due(
+            self.full_refresh_interval
+        )
+
+    def recycle_reason(self):
+        if self.recycle_after_cycles and self.cycles >= self.recycle_after_cycles:
+            return f"{self.cycles} cycles"
+        if (
+            self.browser_rss_watermark
+            and self.browser_rss is not None
+            and self.browser_rss > self.browser_rss_watermark
+        ):
+            return f"browser rss {self.browser_rss / 1e6:.0f}MB"
+        return None
+
+    def next_poll_delay(self) -> float:
+        if self.scheduler is None:
+            return self.polling_rate
+        # the known posts of the feed state cover more days than one cycle
+        if self.feed_state is not None:
+            posted_dates = [known[1] for known in self.feed_state.posts.values()]
+        else:
+            posted_dates = self.posted_dates
+        decision = self.scheduler.next_poll(posted_dates)
+        logger.info(
+            f"{self.log_prefix}Next poll in {decision.delay:.0f}s: {decision.reason}"
+        )
+        return decision.delay
+
+    def start_cycle(self):
+        self.timer = CycleTimer()
+        self.pruned_posts = []
+        if self.reload_seconds is not None:
+            # the reload before this cycle
+            self.timer.record("reload", self.reload_seconds)
+
+    def prune_due(self, post_count) -> bool:
+        return self.prune_dom and post_count > PRUNE_AFTER_POSTS
+
+    def record_pruned(self, pruned):
+        self.pruned_posts.extend(pruned)
+        self.timer.count("pruned", len(pruned))
+
+    def past_lookback(self, raw_date) -> bool:
+        return is_past_lookback(raw_date, self.lookback_days)
+
+    def api_version(self, raw: dict) -> dict:
+        # The feed state holds fingerprints of the API version of a post if there is one
+        if self.collector is None:
+            return raw
+        return self.collector.get(raw["id"]) or raw
+
+    def screen_start(self, post_count) -> int:
+        # first of the posts last_screen_is_known looks at
+        return max(0, post_count - KNOWN_SCREEN_POSTS)
+
+    def screen_is_known(self, screen) -> bool:
+        screen = [self.api_version(raw) for raw in screen]
+        return len(screen) > 0 and all(self.feed_state.is_known(raw) for raw in screen)
+
+    def drain_network_posts(self):
+        # Posts captured from the feed responses of this cycle, None if unusable
+        raw_posts = self.collector.drain()
+        if raw_posts is None:
+            logger.warning(
+                f"{self.log_prefix}No usable feed responses, reading the DOM instead"
+            )
+        return raw_posts
+
+    def covers_rendered(self, raw_posts, rendered_ids) -> bool:
+        # The responses miss rendered posts e.g. when the first screen is server rendered
+        missing = set(rendered_ids) - {raw["id"] for raw in raw_posts}
+        if missing:
+            logger.warning(
+                f"{self.log_prefix}{len(missing)} rendered posts missing from feed "
+                f"responses, reading the DOM instead"
+            )
+        return not missing
+
+    def select_posts(self, raw_posts, full):
+        # (index, raw) of the posts to write, incremental cycles only write posts
+        # that are new or were edited
+        return [
+            (index, raw)
+            for index, raw in enumerate(raw_posts)
+            if raw.get("link") is not None
+            and (full or self.feed_state is None or not self.feed_state.is_known(raw))
+        ]
+
+    def select_live_posts(self, items):
+        # (raw, appeared_at) of the reported items that are new or were edited
+        selected = []
+        for raw, appeared_at in items:
+            raw = self.api_version(raw)
+            if raw.get("link") is None:
+                continue
+            if self.feed_state is not None and self.feed_state.is_known(raw):
+                continue
+            selected.append((raw, appeared_at))
+        return selected
+
+    def cached_descriptions(self, long_posts):
+        # Descriptions of the (index, raw) long posts found in the cache, and
+        # (index, raw, absolute link) of the ones still missing
+        descriptions = {}
+        missing = []
+        for index, raw in long_posts:
+            cached = self.description_cache.get(raw)
+            if cached is not None:
+                descriptions[raw["id"]] = cached
+            else:
+                missing.append((index, raw, urljoin(self.page.url, raw["link"])))
+        return descriptions, missing
+
+    def keep_descriptions(self, descriptions, long_posts, missing, found) -> dict:
+        # Adds the descriptions found per link for the missing posts and caches them
+        for _, raw, link in missing:
+            description = found.get(link)
+            if description is not None:
+                descriptions[raw["id"]] = description
+                self.description_cache.put(raw, description)
+        if missing:
+            self.description_cache.save()
+        if long_posts:
+            logger.debug(
+                f"{self.log_prefix}{len(long_posts)} long descriptions, "
+                f"{len(long_posts) - len(missing)} cached"
+            )
+        return descriptions
+
+    def build_batch(self, raw_posts, descriptions):
+        return [
+            to_post_data(raw, self.find_tickers, descriptions.get(raw["id"]))
+            for raw in raw_posts
+        ]
+
+    def finish_cycle(self, raw_posts, written, full, source):
+        # Bookkeeping once the cycle's posts are stored, they are only remembered then
+        if self.feed_state is not None:
+            self.feed_state.update(raw_posts, full_refresh=full)
+            self.feed_state.save()
+        self.posted_dates = [raw_posted_date(raw) for raw in raw_posts]
+        self.cycles += 1
+        self.python_rss, self.browser_rss = memory_usage()
+        self.timer.count("posts", len(raw_posts))
+        self.timer.count("written", written)
+        if self.time_to_first_post is None and self.started is not None and raw_posts:
+            self.time_to_first_post = time.perf_counter() - self.started
+            logger.info(
+                f"{self.log_prefix}Time to first post: {self.time_to_first_post:.2f}s"
+            )
+        logger.info(
+            f"{self.log_prefix}{'Full' if full else 'Incremental'} cycle ({source}): "
+            f"{self.timer.summary()} | rss python {self.python_rss / 1e6:.0f}MB "
+            f"browser {self.browser_rss / 1e6:.0f}MB"
+        )
+        if self.blocker is not None:
+            # requests of the reload before this cycle and of the cycle itself
+            logger.debug(f"{self.log_prefix}Requests: {self.blocker.report()}")
+            self.blocker.reset()
+
+    def finish_live_posts(self, selected, timer):
+        # Bookkeeping once the (raw, appeared_at) live posts are stored
+        if self.feed_state is not None:
+            self.feed_state.update([raw for raw, _ in selected])
+            self.feed_state.save()
+        stored_at = time.time() * 1000
+        latencies = [(stored_at - appeared_at) / 1000 for _, appeared_at in selected]
+        for latency in latencies:
+            timer.record("appearance_to_storage", latency)
+        timer.count("live_posts", len(selected))
+        logger.info(
+            f"{self.log_prefix}Live: {len(selected)} posts stored "
+            f"{max(latencies):.1f}s after they appeared"
+        )
@@ -0,0 +1,163 @@
+import re
+from datetime import datetime
+from ..repository.repository_interface import PostData
+
+
+# Bump EXTRACTION_VERSION whenever a selector or the extraction script changes,
+# it is logged with every scrape cycle so broken markup is easy to date.
+EXTRACTION_VERSION = 4
+
+SELECTORS = {
+    # pruned items are empty shells, see PRUNE_FEED_JS
+    "item": "li.feed-item:not([data-pruned])",
+    "author": ".mighty-attribution-name span",
+    "title": ".feed-item-post-title h1",
+    "description": ".feed-item-post-description",
+    "show_more": ".mighty-wysiwyg-content-show-more",
+    "likes": ".mighty-post-stat-cheer .mighty-post-stat-cheer-count",
+    "comments": ".mighty-post-stat-comment .mighty-post-stat-comment-count",
+    "link": ".feed-item-post",
+    "category": ".post-tag-name",
+    "created_at": ".feed-item-post-created-at",
+    "created_at_meta": ".feed-item-meta-location .feed-item-post-created-at",
+    "detail_description": ".detail-layout-description",
+    "close": ".btn-close",
+}
+
+POSTED_DATE_FORMAT = "%a, %B %d, %Y, %I:%M%p"
+
+# Reads one li.feed-item into a plain object, innerText matches Playwright's inner_text()
+EXTRACT_ITEM_JS = """
+function extractItem(item, selectors) {
+    const text = (selector) => {
+        const node = item.querySelector(selector);
+        return node ? node.innerText : null;
+    };
+    const attribute = (selector, name) => {
+        const node = item.querySelector(selector);
+        return node ? node.getAttribute(name) : null;
+    };
+    return {
+        id: item.getAttribute("data-post-id"),
+        author: text(selectors.author),
+        title: text(selectors.title),
+        description: text(selectors.description),
+        has_more: item.querySelector(selectors.show_more) !== null,
+        likes: text(selectors.likes),
+        comments: text(selectors.comments),
+        link: attribute(selectors.link, "href"),
+        category: text(selectors.category),
+        created_at: attribute(selectors.created_at, "title"),
+        created_at_text: text(selectors.created_at_meta),
+    };
+}
+"""
+
+# One round trip for the whole feed, called as page.evaluate(EXTRACT_FEED_JS, SELECTORS)
+EXTRACT_FEED_JS = f"""
+(selectors) => {{
+    {EXTRACT_ITEM_JS}
+    return Array.from(document.querySelectorAll(selectors.item)).map(
+        (item) => extractItem(item, selectors)
+    );
+}}
+"""
+
+
+# Only the items from index start on, used to look at the last loaded screen of posts.
+# Called as page.evaluate(EXTRACT_FEED_FROM_JS, [SELECTORS, start])
+EXTRACT_FEED_FROM_JS = f"""
+([selectors, start]) => {{
+    {EXTRACT_ITEM_JS}
+    return Array.from(document.querySelectorAll(selectors.item)).slice(start).map(
+        (item) => extractItem(item, selectors)
+    );
+}}
+"""
+
+# Extracts all but the last keep items and empties them, so a deep scroll doesn't
+# keep every post of the feed in the DOM. The items stay as shells of the same
+# height, the scroll position and the feed's infinite scroll don't change.
+# Called as page.evaluate(PRUNE_FEED_JS, [SELECTORS, keep])
+PRUNE_FEED_JS = f"""
+([selectors, keep]) => {{
+    {EXTRACT_ITEM_JS}
+    const items = Array.from(document.querySelectorAll(selectors.item));
+    const pruned = items.slice(0, Math.max(0, items.length - keep));
+    const raws = pruned.map((item) => extractItem(item, selectors));
+    // read all heights before changing the DOM, one layout instead of one per item
+    const heights = pruned.map((item) => item.offsetHeight);
+    pruned.forEach((item, i) => {{
+        item.style.height = `${{heights[i]}}px`;
+        item.replaceChildren();
+        item.setAttribute("data-pruned", "");
+    }});
+    return raws;
+}}
+"""
+
+# Ids of all rendered feed items that link to a post, in feed order
+FEED_IDS_JS = """
+(selectors) => Array.from(document.querySelectorAll(selectors.item))
+    .filter((item) => item.querySelector(selectors.link) !== null)
+    .map((item) => item.getAttribute("data-post-id"))
+"""
+
+SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight);"
+
+# Resolves once more than count feed items are rendered, for page.wait_for_function
+MORE_POSTS_JS = """
+([selector, count]) => document.querySelectorAll(selector).length > count
+"""
+
+
+def parse_posted_date(created_at):
+    # The created-at title looks like "Tue, January 14, 2025, 03:12PM"
+    if created_at is None:
+        return None
+    return datetime.strptime(created_at, POSTED_DATE_FORMAT).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+
+def is_past_lookback(created_at_text, lookback_days) -> bool:
+    # The feed shows relative dates like "Posted 3d ago", anything in weeks or more is old
+    match = re.match(r"Posted (\d+)([dwmy]) ago", created_at_text or "")
+    if not match:
+        return False
+    value = int(match.group(1))
+    unit = match.group(2)
+    return unit == "d" and value > lookback_days or unit in ["w", "m", "y"]
+
+
+def raw_posted_date(raw: dict):
+    # Items read from the feed API already carry posted_date, DOM items the title text
+    if raw.get("posted_date") is not None:
+        return raw["posted_date"]
+    return parse_posted_date(raw.get("created_at"))
+
+
+def to_post_data(raw: dict, find_tickers, description=None):
+    # Builds the PostData of one extracted feed item, None for items without a link.
+    # description overrides the short description, e.g. with the expanded long one.
+    if raw.get("link") is None:
+        return None
+    title = raw.get("title")
+    if description is None:
+        description = raw.get("description")
+    posted_time = raw_posted_date(raw)
+    watched_tickers, found_tickers = find_tickers(f"{title or ''} {description or ''}")
+    return PostData(
+        id=raw.get("id"),
+        author=raw.get("author"),
+        title=title,
+        description=description,
+        likes=int(raw.get("likes") or 0),
+        comments=int(raw.get("comments") or 0),
+        posted_date=posted_time,
+        date=posted_time,
+        link=raw["link"],
+        category=raw.get("category"),
+        ticker_notification_sent=", ".join(watched_tickers),
+        found_tickers=", ".join(found_tickers),
+    )
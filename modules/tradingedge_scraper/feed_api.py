@@ -0,0 +1,204 @@
+import re
+import threading
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from loguru import logger
+
+
+# The feed is loaded over XHR as JSON. The mapping below is what the responses looked
+# like when this was written; bump FEED_API_VERSION when it changes. Anything that does
+# not fit raises FeedSchemaError and the scraper falls back to reading the DOM.
+FEED_API_VERSION = 1
+FEED_API_URL_PATTERN = re.compile(r"/api/v\d+/.*(feed|posts)")
+
+# field -> candidate paths in a feed item, the first one present wins
+FIELD_PATHS = {
+    "id": [("id",), ("post_id",)],
+    "author": [("creator", "name"), ("author", "name"), ("user", "name")],
+    "title": [("title",)],
+    "description": [("description",), ("body",), ("content",)],
+    "likes": [("cheers_count",), ("likes_count",), ("reactions_count",)],
+    "comments": [("comments_count",), ("replies_count",)],
+    "link": [("permalink",), ("url",), ("links", "html")],
+    "category": [("tag", "name"), ("tags", 0, "name"), ("space", "name")],
+    "created_at": [("created_at",), ("published_at",)],
+}
+REQUIRED_FIELDS = ("id", "link", "created_at")
+ITEM_LIST_KEYS = ("items", "posts", "data", "results")
+
+
+class FeedSchemaError(ValueError):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    # Descriptions come as html, keep the line breaks innerText would show
+    PARAGRAPHS = {"p", "div", "h1", "h2", "h3", "blockquote", "ul", "ol"}
+    LINES = {"br", "li"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.PARAGRAPHS:
+            self.parts.append("\n\n")
+        elif tag in self.LINES:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(value):
+    if value is None or "<" not in value:
+        return value
+    parser = _TextExtractor()
+    parser.feed(value)
+    return re.sub(r"\n[ \t]*\n\s*", "\n\n", "".join(parser.parts)).strip()
+
+
+def _lookup(item, path):
+    value = item
+    for key in path:
+        if isinstance(key, int):
+            if not isinstance(value, list) or len(value) <= key:
+                return None
+        elif not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _posted_date(value) -> str:
+    # ISO timestamps or epoch seconds. The DOM path reads the created-at title, which
+    # the browser renders in local time, so convert to local time to match it.
+    if isinstance(value, (int, float)):
+        posted = datetime.fromtimestamp(value, tz=timezone.utc)
+    else:
+        posted = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if posted.tzinfo is not None:
+        posted = posted.astimezone().replace(tzinfo=None)
+    return posted.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_feed_item(item: dict) -> dict:
+    # Maps one API item onto the dict shape the DOM extraction produces
+    if not isinstance(item, dict):
+        raise FeedSchemaError(f"Feed item is {type(item).__name__}, not an object")
+    raw = {}
+    for field, paths in FIELD_PATHS.items():
+        raw[field] = next(
+            (value for value in (_lookup(item, p) for p in paths) if value is not None),
+            None,
+        )
+    missing = [field for field in REQUIRED_FIELDS if raw[field] is None]
+    if missing:
+        raise FeedSchemaError(f"Feed item without {missing}, keys: {sorted(item)}")
+    try:
+        raw["posted_date"] = _posted_date(raw.pop("created_at"))
+        raw["likes"] = str(int(raw["likes"] or 0))
+        raw["comments"] = str(int(raw["comments"] or 0))
+    except (TypeError, ValueError) as e:
+        raise FeedSchemaError(f"Unexpected feed item value: {e}") from e
+    raw["id"] = str(raw["id"])
+    raw["description"] = html_to_text(raw["description"])
+    # the API has the full text, nothing to expand
+    raw["has_more"] = False
+    return raw
+
+
+def parse_feed_response(payload) -> list[dict]:
+    if isinstance(payload, list):
+        items = payload
+    elif isinstance(payload, dict):
+        items = next(
+            (
+                payload[key]
+                for key in ITEM_LIST_KEYS
+                if isinstance(payload.get(key), list)
+            ),
+            None,
+        )
+        if items is None:
+            raise FeedSchemaError(
+                f"No item list in feed response, keys: {sorted(payload)}"
+            )
+    else:
+        raise FeedSchemaError(f"Feed response is {type(payload).__name__}")
+    return [parse_feed_item(item) for item in items]
+
+
+class FeedResponseCollector:
+    """
+    Collects posts from the feed's JSON responses while the page loads and scrolls.
+    Attach it once with page.on("response", collector.on_response) (on_response_async
+    for async pages), then drain() it after every cycle.
+    """
+
+    def __init__(self, url_pattern=FEED_API_URL_PATTERN):
+        self.url_pattern = url_pattern
+        self._lock = threading.Lock()
+        self._posts = {}
+        self.responses = 0
+        self.schema_errors = 0
+
+    def _wants(self, response) -> bool:
+        if not self.url_pattern.search(response.url) or not response.ok:
+            return False
+        return "json" in (response.headers.get("content-type") or "")
+
+    def _ingest(self, payload):
+        try:
+            posts = parse_feed_response(payload)
+        except FeedSchemaError as e:
+            with self._lock:
+                self.schema_errors += 1
+            logger.warning(f"Feed response did not match v{FEED_API_VERSION}: {e}")
+            return
+        self.add(posts)
+
+    def on_response(self, response):
+        if not self._wants(response):
+            return
+        try:
+            payload = response.json()
+        except Exception as e:
+            # the page may navigate away before the body is read
+            logger.debug(f"Could not read feed response {response.url}: {e}")
+            return
+        self._ingest(payload)
+
+    async def on_response_async(self, response):
+        # Same as on_response, for pages of playwright.async_api
+        if not self._wants(response):
+            return
+        try:
+            payload = await response.json()
+        except Exception as e:
+            logger.debug(f"Could not read feed response {response.url}: {e}")
+            return
+        self._ingest(payload)
+
+    def add(self, posts):
+        with self._lock:
+            self.responses += 1
+            for post in posts:
+                # later responses carry the newer counts
+                self._posts[post["id"]] = post
+
+    def get(self, id):
+        with self._lock:
+            return self._posts.get(id)
+
+    def drain(self):
+        # Posts collected since the last drain, newest first like the rendered feed
+        with self._lock:
+            posts = sorted(
+                self._posts.values(), key=lambda post: post["posted_date"], reverse=True
+            )
+            usable = self.schema_errors == 0 and len(posts) > 0
+            self._posts = {}
+            self.responses = 0
+            self.schema_errors = 0
+        return posts if usable else None
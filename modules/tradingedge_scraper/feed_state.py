@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from config import LOCAL_DIR
+from .extraction import raw_posted_date
+
+
+FEED_STATE_FILE = os.path.join(LOCAL_DIR, "feed_state.json")
+# Known posts older than this (relative to the newest one) are forgotten
+KNOWN_POSTS_RETENTION_DAYS = 8
+
+
+def post_fingerprint(raw: dict) -> str:
+    # Fingerprint of the content shown in the feed. Likes and comments are left out,
+    # they change all the time and are picked up by the full refreshes instead.
+    content = [
+        raw.get("title"),
+        raw.get("description"),
+        raw.get("category"),
+        raw.get("has_more"),
+    ]
+    return hashlib.sha1(json.dumps(content).encode("utf-8")).hexdigest()[:16]
+
+
+class FeedState:
+    """
+    High-water mark of one feed: the posts already stored, with the fingerprint
+    they had, the newest posted date seen and when the last full refresh ran.
+    Persisted as JSON in the local data directory, keyed by feed url.
+    """
+
+    def __init__(self, url, path=FEED_STATE_FILE):
+        self.url = url
+        self.path = path
+        state = self._load_all().get(url, {})
+        self.posts = state.get("posts", {})  # id -> [fingerprint, posted_date]
+        self.high_water = state.get("high_water")
+        self.last_full_refresh = state.get("last_full_refresh", 0)
+
+    def _load_all(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def is_known(self, raw: dict) -> bool:
+        known = self.posts.get(raw.get("id"))
+        return known is not None and known[0] == post_fingerprint(raw)
+
+    def full_refresh_due(self, interval: float) -> bool:
+        return time.time() - self.last_full_refresh >= interval
+
+    def update(self, raw_posts, full_refresh=False):
+        for raw in raw_posts:
+            if raw.get("id") is None or raw.get("link") is None:
+                continue
+            posted_date = raw_posted_date(raw)
+            self.posts[raw["id"]] = [post_fingerprint(raw), posted_date]
+            if posted_date and (
+                self.high_water is None or posted_date > self.high_water
+            ):
+                self.high_water = posted_date
+        if full_refresh:
+            self.last_full_refresh = time.time()
+        if self.high_water is not None:
+            cutoff = datetime.strptime(
+                self.high_water, "%Y-%m-%d %H:%M:%S"
+            ) - timedelta(days=KNOWN_POSTS_RETENTION_DAYS)
+            cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+            self.posts = {
+                id: known
+                for id, known in self.posts.items()
+                if known[1] is None or known[1] >= cutoff
+            }
+
+    def save(self):
+        # Other feeds in the file are kept, the file is swapped in atomically
+        states = self._load_all()
+        states[self.url] = {
+            "posts": self.posts,
+            "high_water": self.high_water,
+            "last_full_refresh": self.last_full_refresh,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(states, f)
+        os.replace(tmp_path, self.path)
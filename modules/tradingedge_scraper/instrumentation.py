@@ -0,0 +1,118 @@
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class CycleTimer:
+    """
+    Collects how long the steps of one scrape cycle took (scrolls, waits, extraction,
+    writes) and how often they ran, summary() renders it as one log line.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # label -> [count, total seconds, max seconds]
+        self.counters = {}
+
+    @contextmanager
+    def measure(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(label, time.perf_counter() - start)
+
+    def record(self, label, seconds):
+        span = self.spans.setdefault(label, [0, 0.0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+        span[2] = max(span[2], seconds)
+
+    def count(self, label, value=1):
+        self.counters[label] = self.counters.get(label, 0) + value
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        parts = [f"total {self.elapsed():.2f}s"]
+        # slowest steps first
+        for label, (count, total, longest) in sorted(
+            self.spans.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            if count == 1:
+                parts.append(f"{label} {total:.2f}s")
+            else:
+                parts.append(f"{label} {count}x {total:.2f}s (max {longest:.2f}s)")
+        parts.extend(f"{label} {value}" for label, value in self.counters.items())
+        return " | ".join(parts)
+
+
+class AdaptiveTimeout:
+    """
+    Timeout for a wait that usually takes about the same time, e.g. the next posts
+    rendering after a scroll. It follows the slowest of the recent successful waits
+    (times headroom) within [minimum, maximum]; backoff(attempt) doubles it for retries.
+    """
+
+    def __init__(self, initial, minimum, maximum, headroom=2.0, window=20):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.headroom = headroom
+        self.current = initial
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds):
+        self._recent.append(seconds)
+        self.current = min(
+            self.maximum, max(self.minimum, max(self._recent) * self.headroom)
+        )
+
+    def backoff(self, attempt) -> float:
+        return min(self.maximum, self.current * 2**attempt)
+
+
+def rss_bytes(pid=None) -> int:
+    # Resident set size of one process from /proc, 0 where that is not available
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0
+
+
+def tree_rss_bytes(pid=None) -> int:
+    # RSS of a process and all of its descendants, e.g. this process plus the
+    # Playwright driver and every Chromium process it started
+    root = pid or os.getpid()
+    children = {}
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except FileNotFoundError:
+        return rss_bytes(root)
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # the command name may contain spaces, the fields after it don't
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (FileNotFoundError, ProcessLookupError, PermissionError, IndexError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total = 0
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        total += rss_bytes(current)
+        stack.extend(children.get(current, []))
+    return total
+
+
+def memory_usage() -> tuple[int, int]:
+    # (Python, browser) RSS in bytes, the browser being everything this process
+    # started: the Playwright driver and its Chromium processes
+    python = rss_bytes()
+    return python, tree_rss_bytes() - python
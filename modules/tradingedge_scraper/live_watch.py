@@ -0,0 +1,74 @@
+import json
+import threading
+from .extraction import EXTRACT_ITEM_JS
+
+
+WATCH_BINDING = "__tradingedgeFeedItem"
+WATCH_TICK = 1  # seconds between checks for new items while watching
+WATCH_DEBOUNCE = 250  # milliseconds, lets an inserted item finish rendering
+WATCH_RELOAD_INTERVAL = 60 * 15  # seconds, safety reload of a watched feed
+
+
+def watch_script(selectors) -> str:
+    """
+    Init script for a feed page: a MutationObserver reporting every feed item that
+    is inserted, or whose content changes, to the WATCH_BINDING binding together
+    with the time it first appeared (epoch milliseconds). Add it with
+    page.add_init_script so it survives reloads.
+    """
+    return f"""
+(() => {{
+    const selectors = {json.dumps(selectors)};
+    {EXTRACT_ITEM_JS}
+    const appeared = new WeakMap();
+    const pending = new Set();
+    let timer = null;
+    const flush = () => {{
+        timer = null;
+        for (const item of pending) {{
+            if (item.isConnected && window.{WATCH_BINDING}) {{
+                window.{WATCH_BINDING}(extractItem(item, selectors), appeared.get(item));
+            }}
+        }}
+        pending.clear();
+    }};
+    const report = (item) => {{
+        if (!appeared.has(item)) appeared.set(item, Date.now());
+        pending.add(item);
+        if (timer === null) timer = setTimeout(flush, {WATCH_DEBOUNCE});
+    }};
+    new MutationObserver((mutations) => {{
+        for (const mutation of mutations) {{
+            for (const node of mutation.addedNodes) {{
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                const item = node.closest(selectors.item);
+                if (item) report(item);
+                node.querySelectorAll(selectors.item).forEach(report);
+            }}
+        }}
+    }}).observe(document, {{ childList: true, subtree: true }});
+}})();
+"""
+
+
+class LiveFeedBuffer:
+    # Items reported by the watch script, newest version per post id. Its on_item
+    # is the binding callback, see page.expose_binding.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+
+    def on_item(self, source, raw, appeared_at):
+        if not raw or raw.get("id") is None:
+            return
+        with self._lock:
+            first = self._items.get(raw["id"], (None, appeared_at))[1]
+            self._items[raw["id"]] = (raw, first)
+
+    def drain(self) -> list:
+        # [(raw, appeared_at)] reported since the last drain
+        with self._lock:
+            items = list(self._items.values())
+            self._items = {}
+        return items
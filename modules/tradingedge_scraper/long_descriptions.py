@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from loguru import logger
+from config import LOCAL_DIR
+from .extraction import SELECTORS
+from .feed_state import post_fingerprint
+
+
+LONG_DESCRIPTION_PAGES = 4  # background pages loading post details in parallel
+LONG_DESCRIPTION_TIMEOUT = 15000  # milliseconds
+LONG_DESCRIPTION_CACHE_FILE = os.path.join(LOCAL_DIR, "long_descriptions.json")
+MAX_CACHED_DESCRIPTIONS = 2000
+
+
+class LongDescriptionCache:
+    """
+    Expanded descriptions keyed by post id and the fingerprint of the post as shown
+    in the feed, so a long post is only expanded again once it was edited.
+    """
+
+    def __init__(
+        self, path=LONG_DESCRIPTION_CACHE_FILE, max_entries=MAX_CACHED_DESCRIPTIONS
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.path, "r") as f:
+                self._entries = OrderedDict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(raw) -> str:
+        return f"{raw['id']}:{post_fingerprint(raw)}"
+
+    def get(self, raw):
+        description = self._entries.get(self._key(raw))
+        if description is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return description
+
+    def put(self, raw, description):
+        # older versions of the post are not needed anymore
+        prefix = f"{raw['id']}:"
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+        self._entries[self._key(raw)] = description
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp_path, self.path)
+
+
+class LongDescriptionFetcher:
+    """
+    Loads post detail pages in a small pool of background pages. Every page is sent
+    to its link with wait_until="commit", which returns as soon as the navigation
+    starts, and the descriptions are collected afterwards, so the pool's pages load
+    in parallel even with the sync API.
+    """
+
+    def __init__(
+        self, context, pages=LONG_DESCRIPTION_PAGES, timeout=LONG_DESCRIPTION_TIMEOUT
+    ):
+        self.context = context
+        self.size = pages
+        self.timeout = timeout
+        self.pages = []
+
+    def _pool(self):
+        while len(self.pages) < self.size:
+            self.pages.append(self.context.new_page())
+        return self.pages
+
+    def fetch(self, links) -> dict:
+        descriptions = {}
+        links = list(dict.fromkeys(links))
+        for start in range(0, len(links), self.size):
+            chunk = list(zip(self._pool(), links[start : start + self.size]))
+            for page, link in chunk:
+                try:
+                    page.goto(link, wait_until="commit", timeout=self.timeout)
+                except Exception as e:
+                    logger.warning(f"Could not open {link}: {e}")
+            for page, link in chunk:
+                try:
+                    detail = page.wait_for_selector(
+                        SELECTORS["detail_description"], timeout=self.timeout
+                    )
+                    descriptions[link] = detail.inner_text()
+                except Exception as e:
+                    logger.warning(f"No description found on {link}: {e}")
+        return descriptions
+
+    def close(self):
+        for page in self.pages:
+            page.close()
+        self.pages = []
+
+
+class AsyncLongDescriptionFetcher:
+    # Same as LongDescriptionFetcher for playwright.async_api, shared by all feeds
+
+    def __init__(
+        self, context, pages=LONG_DESCRIPTION_PAGES, timeout=LONG_DESCRIPTION_TIMEOUT
+    ):
+        self.context = context
+        self.size = pages
+        self.timeout = timeout
+        self.pages = []
+        self.opened = 0
+        self.idle = asyncio.Queue()
+
+    async def _fetch_one(self, link):
+        if self.idle.empty() and self.opened < self.size:
+            # count the page before awaiting, so concurrent calls don't overshoot
+            self.opened += 1
+            page = await self.context.new_page()
+            self.pages.append(page)
+        else:
+            page = await self.idle.get()
+        try:
+            await page.goto(link, wait_until="commit", timeout=self.timeout)
+            detail = await page.wait_for_selector(
+                SELECTORS["detail_description"], timeout=self.timeout
+            )
+            return await detail.inner_text()
+        except Exception as e:
+            logger.warning(f"No description found on {link}: {e}")
+            return None
+        finally:
+            self.idle.put_nowait(page)
+
+    async def fetch(self, links) -> dict:
+        links = list(dict.fromkeys(links))
+        results = await asyncio.gather(*(self._fetch_one(link) for link in links))
+        return {
+            link: description
+            for link, description in zip(links, results)
+            if description is not None
+        }
+
+    async def close(self):
+        for page in self.pages:
+            await page.close()
+        self.pages = []
+        self.opened = 0
+        self.idle = asyncio.Queue()
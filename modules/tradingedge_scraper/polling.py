@@ -0,0 +1,250 @@
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from loguru import logger
+
+
+MARKET_TIMEZONE = "America/New_York"
+PRE_MARKET_OPEN = time(4, 0)
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+AFTER_HOURS_CLOSE = time(20, 0)
+
+# Unscheduled NYSE closures (national days of mourning), the regular holidays and
+# early closes follow from the exchange's rules in market_holidays/market_early_closes
+MARKET_CLOSURES = {
+    date(2025, 1, 9),
+}
+JUNETEENTH_SINCE = 2022  # first year the NYSE closed on Juneteenth
+
+
+def _nth_weekday(year, month, weekday, n):
+    # n-th (from 1, or -1 for the last) weekday of a month, Monday is 0
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta((weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(1) if month < 12 else date(year, 12, 31)
+    return last - timedelta((last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # Gregorian Easter Sunday (Meeus/Jones/Butcher algorithm)
+    a, b, c = year % 19, year // 100, year % 100
+    g = (b - (b + 8) // 25 + 1) // 3
+    h = (19 * a + b - b // 4 - g + 15) % 30
+    l = (32 + 2 * (b % 4) + 2 * (c // 4) - h - c % 4) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    n = h + l - 7 * m + 114
+    return date(year, n // 31, n % 31 + 1)
+
+
+def _observed(day):
+    # Holidays on a Saturday are observed on Friday, on a Sunday on Monday
+    if day.weekday() == 5:
+        return day - timedelta(1)
+    if day.weekday() == 6:
+        return day + timedelta(1)
+    return day
+
+
+def market_holidays(year) -> set[date]:
+    # Full-day NYSE holidays of a year
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day on a Saturday is not made up on the Friday before (NYSE rule 7.2)
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= JUNETEENTH_SINCE:
+        holidays.add(_observed(date(year, 6, 19)))
+    return holidays
+
+
+def market_early_closes(year) -> set[date]:
+    # Days the NYSE closes at EARLY_CLOSE: the day before Independence Day and
+    # Christmas Eve when they fall on Monday to Thursday, and the day after Thanksgiving
+    early_closes = {_nth_weekday(year, 11, 3, 4) + timedelta(1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() <= 3:
+            early_closes.add(day)
+    return early_closes
+
+
+# The next poll is scheduled when a new post has this probability to be out,
+# 0.5 polls at the median wait for the next post
+TARGET_NEW_POST_PROBABILITY = 0.5
+RECENT_WINDOW = timedelta(hours=1)  # posts this recent count as a burst
+HISTORY_STEP = timedelta(minutes=15)  # resolution of the time spent per session
+
+
+class MarketCalendar:
+    # Trading sessions of the US stock market: "regular", "extended" (pre-market
+    # and after hours) and "closed" (nights, weekends and holidays)
+
+    def __init__(
+        self,
+        timezone=MARKET_TIMEZONE,
+        closures=MARKET_CLOSURES,
+    ):
+        self.timezone = ZoneInfo(timezone)
+        self.closures = closures
+        self._years = {}  # year -> (holidays, early closes)
+
+    def _calendar(self, year):
+        if year not in self._years:
+            self._years[year] = (
+                market_holidays(year) | self.closures,
+                market_early_closes(year),
+            )
+        return self._years[year]
+
+    def session(self, at: datetime) -> str:
+        local = at.astimezone(self.timezone)
+        day = local.date()
+        holidays, early_closes = self._calendar(day.year)
+        if local.weekday() >= 5 or day in holidays:
+            return "closed"
+        close = EARLY_CLOSE if day in early_closes else MARKET_CLOSE
+        now = local.time()
+        if MARKET_OPEN <= now < close:
+            return "regular"
+        if PRE_MARKET_OPEN <= now < AFTER_HOURS_CLOSE:
+            return "extended"
+        return "closed"
+
+    def next_change(self, at: datetime, limit: timedelta) -> datetime | None:
+        # First session change within limit, to the resolution of a minute
+        current = self.session(at)
+        step = at.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        while step - at <= limit:
+            if self.session(step) != current:
+                return step
+            step += timedelta(minutes=1)
+        return None
+
+
+def user_timezone(name) -> ZoneInfo:
+    # The "timezone" setting, UTC when it is missing or unknown
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {name!r}, using UTC")
+        return ZoneInfo("UTC")
+
+
+@dataclass
+class PollDecision:
+    delay: float  # seconds until the next poll
+    reason: str
+    session: str
+    rate: float  # expected posts per hour
+
+
+class PollScheduler:
+    """
+    Picks the delay until the next poll of a feed from the posts it already has.
+    The arrival rate is estimated per market session from the posted dates (with
+    the last hour counting on its own, so bursts of posts are followed closely),
+    and the next poll is scheduled when a new post is out with
+    TARGET_NEW_POST_PROBABILITY, assuming posts arrive as a Poisson process.
+    During regular trading hours the feed is polled at least every regular_rate
+    seconds, all delays stay within [min_rate, max_rate] and end early at the
+    next market open or close.
+    """
+
+    def __init__(
+        self,
+        regular_rate,
+        min_rate,
+        max_rate,
+        calendar=None,
+        timezone=None,
+        target_probability=TARGET_NEW_POST_PROBABILITY,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self.regular_rate = min(max(min_rate, regular_rate), self.max_rate)
+        self.calendar = calendar or MarketCalendar()
+        self.timezone = timezone or ZoneInfo("UTC")
+        self.target_probability = target_probability
+
+    def rates(self, posted, now) -> dict:
+        # Posts per hour in each session over the history, and in the last hour
+        if not posted:
+            return {}
+        start = min(posted)
+        hours = {}
+        step = start
+        while step < now:
+            session = self.calendar.session(step)
+            hours[session] = hours.get(session, 0) + HISTORY_STEP / timedelta(hours=1)
+            step += HISTORY_STEP
+        counts = {}
+        for at in posted:
+            session = self.calendar.session(at)
+            counts[session] = counts.get(session, 0) + 1
+        rates = {
+            session: counts.get(session, 0) / spent for session, spent in hours.items()
+        }
+        rates["recent"] = sum(1 for at in posted if now - at <= RECENT_WINDOW) / (
+            RECENT_WINDOW / timedelta(hours=1)
+        )
+        return rates
+
+    def next_poll(self, posted_dates, now=None) -> PollDecision:
+        # posted_dates are "%Y-%m-%d %H:%M:%S" strings like PostData, read in the
+        # scheduler's timezone (the "timezone" setting) rather than the machine's
+        now = (
+            datetime.now(self.timezone)
+            if now is None
+            else now.astimezone(self.timezone)
+        )
+        posted = [
+            datetime.strptime(posted_date, "%Y-%m-%d %H:%M:%S").replace(
+                tzinfo=self.timezone
+            )
+            for posted_date in posted_dates
+            if posted_date
+        ]
+        posted = [at for at in posted if at <= now]
+        session = self.calendar.session(now)
+        rates = self.rates(posted, now)
+        rate = max(rates.get(session, 0), rates.get("recent", 0))
+        ceiling = self.regular_rate if session == "regular" else self.max_rate
+
+        if rate > 0:
+            delay = -math.log(1 - self.target_probability) / rate * 3600
+            reason = f"{rate:.1f} posts/h expected"
+            if rates.get("recent", 0) > rates.get(session, 0):
+                reason += " (recent burst)"
+        else:
+            delay = ceiling
+            reason = f"no posts in {session} sessions so far"
+        if delay > ceiling:
+            delay = ceiling
+            reason += f", capped for the {session} session"
+        elif delay < self.min_rate:
+            delay = self.min_rate
+            reason += ", at the minimum polling rate"
+
+        change = self.calendar.next_change(now, timedelta(seconds=delay))
+        if change is not None:
+            delay = max(self.min_rate, (change - now).total_seconds())
+            reason += f", until the {self.calendar.session(change)} session starts"
+
+        at = (now + timedelta(seconds=delay)).astimezone(self.timezone)
+        return PollDecision(
+            delay=delay,
+            reason=f"{session} market, {reason}, next poll at {at:%H:%M %Z}",
+            session=session,
+            rate=rate,
+        )
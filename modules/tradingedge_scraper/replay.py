@@ -0,0 +1,192 @@
+import argparse
+import base64
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from loguru import logger
+from config import CURRENT_DIR
+from .extraction import SELECTORS
+
+
+SITE_URL = "https://tradingedge.club"
+REPLAY_DIR = os.path.join(CURRENT_DIR, "benchmarks", "fixtures", "replay")
+# response headers that don't apply to the replayed, uncompressed bodies
+DROPPED_HEADERS = {
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+    "connection",
+    "set-cookie",
+    "strict-transport-security",
+    "content-security-policy",
+}
+TEXT_TYPES = ("text/", "json", "javascript", "xml")
+
+
+def record(scraper, out_dir=REPLAY_DIR, name="feed"):
+    """
+    Records one full cycle of scraper against the real site: a HAR with every
+    response of the feed page, its scrolls and the post detail pages, plus HTML
+    snapshots of the scrolled feed and of an expanded post. Needs the website
+    credentials or a stored session, see Scraper.build.
+    """
+    from playwright.sync_api import sync_playwright
+
+    os.makedirs(out_dir, exist_ok=True)
+    har_path = os.path.join(out_dir, f"{name}.har")
+    scraper.context_options = {
+        "record_har_path": har_path,
+        "record_har_content": "embed",
+        "record_har_url_filter": re.compile(re.escape(urlparse(SITE_URL).netloc)),
+    }
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=scraper.headless)
+        context = scraper.open_context(browser)
+        scraper.scrape_posts(full=True)
+        with open(os.path.join(out_dir, f"{name}.html"), "w") as f:
+            f.write(scraper.page.content())
+        show_more = scraper.page.query_selector(
+            f"{SELECTORS['item']} {SELECTORS['show_more']}"
+        )
+        if show_more is not None:
+            # the detail offcanvas of the first long post
+            show_more.click()
+            scraper.page.wait_for_selector(SELECTORS["detail_description"])
+            with open(os.path.join(out_dir, f"{name}_detail.html"), "w") as f:
+                f.write(scraper.page.content())
+        # the HAR is written when the context closes
+        context.close()
+        browser.close()
+    logger.info(f"Recorded {scraper.url} into {har_path}")
+    return har_path
+
+
+class ReplayServer:
+    """
+    Serves the responses of a HAR from a local port, so an unchanged Scraper can
+    run against it with site_url=server.url and no network. Responses are looked
+    up by method, path and query. Repeated requests get the recorded responses in
+    order, and the last one once they run out. Absolute links to the site in text
+    bodies are rewritten to the server, anything not recorded is a 404.
+    """
+
+    def __init__(self, har_path, site_url=SITE_URL, host="127.0.0.1", port=0):
+        self.site_url = site_url.rstrip("/")
+        self.responses = {}  # (method, path) -> [HAR response]
+        self.served = {}
+        self.misses = []
+        self._lock = threading.Lock()
+        with open(har_path, "r") as f:
+            entries = json.load(f)["log"]["entries"]
+        site_host = urlparse(self.site_url).netloc
+        for entry in entries:
+            url = urlparse(entry["request"]["url"])
+            if url.netloc != site_host:
+                continue
+            path = url.path + (f"?{url.query}" if url.query else "")
+            self.responses.setdefault((entry["request"]["method"], path), []).append(
+                entry["response"]
+            )
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server._serve(self, "GET")
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._serve(self, "POST")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def _next(self, method, path):
+        with self._lock:
+            recorded = self.responses.get((method, path))
+            if not recorded:
+                self.misses.append((method, path))
+                return None
+            index = self.served.get((method, path), 0)
+            self.served[(method, path)] = index + 1
+            return recorded[min(index, len(recorded) - 1)]
+
+    def _rewrite(self, text) -> str:
+        text = text.replace(self.site_url, self.url)
+        # urls in JSON may have escaped slashes
+        return text.replace(
+            self.site_url.replace("/", "\\/"), self.url.replace("/", "\\/")
+        )
+
+    def _serve(self, handler, method):
+        response = self._next(method, handler.path)
+        if response is None:
+            handler.send_error(404)
+            return
+        content = response.get("content", {})
+        mime_type = content.get("mimeType", "")
+        text = content.get("text", "")
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(text)
+        elif any(kind in mime_type for kind in TEXT_TYPES):
+            body = self._rewrite(text).encode("utf-8")
+        else:
+            body = text.encode("utf-8")
+        handler.send_response(response["status"])
+        for header in response.get("headers", []):
+            name = header["name"]
+            if name.lower() in DROPPED_HEADERS or name.startswith(":"):
+                continue
+            value = header["value"]
+            if name.lower() == "location":
+                value = self._rewrite(value)
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def reset(self):
+        # Serve every recording from its first response again
+        with self._lock:
+            self.served = {}
+            self.misses = []
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    # python -m modules.tradingedge_scraper.replay record
+    # python -m modules.tradingedge_scraper.replay serve --port 8000
+    from .scraper import URL_LIST, Scraper
+
+    parser = argparse.ArgumentParser(description="Record and replay the feed")
+    parser.add_argument("command", choices=["record", "serve"])
+    parser.add_argument("--feed", choices=list(URL_LIST), default="personal_feed")
+    parser.add_argument("--out", default=REPLAY_DIR)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        scraper = Scraper(None, url=URL_LIST[args.feed], incremental=False)
+        scraper.build()
+        record(scraper, args.out, args.feed)
+    else:
+        with ReplayServer(
+            os.path.join(args.out, f"{args.feed}.har"), port=args.port
+        ) as server:
+            path = urlparse(URL_LIST[args.feed])
+            logger.info(
+                f"Replaying {args.feed} on {server.url}{path.path}?{path.query}"
+            )
+            threading.Event().wait()
@@ -0,0 +1,167 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from loguru import logger
+
+
+# The scraper only needs the feed's text, markup, scripts and XHR. Everything else
+# is aborted before it is requested.
+DEFAULT_BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"connect\.facebook\.net",
+    r"(api|cdn)\.segment\.(io|com)",
+    r"static\.hotjar\.com",
+    r"widget\.intercom\.io",
+    r"js\.intercomcdn\.com",
+    r"browser\.sentry-cdn\.com",
+    r"cdn\.mxpnl\.com",
+    r"youtube\.com/embed",
+    r"player\.vimeo\.com",
+]
+
+# Rough sizes used to estimate the bytes saved for a type until a real response of
+# that type has been seen (when a per-feed override lets one through)
+ESTIMATED_BYTES = {"image": 40_000, "media": 500_000, "font": 30_000, "script": 60_000}
+
+
+@dataclass
+class ResourcePolicy:
+    blocked_types: set = field(
+        default_factory=lambda: set(DEFAULT_BLOCKED_RESOURCE_TYPES)
+    )
+    blocked_patterns: list = field(
+        default_factory=lambda: list(DEFAULT_BLOCKED_URL_PATTERNS)
+    )
+    # urls matching these are never blocked, e.g. images a feed needs
+    allowed_patterns: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self._blocked = [re.compile(p) for p in self.blocked_patterns]
+        self._allowed = [re.compile(p) for p in self.allowed_patterns]
+
+    def with_overrides(
+        self,
+        block_types=(),
+        allow_types=(),
+        block_patterns=(),
+        allow_patterns=(),
+    ):
+        # Copy of the policy with a feed's overrides applied
+        return ResourcePolicy(
+            blocked_types=(self.blocked_types | set(block_types)) - set(allow_types),
+            blocked_patterns=self.blocked_patterns + list(block_patterns),
+            allowed_patterns=self.allowed_patterns + list(allow_patterns),
+        )
+
+    def should_block(self, resource_type, url) -> bool:
+        if any(p.search(url) for p in self._allowed):
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        return any(p.search(url) for p in self._blocked)
+
+
+class RequestBlocker:
+    """
+    Route handler applying a ResourcePolicy to one page, counting blocked and
+    allowed requests per resource type. Install it with
+    page.route("**/*", blocker.route) (route_async for async pages).
+    """
+
+    def __init__(self, policy: ResourcePolicy):
+        self.policy = policy
+        self._lock = threading.Lock()
+        self.blocked = {}
+        self.allowed = {}
+        # bytes and responses seen per type, for the saved bytes estimate
+        self._seen_bytes = {}
+        self._seen_count = {}
+
+    def _decide(self, request) -> bool:
+        block = self.policy.should_block(request.resource_type, request.url)
+        counts = self.blocked if block else self.allowed
+        with self._lock:
+            counts[request.resource_type] = counts.get(request.resource_type, 0) + 1
+        return block
+
+    def route(self, route):
+        if self._decide(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    async def route_async(self, route):
+        if self._decide(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def on_response(self, response):
+        # Sizes of allowed responses, from the headers so the body is never read
+        length = response.headers.get("content-length")
+        if length is None or not length.isdigit():
+            return
+        resource_type = response.request.resource_type
+        with self._lock:
+            self._seen_bytes[resource_type] = self._seen_bytes.get(
+                resource_type, 0
+            ) + int(length)
+            self._seen_count[resource_type] = self._seen_count.get(resource_type, 0) + 1
+
+    def bytes_allowed(self) -> int:
+        with self._lock:
+            return sum(self._seen_bytes.values())
+
+    def bytes_saved(self) -> int:
+        # Estimate: blocked requests times the average size seen for their type
+        with self._lock:
+            saved = 0
+            for resource_type, count in self.blocked.items():
+                if self._seen_count.get(resource_type):
+                    average = (
+                        self._seen_bytes[resource_type]
+                        / self._seen_count[resource_type]
+                    )
+                else:
+                    average = ESTIMATED_BYTES.get(resource_type, 0)
+                saved += count * average
+            return int(saved)
+
+    def report(self) -> str:
+        with self._lock:
+            blocked = sum(self.blocked.values())
+            allowed = sum(self.allowed.values())
+            by_type = ", ".join(
+                f"{t} {n}" for t, n in sorted(self.blocked.items(), key=lambda i: -i[1])
+            )
+        return (
+            f"{blocked} requests blocked ({by_type or 'none'}), {allowed} allowed, "
+            f"~{self.bytes_saved() / 1e6:.1f}MB saved"
+        )
+
+    def reset(self):
+        with self._lock:
+            self.blocked = {}
+            self.allowed = {}
+
+
+def install_blocker(target, policy: ResourcePolicy):
+    # target is a sync page or browser context, page routes take precedence over
+    # context routes, which is how per-feed overrides are applied
+    blocker = RequestBlocker(policy)
+    target.route("**/*", blocker.route)
+    target.on("response", blocker.on_response)
+    logger.debug(
+        f"Blocking {sorted(policy.blocked_types)} and {len(policy.blocked_patterns)} url patterns"
+    )
+    return blocker
+
+
+async def install_blocker_async(target, policy: ResourcePolicy):
+    blocker = RequestBlocker(policy)
+    await target.route("**/*", blocker.route_async)
+    target.on("response", blocker.on_response)
+    return blocker
@@ -1,4 +1,5 @@
 from playwright.sync_api import sync_playwright
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from supabase import create_client
 import time
 import re
@@ -8,11 +9,44 @@ from loguru import logger
 from ..repository.supabase_repo import SupabaseRepository
 from ..repository.repository_interface import PostData
 from .credentials import get_scraper_credentials, set_credentials
+from .ticker_matcher import TickerMatcher
+from .cycle import (
+    BROWSER_RSS_WATERMARK,
+    FULL_REFRESH_INTERVAL,
+    PRUNE_KEEP_POSTS,
+    RECYCLE_AFTER_CYCLES,
+    SCROLL_WAIT_RETRIES,
+    FeedCycle,
+)
+from .extraction import (
+    EXTRACT_FEED_FROM_JS,
+    EXTRACT_FEED_JS,
+    EXTRACTION_VERSION,
+    FEED_IDS_JS,
+    MORE_POSTS_JS,
+    PRUNE_FEED_JS,
+    SCROLL_JS,
+    SELECTORS,
+)
+from .feed_api import FEED_API_VERSION, FeedResponseCollector
+from .feed_state import FeedState
+from .instrumentation import CycleTimer
+from .live_watch import (
+    WATCH_BINDING,
+    WATCH_RELOAD_INTERVAL,
+    WATCH_TICK,
+    LiveFeedBuffer,
+    watch_script,
+)
+from .long_descriptions import LongDescriptionCache, LongDescriptionFetcher
+from .resource_policy import ResourcePolicy, install_blocker
+from .polling import PollScheduler, user_timezone
+from .session import SessionStore, is_signed_out, login
 import inquirer
+from urllib.parse import urlparse
 from modules.settings import Settings
 import pandas as pd
 import sys
-from datetime import datetime
 
 init(autoreset=True)
 
@@ -38,25 +72,26 @@ MAX_LOOKBACK_DAYS = (
     6  # 7 is already considered a week, posts older than 6 days are obsolete anyway
 )
 MIN_LOOKBACK_DAYS = 1
+# Adaptive polling backs off up to this outside of trading hours and on quiet feeds
+MAX_POLLING_RATE = 60 * 30
 
-TIMEOUT_SLIDE_ANIMATION = 2 # seconds
+TIMEOUT_SLIDE_ANIMATION = 5  # seconds, max wait for the detail panel to open or close
 
 
 ticker_watchlist = Settings.get_setting("watchlist_positions")
 all_tickers_list = Settings.fetch_tickers_list()
+ticker_matcher = TickerMatcher(all_tickers_list, ticker_watchlist)
 
 
-def find_tickers_in_text(
-    article_text, valid_tickers=all_tickers_list, watchlist_positions=ticker_watchlist
-):
-    # Basic uppercase pattern (1-5 letters)
-    possible_tickers = re.findall(r"(?:^|\b)[A-Z]{1,7}(?:\b|$)", article_text)
-
-    # Filter by known valid tickers
-    found = [t for t in possible_tickers if t in valid_tickers]
-    watched = [t for t in found if t in watchlist_positions]
-    return list(set(watched)), list(set(found))
-    # remove duplicates if needed
+def find_tickers_in_text(article_text, valid_tickers=None, watchlist_positions=None):
+    # Uses the shared matcher unless a custom ticker universe or watchlist is passed
+    matcher = ticker_matcher
+    if valid_tickers is not None or watchlist_positions is not None:
+        matcher = TickerMatcher(
+            all_tickers_list if valid_tickers is None else valid_tickers,
+            ticker_watchlist if watchlist_positions is None else watchlist_positions,
+        )
+    return matcher.match(article_text)
 
 
 # This class scrapes the posts from the given url and inserts them into the database
@@ -65,7 +100,7 @@ def find_tickers_in_text(
 # import threading
 # scraper = Scraper()
 # threading.Thread(target=scraper.run).start()
-class Scraper:
+class Scraper(FeedCycle):
     def __init__(
         self,
         storage,
@@ -74,18 +109,80 @@ class Scraper:
         lookback_days=3,
         headless=True,
         debug=False,
+        extraction="evaluate",
+        incremental=True,
+        full_refresh_interval=FULL_REFRESH_INTERVAL,
+        ingestion="dom",
+        block_resources=True,
+        resource_policy=None,
+        adaptive_polling=True,
+        min_polling_rate=MIN_POLLING_RATE,
+        max_polling_rate=MAX_POLLING_RATE,
+        prune_dom=True,
+        recycle_after_cycles=RECYCLE_AFTER_CYCLES,
+        browser_rss_watermark=BROWSER_RSS_WATERMARK,
+        live_watch=False,
+        watch_reload_interval=WATCH_RELOAD_INTERVAL,
+        site_url=None,
     ):
-        self.url = url
-        self.polling_rate = max(
+        if site_url is not None:
+            # the same feed from another host, e.g. a ReplayServer
+            feed = urlparse(url)
+            url = (
+                site_url.rstrip("/")
+                + feed.path
+                + (f"?{feed.query}" if feed.query else "")
+            )
+        polling_rate = max(
             MIN_POLLING_RATE, polling_rate
         )  # 2 minutes is the minimum polling rate
+        # The polling rate follows how often the feed gets posts, polling_rate is the
+        # slowest it polls during trading hours, see PollScheduler
+        scheduler = None
+        if adaptive_polling:
+            scheduler = PollScheduler(
+                polling_rate,
+                max(MIN_POLLING_RATE, min_polling_rate),
+                max_polling_rate,
+                timezone=user_timezone(Settings.get_setting("timezone")),
+            )
+        super().__init__(
+            url,
+            find_tickers_in_text,
+            polling_rate,
+            max(
+                MIN_LOOKBACK_DAYS, min(lookback_days, MAX_LOOKBACK_DAYS)
+            ),  # 7 is already considered a week
+            full_refresh_interval=max(polling_rate, full_refresh_interval),
+            feed_state=FeedState(url) if incremental else None,
+            scheduler=scheduler,
+            # pruning needs the evaluate extraction, "elements" works on element handles
+            prune_dom=prune_dom and extraction == "evaluate",
+            recycle_after_cycles=recycle_after_cycles,
+            browser_rss_watermark=browser_rss_watermark,
+            # Live watch keeps the feed open and stores posts as they are inserted,
+            # reloading only every watch_reload_interval seconds to catch anything missed
+            live_buffer=LiveFeedBuffer() if live_watch else None,
+            description_cache=LongDescriptionCache(),
+        )
         self.headless = headless
-        self.lookback_days = max(
-            MIN_LOOKBACK_DAYS, min(lookback_days, MAX_LOOKBACK_DAYS)
-        )  # 7 is already considered a week
         self.debug = debug
+        # "evaluate" reads the whole feed in one page.evaluate call,
+        # "elements" queries every field through its own element handle
+        self.extraction = extraction
+        # "network" reads posts from the feed's JSON responses and falls back to the
+        # DOM when they don't cover the rendered feed, "dom" always reads the DOM
+        self.ingestion = ingestion
+        # Images, fonts, media and trackers are aborted on the whole browser context,
+        # resource_policy replaces the default ResourcePolicy()
+        self.resource_policy = None
+        if block_resources:
+            self.resource_policy = resource_policy or ResourcePolicy()
+        # the browser session is reused across restarts, see SessionStore
+        self.session = SessionStore()
+        self.watch_reload_interval = watch_reload_interval
+        self.context_options = {}  # extra new_context arguments, e.g. HAR recording
         self.isRunning = True
-        self.page = None
         self.data = None
         self.storage = None
         self.website_credentials = {}
@@ -175,6 +272,22 @@ class Scraper:
                         }
                     }
                 pass
+            case "parquet":
+                from ..repository.parquet_repo import ParquetRepository
+
+                if preloaded:
+                    self.storage = ParquetRepository(
+                        preloaded_credentials=storage_credentials
+                    )
+                    return
+                else:
+                    self.storage = ParquetRepository()
+                    storage_config = {
+                        "storage": {
+                            "storage_engine": "parquet",
+                            "parquet_dir": self.storage.root,
+                        }
+                    }
             case _:
                 logger.error(
                     f"Storage choice {storage_choice} not implemented, but this should never happen."
@@ -183,198 +296,274 @@ class Scraper:
         set_credentials({"website": self.website_credentials}, storage_config)
 
     def run(self):
-        # Connect to Supabase
+        self.started = time.perf_counter()
+        self.time_to_first_post = None
 
         with sync_playwright() as p:
-            # Launch browser
             browser = p.chromium.launch(headless=self.headless)
-            context = browser.new_context(user_agent="Chrome/91.0.4472.124")
-
-            # Login and navigate to the desired url
-            self.page = context.new_page()
-            self.page.goto("https://tradingedge.club/sign_in", wait_until="networkidle")
-            self.page.fill('input[name="email"]', self.website_credentials["email"])
-            self.page.fill(
-                'input[name="password"]', self.website_credentials["password"]
-            )
-            self.page.press('text="Sign In"', "Enter")
-            self.page.wait_for_url("https://tradingedge.club/spaces/**")
-            self.page.goto(self.url, wait_until="networkidle")
+            context = self.open_context(browser)
 
             # Start the scraping loop
             while self.isRunning:
-                self.scrape_posts()
-                time.sleep(self.polling_rate)
-                self.page.reload(wait_until="networkidle")
+                self.scrape_posts(full=self.full_refresh_due())
+                if self.live_buffer is not None:
+                    self.watch(self.watch_reload_interval)
+                else:
+                    time.sleep(self.next_poll_delay())
+                reload_started = time.perf_counter()
+                reason = self.recycle_reason()
+                if reason is not None:
+                    logger.info(f"Recycling the browser context: {reason}")
+                    context = self.recycle_context(browser, context)
+                else:
+                    self.page.reload(wait_until="networkidle")
+                    if is_signed_out(self.page.url):
+                        logger.info("Session expired")
+                        self.open_feed(context)
+                self.reload_seconds = time.perf_counter() - reload_started
 
             browser.close()
 
+    # New context with the feed open, signed in already if the last session is
+    # still valid
+    def open_context(self, browser):
+        context = browser.new_context(
+            user_agent="Chrome/91.0.4472.124",
+            storage_state=self.session.load(),
+            **self.context_options,
+        )
+        if self.resource_policy is not None:
+            self.blocker = install_blocker(context, self.resource_policy)
+
+        self.page = context.new_page()
+        if self.live_buffer is not None:
+            self.page.expose_binding(WATCH_BINDING, self.live_buffer.on_item)
+            self.page.add_init_script(watch_script(SELECTORS))
+        self.description_fetcher = LongDescriptionFetcher(context)
+        if self.ingestion == "network":
+            self.collector = FeedResponseCollector()
+            self.page.on("response", self.collector.on_response)
+        self.open_feed(context)
+        self.cycles = 0
+        return context
+
+    # Closing the context frees its renderer processes, with everything the long
+    # running page kept alive. The session carries over to the new one.
+    def recycle_context(self, browser, context):
+        self.session.save(context.storage_state())
+        self.description_fetcher.close()
+        context.close()
+        return self.open_context(browser)
+
+    # Navigates to the feed, signing in only when the stored session is missing or
+    # expired (the site redirects to the sign in page then)
+    def open_feed(self, context):
+        self.page.goto(self.url, wait_until="networkidle")
+        if not is_signed_out(self.page.url):
+            logger.debug("Reusing the stored browser session")
+            return
+        login(self.page, self.url, self.website_credentials)
+        self.session.save(context.storage_state())
+        self.page.goto(self.url, wait_until="networkidle")
+
+    def watch(self, duration):
+        # Stores posts as the watch script reports them, until the safety reload
+        self.live_buffer.drain()  # inserted while the last cycle loaded the feed
+        timer = CycleTimer()
+        deadline = time.monotonic() + duration
+        while self.isRunning and time.monotonic() < deadline:
+            # the binding is only called while the sync API dispatches events
+            self.page.wait_for_timeout(WATCH_TICK * 1000)
+            items = self.live_buffer.drain()
+            if items:
+                self.store_live_posts(items, timer)
+        logger.info(f"Live watch: {timer.summary()}")
+        return timer
+
+    def store_live_posts(self, items, timer):
+        selected = self.select_live_posts(items)
+        if not selected:
+            return
+        # the items are not expanded in the feed, there are no element handles
+        descriptions = self.long_descriptions(
+            [None] * len(selected),
+            [
+                (index, raw)
+                for index, (raw, _) in enumerate(selected)
+                if raw.get("has_more")
+            ],
+        )
+        batch = self.build_batch([raw for raw, _ in selected], descriptions)
+        with timer.measure("write"):
+            self.storage.upsert_posts(batch)
+        self.finish_live_posts(selected, timer)
+
     # This function scrolls down the page until the last post is older than the lookback_days or no new posts are loaded
-    def load_all_posts(self):
+    # When full is False it also stops at the first screen of posts that are already stored
+    def load_all_posts(self, full=True):
         while True:
-            posts = self.page.query_selector_all("li.feed-item")
+            posts = self.page.query_selector_all(SELECTORS["item"])
+            if self.prune_due(len(posts)):
+                with self.timer.measure("prune"):
+                    pruned = self.page.evaluate(
+                        PRUNE_FEED_JS, [SELECTORS, PRUNE_KEEP_POSTS]
+                    )
+                self.record_pruned(pruned)
+                posts = self.page.query_selector_all(SELECTORS["item"])
             post_count_before_scroll = len(posts)
 
+            if not full and self.last_screen_is_known(post_count_before_scroll):
+                logger.debug(f"Reached known posts after {len(posts)} posts")
+                return posts
+
             last_post = posts[-1]
             last_post_raw_date = last_post.query_selector(
-                ".feed-item-meta-location .feed-item-post-created-at"
+                SELECTORS["created_at_meta"]
             ).inner_text()
 
-            # Parse the date
-            match = re.match(r"Posted (\d+)([dwmy]) ago", last_post_raw_date)
-
-            if match:
-                value = int(match.group(1))
-                unit = match.group(2)
-
-                # Stop scrolling down if old enough post is found
-                if (
-                    unit == "d"
-                    and value > self.lookback_days
-                    or unit in ["w", "m", "y"]
-                ):
-                    return posts
-
-            # Scroll down
-            self.page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(
-                4
-            )  # Wait for the page to load (this could be optimized but 2 is too short)
-
-            # Check if new posts were loaded, if not break the loop
-            posts = self.page.query_selector_all("li.feed-item")
-            post_count_after_scroll = len(posts)
-            if post_count_before_scroll == post_count_after_scroll:
+            # Stop scrolling down if old enough post is found
+            if self.past_lookback(last_post_raw_date):
                 return posts
 
-    # This function scrapes the url and inserts the posts into the database
-    def scrape_posts(self):
-        number_new_posts = 0
-        number_updated_posts = 0
-
-        posts = self.load_all_posts()
-        for post in posts:
-
-            id = post.get_attribute("data-post-id")
-            author = (
-                post.query_selector(".mighty-attribution-name span").inner_text()
-                if post.query_selector(".mighty-attribution-name span")
-                else None
-            )
-            title = (
-                post.query_selector(".feed-item-post-title h1").inner_text()
-                if post.query_selector(".feed-item-post-title h1")
-                else None
-            )
-            # Handle long / short description
-            # Check if post has long description
-            if post.query_selector(".mighty-wysiwyg-content-show-more"):
-                logger.info("Post has long description")
-                post.query_selector(".mighty-wysiwyg-content-show-more").click()
-                # after click, wait to load the new page
-                time.sleep(TIMEOUT_SLIDE_ANIMATION)
-                # get long description
-                description = (
-                    self.page.query_selector(".detail-layout-description").inner_text()
-                    if self.page.query_selector(".detail-layout-description")
-                    else None
-                )
-                # close the post
-                self.page.query_selector(".btn-close").click()
-                time.sleep(TIMEOUT_SLIDE_ANIMATION)
-            else:
-                # get short description
-                description = (
-                    post.query_selector(".feed-item-post-description").inner_text()
-                    if post.query_selector(".feed-item-post-description")
-                    else None
-                )
-
-            likes = (
-                post.query_selector(
-                    ".mighty-post-stat-cheer .mighty-post-stat-cheer-count"
-                ).inner_text()
-                if post.query_selector(
-                    ".mighty-post-stat-cheer .mighty-post-stat-cheer-count"
-                )
-                else "0"
-            )
-            comments = (
-                post.query_selector(
-                    ".mighty-post-stat-comment .mighty-post-stat-comment-count"
-                ).inner_text()
-                if post.query_selector(
-                    ".mighty-post-stat-comment .mighty-post-stat-comment-count"
-                )
-                else "0"
-            )
-            link = (
-                post.query_selector(".feed-item-post").get_attribute("href")
-                if post.query_selector(".feed-item-post")
-                else None
-            )
-            if link is None:
+            # Scroll down and wait for the next posts, if none load this is the end
+            if not self.scroll_for_more_posts(post_count_before_scroll):
+                return self.page.query_selector_all(SELECTORS["item"])
+
+    def scroll_for_more_posts(self, post_count) -> bool:
+        for attempt in range(SCROLL_WAIT_RETRIES + 1):
+            with self.timer.measure("scroll"):
+                self.page.evaluate(SCROLL_JS)
+            timeout = self.scroll_timeout.backoff(attempt)
+            started = time.perf_counter()
+            try:
+                with self.timer.measure("wait_for_posts"):
+                    self.page.wait_for_function(
+                        MORE_POSTS_JS,
+                        arg=[SELECTORS["item"], post_count],
+                        timeout=timeout * 1000,
+                    )
+            except PlaywrightTimeoutError:
+                self.timer.count("scroll_timeouts")
                 continue
-            category = (
-                post.query_selector(".post-tag-name").inner_text()
-                if post.query_selector(".post-tag-name")
-                else None
-            )
-
-            posted_date = (
-                post.query_selector(".feed-item-post-created-at").get_attribute("title")
-                if post.query_selector(".feed-item-post-created-at")
-                else None
+            self.scroll_timeout.record(time.perf_counter() - started)
+            return True
+        return False
+
+    def last_screen_is_known(self, post_count):
+        with self.timer.measure("known_check"):
+            screen = self.page.evaluate(
+                EXTRACT_FEED_FROM_JS, [SELECTORS, self.screen_start(post_count)]
             )
+        return self.screen_is_known(screen)
 
-            posted_time = None
-            if posted_date is not None:
-                posted_time = datetime.strptime(posted_date, "%a, %B %d, %Y, %I:%M%p")
-                posted_time = posted_time.strftime("%Y-%m-%d %H:%M:%S")
-
-            title_str = title if title else ""
-            description_str = description if description else ""
-            watched_tickers, found_tickers = find_tickers_in_text(
-                f"{title_str} {description_str}"
-            )
-            # Check if post exists already
-            post_exists = self.storage.post_exists(id)
-            if post_exists:
-                self.storage.update_post(
-                    PostData(
-                        id=id,
-                        title=title,
-                        description=description,
-                        likes=int(likes),
-                        comments=int(comments),
-                        posted_date=posted_time,
-                        date=posted_time,
-                        ticker_notification_sent=", ".join(watched_tickers),
-                        found_tickers=", ".join(found_tickers),
+    # This function scrapes the url and inserts the posts into the database
+    def scrape_posts(self, full=True):
+        self.start_cycle()
+        with self.timer.measure("load_posts"):
+            posts = self.load_all_posts(full)
+        with self.timer.measure("extract"):
+            raw_posts = self.network_posts() if self.collector is not None else None
+            source = f"network, v{FEED_API_VERSION}"
+            if raw_posts is None:
+                source = f"{self.extraction}, v{EXTRACTION_VERSION}"
+                if self.extraction == "evaluate":
+                    raw_posts = self.pruned_posts + self.page.evaluate(
+                        EXTRACT_FEED_JS, SELECTORS
                     )
+                else:
+                    raw_posts = [self.extract_post(post) for post in posts]
+        logger.debug(f"Extracted {len(raw_posts)} posts ({source})")
+        selected = self.select_posts(raw_posts, full)
+        # Pruned items have no element left to expand
+        posts = [None] * len(self.pruned_posts) + posts
+        # Long descriptions are only rendered after expanding the post
+        with self.timer.measure("long_descriptions"):
+            descriptions = self.long_descriptions(
+                posts, [(index, raw) for index, raw in selected if raw.get("has_more")]
+            )
+        with self.timer.measure("match_tickers"):
+            batch = self.build_batch([raw for _, raw in selected], descriptions)
+
+        # One write per scrape cycle instead of an exists check plus insert/update per post
+        if batch:
+            with self.timer.measure("write"):
+                result = self.storage.upsert_posts(batch)
+            print(f"Updated {result.updated} posts.")
+            print(f"Scraped {result.inserted} new posts.")
+        self.finish_cycle(raw_posts, len(batch), full, source)
+
+    # Posts captured from the feed responses of this cycle, None if they are unusable
+    # or miss posts that are rendered (e.g. a server rendered first screen)
+    def network_posts(self):
+        raw_posts = self.drain_network_posts()
+        if raw_posts is None or not self.covers_rendered(
+            raw_posts, self.page.evaluate(FEED_IDS_JS, SELECTORS)
+        ):
+            return None
+        return raw_posts
+
+    # Per element extraction, one Playwright round trip per field
+    def extract_post(self, post):
+        def text(selector):
+            element = post.query_selector(selector)
+            return element.inner_text() if element else None
+
+        def attribute(selector, name):
+            element = post.query_selector(selector)
+            return element.get_attribute(name) if element else None
+
+        return {
+            "id": post.get_attribute("data-post-id"),
+            "author": text(SELECTORS["author"]),
+            "title": text(SELECTORS["title"]),
+            "description": text(SELECTORS["description"]),
+            "has_more": post.query_selector(SELECTORS["show_more"]) is not None,
+            "likes": text(SELECTORS["likes"]),
+            "comments": text(SELECTORS["comments"]),
+            "link": attribute(SELECTORS["link"], "href"),
+            "category": text(SELECTORS["category"]),
+            "created_at": attribute(SELECTORS["created_at"], "title"),
+            "created_at_text": text(SELECTORS["created_at_meta"]),
+        }
+
+    # Long descriptions from the cache, the background page pool, and as a last resort
+    # by expanding the post in the feed
+    def long_descriptions(self, posts, long_posts) -> dict:
+        descriptions, missing = self.cached_descriptions(long_posts)
+        found = {}
+        if missing and self.description_fetcher is not None:
+            found = self.description_fetcher.fetch([link for _, _, link in missing])
+        for index, _, link in missing:
+            if found.get(link) is None:
+                found[link] = self.read_long_description(posts[index])
+        return self.keep_descriptions(descriptions, long_posts, missing, found)
+
+    def read_long_description(self, post):
+        if post is None:
+            return None
+        logger.info("Post has long description")
+        with self.timer.measure("expand_post"):
+            post.query_selector(SELECTORS["show_more"]).click()
+            # wait for the detail panel instead of a fixed animation time
+            try:
+                detail = self.page.wait_for_selector(
+                    SELECTORS["detail_description"],
+                    timeout=TIMEOUT_SLIDE_ANIMATION * 1000,
                 )
-                number_updated_posts += 1
-            else:
-                self.storage.create_post(
-                    PostData(
-                        id=id,
-                        author=author,
-                        title=title,
-                        description=description,
-                        likes=int(likes),
-                        comments=int(comments),
-                        posted_date=posted_time,
-                        date=posted_time,
-                        link=link,
-                        category=category,
-                        ticker_notification_sent=", ".join(watched_tickers),
-                        found_tickers=", ".join(found_tickers),
-                    )
+                description = detail.inner_text()
+            except PlaywrightTimeoutError:
+                description = None
+            # close the post and wait until the panel is gone
+            self.page.query_selector(SELECTORS["close"]).click()
+            try:
+                self.page.wait_for_selector(
+                    SELECTORS["detail_description"],
+                    state="detached",
+                    timeout=TIMEOUT_SLIDE_ANIMATION * 1000,
                 )
-                number_new_posts += 1
-
-        print(f"Updated {number_updated_posts} posts.")
-        print(f"Scraped {number_new_posts} new posts.")
+            except PlaywrightTimeoutError:
+                self.timer.count("detail_close_timeouts")
+        return description
 
     # We can't just update the post by opening it's link and extracting the data
     # because when opening the link it renders an offcanvas where data like likes and comments are missing
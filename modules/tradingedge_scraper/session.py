@@ -0,0 +1,77 @@
+import json
+import os
+from urllib.parse import urljoin, urlparse
+from loguru import logger
+from config import LOCAL_DIR
+
+
+SESSION_STATE_FILE = os.path.join(LOCAL_DIR, "browser_session.json")
+SIGN_IN_PATH = "/sign_in"
+SIGNED_IN_URL_PATTERN = "**/spaces/**"  # where the site redirects after signing in
+LOGIN_TIMEOUT = 30000  # milliseconds
+
+
+class SessionStore:
+    """
+    Playwright storage_state (cookies and local storage) of a signed in context,
+    kept between restarts so the scraper only signs in when the session expired.
+    The file holds session cookies, it is only readable by the current user.
+    """
+
+    def __init__(self, path=SESSION_STATE_FILE):
+        self.path = path
+
+    def load(self):
+        # Value for new_context(storage_state=...), None starts a signed out context
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f"Ignoring unreadable session state {self.path}")
+            return None
+
+    def save(self, state):
+        # state is the dict returned by context.storage_state()
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def sign_in_url(url) -> str:
+    return urljoin(url, SIGN_IN_PATH)
+
+
+def is_signed_out(url) -> bool:
+    # Pages that need a session redirect to the sign in form
+    return urlparse(url).path.startswith(SIGN_IN_PATH)
+
+
+def login(page, url, credentials):
+    # Signs in on page, url is any page of the site
+    logger.info("Signing in")
+    if not is_signed_out(page.url):
+        page.goto(sign_in_url(url), wait_until="domcontentloaded")
+    page.fill('input[name="email"]', credentials["email"])
+    page.fill('input[name="password"]', credentials["password"])
+    page.press('text="Sign In"', "Enter")
+    page.wait_for_url(SIGNED_IN_URL_PATTERN, timeout=LOGIN_TIMEOUT)
+
+
+async def login_async(page, url, credentials):
+    logger.info("Signing in")
+    if not is_signed_out(page.url):
+        await page.goto(sign_in_url(url), wait_until="domcontentloaded")
+    await page.fill('input[name="email"]', credentials["email"])
+    await page.fill('input[name="password"]', credentials["password"])
+    await page.press('text="Sign In"', "Enter")
+    await page.wait_for_url(SIGNED_IN_URL_PATTERN, timeout=LOGIN_TIMEOUT)
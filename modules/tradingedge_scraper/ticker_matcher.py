@@ -0,0 +1,45 @@
+import re
+from typing import Iterable
+
+
+# Basic uppercase pattern (1-7 letters), same pattern find_tickers_in_text always used
+TICKER_PATTERN = re.compile(r"(?:^|\b)[A-Z]{1,7}(?:\b|$)")
+
+
+def _as_symbol_set(symbols) -> frozenset[str]:
+    # Settings.get_setting returns "" for unset keys, treat that as an empty list
+    if not symbols:
+        return frozenset()
+    if isinstance(symbols, str):
+        symbols = [s.strip() for s in symbols.split(",")]
+    return frozenset(s for s in symbols if s)
+
+
+class TickerMatcher:
+    """
+    Matches ticker symbols in free text against a known symbol universe.
+
+    The universe and the watchlist are hashed once when the matcher is built,
+    so every candidate lookup is O(1) instead of a scan over the ticker list.
+    Build one matcher per process and reuse it for every post.
+    """
+
+    def __init__(self, valid_tickers: Iterable[str], watchlist_positions=None):
+        self.valid_tickers = _as_symbol_set(valid_tickers)
+        # Only watched tickers that can actually be found are worth checking
+        self.watchlist = _as_symbol_set(watchlist_positions) & self.valid_tickers
+
+    def match(self, text: str) -> tuple[list[str], list[str]]:
+        # Returns (watched, found) without duplicates, in order of first appearance
+        valid = self.valid_tickers
+        found = dict.fromkeys(
+            t for t in TICKER_PATTERN.findall(text or "") if t in valid
+        )
+        watchlist = self.watchlist
+        watched = [t for t in found if t in watchlist]
+        return watched, list(found)
+
+    def match_many(self, texts: Iterable[str]) -> list[tuple[list[str], list[str]]]:
+        # Batch variant for backfills, one (watched, found) tuple per text
+        match = self.match
+        return [match(text) for text in texts]
@@ -61,7 +61,6 @@ st.plotly_chart(fig, use_container_width=True)
 
 st.divider()
 # TODO: hide backend code
-# TODO: show only posts about ticker (feed[label] = selected_position)
 if not os.path.exists("./modules/tradingedge_scraper/credentials.json"):
     st.write("Scraper was not initialized. Please run the scraper first.")
 else:
@@ -77,14 +76,21 @@ else:
             )
 
             repo = SupabaseRepository(preloaded_credentials=data)
-            feed = repo.get_feed()
+            feed = repo.get_feed_for_ticker(selected_position)
         case "sqlite3":
             from modules.repository.sqlite3_repo import (
                 Sqlite3Repository,
             )
 
             repo = Sqlite3Repository(preloaded_credentials=data)
-            feed = repo.get_feed()
+            feed = repo.get_feed_for_ticker(selected_position)
+        case "parquet":
+            from modules.repository.parquet_repo import (
+                ParquetRepository,
+            )
+
+            repo = ParquetRepository(preloaded_credentials=data, compaction=False)
+            feed = repo.get_feed_for_ticker(selected_position)
         case _:
             logger.error(
                 f"Storage choice {engine} not implemented, but this should never happen."
@@ -92,8 +98,7 @@ else:
             raise ValueError(f"Storage choice {engine} not implemented")
 
     # DISPLAY THE FEED
-    # filter by ticker
-    feed = feed[feed["found_tickers"].str.contains(selected_position)]
+    # feed only contains posts about the selected ticker
     # organise columns first: title, author, link
     first_columns = ["title", "description", "link"]
     feed = feed[
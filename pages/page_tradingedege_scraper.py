@@ -1,4 +1,6 @@
 import os
+import math
+import re
 import streamlit as st
 import yfinance as yf
 import json
@@ -6,6 +8,10 @@ from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from modules.navigation import add_navigation
 from config import LOCAL_DIR
+from modules.repository.repository_interface import (
+    COMMENT_WEIGHT,
+    DEFAULT_FEED_COLUMNS,
+)
 from loguru import logger
 import pandas as pd
 import sys
@@ -13,6 +19,29 @@ import sys
 module_dir = os.path.abspath("modules")
 sys.path.append(module_dir)
 
+MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]()#+\-.!|<>~$])")
+
+
+def escape_markdown(text) -> str:
+    # Post text is shown as written, st.markdown would render links, images or
+    # html-like markup in it
+    return MARKDOWN_SPECIAL.sub(r"\\\1", str(text))
+
+
+def link_markdown(text, url) -> str:
+    # Only http(s) links, parentheses would end the link target early
+    text = escape_markdown(text)
+    if not re.match(r"https?://", str(url or "")):
+        return text
+    url = url.replace("(", "%28").replace(")", "%29").replace(" ", "%20")
+    return f"[{text}]({url})"
+
+
+def snippet_markdown(snippet) -> str:
+    # The search marks matched terms with **, those stay bold, the rest is escaped
+    return "**".join(escape_markdown(part) for part in (snippet or "").split("**"))
+
+
 add_navigation()
 st.title("Trading Edge Scraper")
 st.subheader("All recent posts")
@@ -24,7 +53,6 @@ else:
     data = config.get("storage")
     engine = data.pop("storage_engine")
     repo = None
-    feed = {}
     match engine:
         case "supabase-local" | "supabase-remote":
             from modules.repository.supabase_repo import (
@@ -32,28 +60,105 @@ else:
             )
 
             repo = SupabaseRepository(preloaded_credentials=data)
-            feed = repo.get_feed()
         case "sqlite3":
             from modules.repository.sqlite3_repo import (
                 Sqlite3Repository,
             )
 
             repo = Sqlite3Repository(preloaded_credentials=data)
-            feed = repo.get_feed()
+        case "parquet":
+            from modules.repository.parquet_repo import (
+                ParquetRepository,
+            )
+
+            repo = ParquetRepository(preloaded_credentials=data, compaction=False)
         case _:
             logger.error(
                 f"Storage choice {engine} not implemented, but this should never happen."
             )
             raise ValueError(f"Storage choice {engine} not implemented")
 
+    # SEARCH
+    search_query = st.text_input("Search posts", placeholder="e.g. NVDA earnings")
+    if search_query:
+        results = repo.search(search_query, limit=20)
+        st.caption(f"{len(results)} best matches")
+        for result in results.itertuples():
+            posted = (
+                ""
+                if pd.isna(result.posted_date)
+                else f"{result.posted_date:%Y-%m-%d %H:%M}"
+            )
+            st.markdown(
+                f"**{link_markdown(result.title or 'No title', result.link)}** · "
+                f"{escape_markdown(result.author)} · {posted}  \n"
+                f"{snippet_markdown(result.snippet)}"
+            )
+        st.divider()
+
+    # TRENDING, posts sorted by the likes and comments they gained per hour
+    st.subheader("Trending")
+    trending_windows = {
+        "1 hour": timedelta(hours=1),
+        "6 hours": timedelta(hours=6),
+        "24 hours": timedelta(days=1),
+        "7 days": timedelta(days=7),
+    }
+    window_label = st.radio(
+        "Momentum over the last", list(trending_windows), index=1, horizontal=True
+    )
+    trending = repo.trending(window=trending_windows[window_label], limit=20)
+    if trending.empty:
+        st.caption("No likes or comments were gained in this window.")
+    else:
+        st.dataframe(
+            trending.drop(columns=["id"]),
+            column_config={
+                "link": st.column_config.LinkColumn(),
+                "momentum": st.column_config.ProgressColumn(
+                    "momentum",
+                    help=f"likes + {COMMENT_WEIGHT} × comments gained per hour",
+                    format="%.1f",
+                    min_value=0,
+                    max_value=float(trending["momentum"].max()),
+                ),
+            },
+            hide_index=True,
+        )
+    st.divider()
+
+    # FILTERS, only the page that is shown gets loaded from the storage
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("From", datetime.now().date() - timedelta(days=7))
+    with col2:
+        end_date = st.date_input("To", datetime.now().date())
+    with col3:
+        page_size = st.selectbox("Posts per page", [25, 50, 100, 250], index=1)
+    since = start_date
+    until = end_date + timedelta(days=1)
+    total_posts = repo.count_feed(since=since, until=until)
+    total_pages = max(1, math.ceil(total_posts / page_size))
+    page_number = st.number_input(
+        f"Page (of {total_pages}, {total_posts} posts)",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+    )
+
     # DISPLAY THE FEED
-    # organise columns first: title, author, link
+    # organise columns first: title, author, link, sorted by date newest
     first_columns = ["title", "description", "link"]
-    feed = feed[
-        first_columns + [col for col in feed.columns if col not in first_columns]
-    ]
-    # sort by date newest
-    feed = feed.sort_values(by="posted_date", ascending=False)
+    feed = repo.get_feed(
+        since=since,
+        until=until,
+        columns=first_columns
+        + [col for col in DEFAULT_FEED_COLUMNS if col not in first_columns],
+        order_by="posted_date",
+        descending=True,
+        limit=page_size,
+        offset=(page_number - 1) * page_size,
+    )
     # display df, format link column
     st.dataframe(feed, column_config={"link": st.column_config.LinkColumn()})
 
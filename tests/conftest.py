@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+
+# Saved responses and markup of tradingedge.club, shared with the benchmarks
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures")
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture(scope="session")
+def browser():
+    # Headless Playwright Chromium (python -m playwright install chromium), the
+    # tests that need one are skipped without it
+    sync_api = pytest.importorskip("playwright.sync_api")
+    playwright = sync_api.sync_playwright().start()
+    try:
+        browser = playwright.chromium.launch(headless=True)
+    except Exception as e:
+        playwright.stop()
+        pytest.skip(f"Playwright Chromium is not installed: {e}")
+    yield browser
+    browser.close()
+    playwright.stop()
+
+
+@pytest.fixture
+def feed_page(browser):
+    # A page showing the saved feed markup
+    with open(fixture_path("tradingedge_feed.html"), "r") as f:
+        html = f.read()
+    page = browser.new_page()
+    page.set_content(html)
+    yield page
+    page.close()
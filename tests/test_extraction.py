@@ -0,0 +1,145 @@
+import pytest
+
+from modules.tradingedge_scraper.extraction import (
+    EXTRACT_FEED_FROM_JS,
+    EXTRACT_FEED_JS,
+    SELECTORS,
+    is_past_lookback,
+    parse_posted_date,
+    raw_posted_date,
+    to_post_data,
+)
+from modules.tradingedge_scraper.ticker_matcher import TickerMatcher
+
+
+# What EXTRACT_FEED_JS reads from benchmarks/fixtures/tradingedge_feed.html
+FEED_ITEMS = [
+    {
+        "id": "51230001",
+        "author": "tearrepresentative56",
+        "title": "NVDA into earnings",
+        "description": "Watching NVDA and AMD closely, TSLA looks weak here.",
+        "has_more": False,
+        "likes": "42",
+        "comments": "7",
+        "link": "https://tradingedge.club/posts/51230001",
+        "category": "Market Updates",
+        "created_at": "Tue, January 14, 2025, 03:12PM",
+        "created_at_text": "Posted 2h ago",
+    },
+    {
+        "id": "51230002",
+        "author": "tearrepresentative56",
+        "title": "Weekly plan",
+        "description": "SPY levels for the week, long write-up below.",
+        "has_more": True,
+        "likes": "118",
+        "comments": "23",
+        "link": "https://tradingedge.club/posts/51230002",
+        "category": "Weekly Plans",
+        "created_at": "Mon, January 13, 2025, 09:30AM",
+        "created_at_text": "Posted 1d ago",
+    },
+    {
+        "id": "51230003",
+        "author": "tearrepresentative56",
+        "title": None,
+        "description": "No title on this one, just PLTR.",
+        "has_more": False,
+        "likes": "5",
+        "comments": None,
+        "link": "https://tradingedge.club/posts/51230003",
+        "category": None,
+        "created_at": "Sun, January 12, 2025, 11:05PM",
+        "created_at_text": "Posted 2d ago",
+    },
+    {
+        "id": "51230004",
+        "author": "tearrepresentative56",
+        "title": None,
+        "description": None,
+        "has_more": False,
+        "likes": None,
+        "comments": None,
+        "link": None,
+        "category": None,
+        "created_at": "Sat, January 04, 2025, 08:00AM",
+        "created_at_text": "Posted 1w ago",
+    },
+]
+
+matcher = TickerMatcher(["NVDA", "AMD", "TSLA", "SPY", "PLTR"], ["TSLA"])
+
+
+@pytest.mark.parametrize("index", range(len(FEED_ITEMS)))
+def test_extract_feed_js_reads_every_field(feed_page, index):
+    items = feed_page.evaluate(EXTRACT_FEED_JS, SELECTORS)
+    assert len(items) == len(FEED_ITEMS)
+    for field, expected in FEED_ITEMS[index].items():
+        assert items[index][field] == expected, field
+
+
+def test_extract_feed_from_js_starts_at_index(feed_page):
+    assert feed_page.evaluate(EXTRACT_FEED_FROM_JS, [SELECTORS, 2]) == FEED_ITEMS[2:]
+
+
+def test_to_post_data():
+    post = to_post_data(FEED_ITEMS[0], matcher.match)
+    assert post.id == "51230001"
+    assert post.author == "tearrepresentative56"
+    assert post.title == "NVDA into earnings"
+    assert post.description == "Watching NVDA and AMD closely, TSLA looks weak here."
+    assert post.likes == 42
+    assert post.comments == 7
+    assert post.link == "https://tradingedge.club/posts/51230001"
+    assert post.category == "Market Updates"
+    assert post.posted_date == "2025-01-14 15:12:00"
+    assert post.date == post.posted_date
+    assert post.found_tickers == "NVDA, AMD, TSLA"
+    assert post.ticker_notification_sent == "TSLA"
+
+
+def test_to_post_data_missing_fields():
+    post = to_post_data(FEED_ITEMS[2], matcher.match)
+    assert post.title is None
+    assert post.category is None
+    assert post.comments == 0
+    assert post.posted_date == "2025-01-12 23:05:00"
+    assert post.found_tickers == "PLTR"
+    assert post.ticker_notification_sent == ""
+
+
+def test_to_post_data_uses_the_long_description():
+    long_description = (
+        "SPY levels for the week, long write-up below.\n\nSupport at 580."
+    )
+    post = to_post_data(FEED_ITEMS[1], matcher.match, long_description)
+    assert post.description == long_description
+    assert post.found_tickers == "SPY"
+
+
+def test_to_post_data_skips_items_without_link():
+    assert to_post_data(FEED_ITEMS[3], matcher.match) is None
+
+
+def test_posted_dates():
+    assert parse_posted_date("Mon, January 13, 2025, 09:30AM") == "2025-01-13 09:30:00"
+    # feed API items carry posted_date already
+    assert raw_posted_date({"posted_date": "2025-01-13 09:30:00"}) == (
+        "2025-01-13 09:30:00"
+    )
+
+
+@pytest.mark.parametrize(
+    "text, past",
+    [
+        ("Posted 2h ago", False),
+        ("Posted 3d ago", False),
+        ("Posted 4d ago", True),
+        ("Posted 1w ago", True),
+        ("Posted 2m ago", True),
+        (None, False),
+    ],
+)
+def test_is_past_lookback(text, past):
+    assert is_past_lookback(text, 3) is past
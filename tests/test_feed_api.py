@@ -0,0 +1,108 @@
+import json
+import time
+
+import pytest
+
+from modules.tradingedge_scraper.extraction import (
+    EXTRACT_FEED_JS,
+    SELECTORS,
+    to_post_data,
+)
+from modules.tradingedge_scraper.feed_api import (
+    FeedResponseCollector,
+    FeedSchemaError,
+    parse_feed_response,
+)
+from modules.tradingedge_scraper.ticker_matcher import TickerMatcher
+
+from conftest import fixture_path
+
+
+FEED_RESPONSES = ["feed_api_page1.json", "feed_api_page2.json"]
+POST_FIELDS = [
+    "id",
+    "author",
+    "title",
+    "likes",
+    "comments",
+    "link",
+    "category",
+    "posted_date",
+    "found_tickers",
+    "ticker_notification_sent",
+]
+
+matcher = TickerMatcher(["NVDA", "AMD", "TSLA", "SPY", "QQQ", "IWM", "PLTR"], ["TSLA"])
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    # The responses carry UTC timestamps, the DOM the browser's local time. The saved
+    # markup was rendered in UTC.
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def network_posts(utc):
+    collector = FeedResponseCollector()
+    for name in FEED_RESPONSES:
+        with open(fixture_path(name), "r") as f:
+            collector.add(parse_feed_response(json.load(f)))
+    return collector.drain()
+
+
+def test_network_posts(network_posts):
+    posts = [to_post_data(raw, matcher.match) for raw in network_posts]
+    assert [post.id for post in posts] == ["51230001", "51230002", "51230003"]
+    assert [post.posted_date for post in posts] == [
+        "2025-01-14 15:12:00",
+        "2025-01-13 09:30:00",
+        "2025-01-12 23:05:00",
+    ]
+    assert [post.likes for post in posts] == [42, 118, 5]
+    assert [post.comments for post in posts] == [7, 23, 0]
+    assert [post.category for post in posts] == ["Market Updates", "Weekly Plans", None]
+    assert posts[1].description == (
+        "SPY levels for the week, long write-up below.\n\n"
+        "Support at 580, resistance at 600. Watching QQQ and IWM for confirmation."
+    )
+    assert posts[1].found_tickers == "SPY, QQQ, IWM"
+    assert not any(raw["has_more"] for raw in network_posts)
+
+
+def test_network_posts_match_the_dom(feed_page, network_posts):
+    dom_raws = feed_page.evaluate(EXTRACT_FEED_JS, SELECTORS)
+    dom = {
+        raw["id"]: (raw, to_post_data(raw, matcher.match))
+        for raw in dom_raws
+        if raw["link"] is not None
+    }
+    network = {raw["id"]: to_post_data(raw, matcher.match) for raw in network_posts}
+    assert list(network) == list(dom)
+    for id, post in network.items():
+        dom_raw, dom_post = dom[id]
+        for field in POST_FIELDS:
+            if dom_raw["has_more"] and field == "found_tickers":
+                # the full text names more tickers than the preview
+                continue
+            assert getattr(post, field) == getattr(dom_post, field), (id, field)
+        if dom_raw["has_more"]:
+            # the feed only renders the start of long descriptions
+            assert post.description.startswith(dom_post.description)
+        else:
+            assert post.description == dom_post.description, id
+
+
+def test_schema_errors_fall_back_to_the_dom(utc):
+    collector = FeedResponseCollector()
+    with open(fixture_path(FEED_RESPONSES[0]), "r") as f:
+        collector.add(parse_feed_response(json.load(f)))
+    collector._ingest({"items": [{"id": 1}]})
+    assert collector.schema_errors == 1
+    assert collector.drain() is None
+    with pytest.raises(FeedSchemaError):
+        parse_feed_response({"next": None})
@@ -0,0 +1,107 @@
+import pytest
+
+from benchmarks.bench_supabase_stream import connect
+from benchmarks.postgrest_stub import PostgrestStub, synthetic_posts
+
+
+ROWS = 2500
+
+
+def ids(start, stop):
+    return [f"{i:08d}" for i in range(start, stop)]
+
+
+@pytest.fixture
+def serve():
+    # serve(max_rows) -> (stub, repo), the stub serves ROWS synthetic posts
+    stubs = []
+
+    def start(max_rows=None, rows=None):
+        stub = PostgrestStub(synthetic_posts(ROWS) if rows is None else rows, max_rows)
+        stubs.append(stub.__enter__())
+        return stub, connect(stub)
+
+    yield start
+    for stub in stubs:
+        stub.__exit__(None, None, None)
+
+
+def read(repo, build_query, start=0, stop=None, page_size=500, concurrency=4):
+    return [
+        row
+        for page in repo._iter_pages(build_query, start, stop, page_size, concurrency)
+        for row in page
+    ]
+
+
+def posts(repo):
+    def build_query(count=None):
+        return repo.supabase.table("posts").select("id", count=count).order("id")
+
+    return build_query
+
+
+@pytest.mark.parametrize("page_size, concurrency", [(500, 1), (500, 4), (333, 3)])
+def test_reads_all_rows_in_order(serve, page_size, concurrency):
+    _, repo = serve()
+    rows = read(repo, posts(repo), page_size=page_size, concurrency=concurrency)
+    assert [row["id"] for row in rows] == ids(0, ROWS)
+    report = repo.last_fetch_report
+    assert report["rows"] == report["expected_rows"] == ROWS
+    assert report["short_pages"] == 0
+
+
+def test_continues_with_the_server_page_size(serve):
+    # max-rows below the page size, every page comes back short
+    _, repo = serve(max_rows=300)
+    rows = read(repo, posts(repo))
+    assert [row["id"] for row in rows] == ids(0, ROWS)
+    report = repo.last_fetch_report
+    assert report["rows"] == report["expected_rows"] == ROWS
+    assert report["short_pages"] == 1
+    assert report["requests"] == 9  # 2500 rows / 300
+
+
+def test_reads_a_truncated_single_page(serve):
+    # limit <= page_size is read without a count, a page the server cut at max-rows
+    # is continued until the range is full
+    _, repo = serve(max_rows=300)
+    rows = read(repo, posts(repo), stop=500)
+    assert [row["id"] for row in rows] == ids(0, 500)
+    report = repo.last_fetch_report
+    assert report["rows"] == report["expected_rows"] == 500
+    assert report["requests"] == 2
+    assert report["short_pages"] == 1
+
+
+def test_single_page_at_the_end_of_the_result(serve):
+    _, repo = serve(max_rows=300)
+    rows = read(repo, posts(repo), start=2400, stop=2900)
+    assert [row["id"] for row in rows] == ids(2400, ROWS)
+    assert repo.last_fetch_report["rows"] == 100
+
+
+def test_empty_range(serve):
+    stub, repo = serve()
+    assert read(repo, posts(repo), start=100, stop=100) == []
+    assert stub.requests == 0
+
+
+def test_get_feed_limit_and_offset(serve):
+    _, repo = serve(max_rows=300)
+    df = repo.get_feed(columns=["id"], limit=500)
+    assert df["id"].tolist() == ids(0, 500)
+    df = repo.get_feed(columns=["id"], offset=2400, limit=500)
+    assert df["id"].tolist() == ids(2400, ROWS)
+    df = repo.get_feed(columns=["id"], offset=1000)
+    assert df["id"].tolist() == ids(1000, ROWS)
+
+
+def test_get_unprocessed_posts(serve):
+    rows = synthetic_posts(ROWS)
+    for row in rows[::2]:
+        row["content_parsed"] = True
+    _, repo = serve(max_rows=300, rows=rows)
+    df = repo.get_unprocessed_posts()
+    assert df["id"].tolist() == [row["id"] for row in rows[1::2]]
+    assert df.columns.tolist() == ["id", "title", "link", "tickers_notifications_sent"]